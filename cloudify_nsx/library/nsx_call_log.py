@@ -0,0 +1,166 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Instrumentation of nsx client calls.
+
+Proxy around client from nsx_login, each read/create/update/delete is
+recorded with resource name, uri parameters, status, latency and size of
+response. Records are logged, calls longer than threshold are logged as
+warnings, summary of calls is passed to callback after each call.
+
+Proxy does not use ctx, so it can be called from worker threads, logger
+and callback are selected by caller.
+"""
+import collections
+import functools
+import threading
+import time
+
+# methods of client which send requests to nsx
+CALL_METHODS = ('read', 'create', 'update', 'delete', 'read_all_pages')
+
+CallRecord = collections.namedtuple('CallRecord', [
+    'method', 'resource', 'uri_parameters', 'status', 'latency', 'size'
+])
+
+# size of responses received by current thread
+_responses = threading.local()
+
+
+def _response_hook(response, *args, **kwargs):
+    """requests hook, count size of responses in current thread"""
+    _responses.size = (
+        (getattr(_responses, 'size', None) or 0) + len(response.content or '')
+    )
+
+
+def install_response_hook(client):
+    """count size of responses received by client, hook is added only
+       once to http session of client"""
+    session = getattr(getattr(client, '_httpsession', None), '_session', None)
+    hooks = getattr(session, 'hooks', None)
+    if not isinstance(hooks, dict):
+        return
+    response_hooks = hooks.setdefault('response', [])
+    if _response_hook not in response_hooks:
+        response_hooks.append(_response_hook)
+
+
+def format_record(record):
+    """record as string for log"""
+    return "%s %s %s: status %s, %.3fs, %s bytes" % (
+        record.method, record.resource, record.uri_parameters or {},
+        record.status if record.status is not None else 'failed',
+        record.latency,
+        record.size if record.size is not None else 'unknown'
+    )
+
+
+class CallSummary(object):
+    """counters of calls, total and by resource"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.slow = 0
+        self.time = 0.0
+        self.size = 0
+        self.resources = {}
+
+    def add(self, record, slow):
+        failed = record.status is None or not 200 <= record.status < 300
+        for counters in [self, self.resources.setdefault(
+            record.resource, CallSummary()
+        )]:
+            counters.calls += 1
+            counters.time += record.latency
+            counters.size += record.size or 0
+            if failed:
+                counters.errors += 1
+            if slow:
+                counters.slow += 1
+
+    def to_dict(self):
+        summary = {
+            'calls': self.calls,
+            'errors': self.errors,
+            'slow': self.slow,
+            'time': round(self.time, 3),
+            'size': self.size
+        }
+        if self.resources:
+            summary['resources'] = dict(
+                (resource, counters.to_dict())
+                for resource, counters in self.resources.items()
+            )
+        return summary
+
+
+class ClientProxy(object):
+    """base of proxies around nsx client, original client in 'client'"""
+
+    client = None
+
+
+class InstrumentedClient(ClientProxy):
+    """proxy of nsx client which records each request to nsx"""
+
+    def __init__(self, client, logger, log_calls=False, slow_call=0,
+                 on_summary=None):
+        self.client = client
+        self.summary = CallSummary()
+        self._logger = logger
+        self._log_calls = log_calls
+        # seconds, 0 - disabled
+        self._slow_call = slow_call
+        # called with summary dict after each call
+        self._on_summary = on_summary
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name in CALL_METHODS:
+            return functools.partial(self._call, attr, name)
+        return attr
+
+    def _call(self, func, method, searched_resource, *args, **kwargs):
+        uri_parameters = kwargs.get('uri_parameters')
+        if uri_parameters is None and args:
+            uri_parameters = args[0]
+        _responses.size = None
+        status = None
+        started = time.time()
+        try:
+            result = func(searched_resource, *args, **kwargs)
+            if isinstance(result, dict):
+                status = result.get('status')
+            else:
+                # read_all_pages returns only list of objects
+                status = 200
+            return result
+        finally:
+            self._record(CallRecord(
+                method, searched_resource, uri_parameters, status,
+                time.time() - started, _responses.size
+            ))
+
+    def _record(self, record):
+        slow = bool(self._slow_call) and record.latency >= self._slow_call
+        if slow:
+            self._logger.warn("Slow NSX call %s" % format_record(record))
+        elif self._log_calls:
+            self._logger.info("NSX call %s" % format_record(record))
+        with self._lock:
+            self.summary.add(record, slow)
+            if self._on_summary:
+                self._on_summary(self.summary.to_dict())
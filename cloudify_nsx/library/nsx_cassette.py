@@ -0,0 +1,293 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Record and replay of nsx client calls.
+
+Cassette is gzip file with one json line for each request to nsx: method,
+resource, uri and query parameters, request body, response and latency.
+Several operations/processes can append to same cassette, each write is
+separate gzip member under flock. Passwords, user names and other
+credentials in bodies are replaced by REDACTED before save, other content
+of nsx objects is saved as is, so cassette must be kept private.
+
+Replay serves responses by method, resource, uri and query parameters in
+recorded order, last response is repeated after end of records. Position
+of replay is saved in file near cassette under flock, so each operation
+subprocess continues replay from calls of previous operations. Latency is
+original multiplied by scale, 0 - responses without delay.
+"""
+import collections
+import copy
+import fcntl
+import functools
+import gzip
+import json
+import os
+import threading
+import time
+
+from cloudify import exceptions as cfy_exc
+import nsx_call_log
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+# positional parameters of client methods after resource name
+CALL_PARAMETERS = (
+    'uri_parameters', 'request_body_dict', 'query_parameters_dict'
+)
+
+# fields of client response saved to cassette
+RESPONSE_FIELDS = ('status', 'body', 'location', 'objectId', 'Etag')
+
+# suffixes of names of fields with credentials, in lower case
+SECRET_FIELDS = (
+    'password', 'username', 'secret', 'passphrase', 'psk'
+)
+
+REDACTED = '<redacted>'
+
+# loaded cassettes for replay, by path
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def _call_parameters(args, kwargs):
+    """uri parameters, body and query parameters of client call"""
+    parameters = dict(zip(CALL_PARAMETERS, args))
+    for name in CALL_PARAMETERS:
+        if name in kwargs:
+            parameters[name] = kwargs[name]
+    return [parameters.get(name) for name in CALL_PARAMETERS]
+
+
+def _normalize(parameters):
+    """parameters with string values, numbers and strings are same in
+       url"""
+    if not isinstance(parameters, dict):
+        # pynsxv sends method name as uri parameters in read_all_pages
+        return parameters
+    return dict(
+        (str(name), str(value))
+        for name, value in (parameters or {}).items()
+        if value is not None
+    )
+
+
+def _secret(name, parent):
+    """field contains credentials, authentication/value is ospf key"""
+    name = str(name).lower()
+    return name.endswith(SECRET_FIELDS) or (
+        parent == 'authentication' and name == 'value'
+    )
+
+
+def redact(value, parent=None):
+    """copy of body with credentials replaced by REDACTED"""
+    if isinstance(value, dict):
+        return type(value)(
+            (name, REDACTED if item is not None and _secret(name, parent)
+             else redact(item, name))
+            for name, item in value.items()
+        )
+    if isinstance(value, list):
+        return [redact(item, parent) for item in value]
+    return value
+
+
+def call_key(method, resource, uri_parameters, query_parameters):
+    """key of call in cassette"""
+    return json.dumps([
+        method, resource, _normalize(uri_parameters),
+        _normalize(query_parameters)
+    ], sort_keys=True)
+
+
+def load(path):
+    """list of records from cassette"""
+    records = []
+    with gzip.open(path, 'rb') as cassette_file:
+        for line in cassette_file:
+            if line.strip():
+                records.append(json.loads(
+                    line, object_pairs_hook=collections.OrderedDict
+                ))
+    return records
+
+
+def positions_path(path):
+    """file with positions of replay of cassette"""
+    return path + '.positions'
+
+
+class Cassette(object):
+    """recorded calls by key, position of replay is shared with other
+       processes by positions file"""
+
+    def __init__(self, records, positions_path):
+        self.calls = {}
+        self._positions_path = positions_path
+        self._lock = threading.Lock()
+        for record in records:
+            self.calls.setdefault(call_key(
+                record['method'], record['resource'],
+                record.get('uri_parameters'),
+                record.get('query_parameters')
+            ), []).append(record)
+
+    def next_record(self, key):
+        """next recorded response, last response is repeated"""
+        records = self.calls.get(key)
+        if not records:
+            return None
+        position = self._next_position(key)
+        return records[min(position, len(records) - 1)]
+
+    def _next_position(self, key):
+        """position of replay for key, saved position is incremented"""
+        with self._lock:
+            fd = os.open(self._positions_path, os.O_RDWR | os.O_CREAT, 0o600)
+            with os.fdopen(fd, 'r+') as positions_file:
+                fcntl.flock(positions_file, fcntl.LOCK_EX)
+                try:
+                    content = positions_file.read()
+                    positions = json.loads(content) if content else {}
+                    position = positions.get(key, 0)
+                    positions[key] = position + 1
+                    positions_file.seek(0)
+                    positions_file.truncate()
+                    positions_file.write(json.dumps(positions))
+                    positions_file.flush()
+                finally:
+                    fcntl.flock(positions_file, fcntl.LOCK_UN)
+        return position
+
+
+def get_cassette(path):
+    """cassette for replay, loaded once for all operations"""
+    with _cassettes_lock:
+        if path not in _cassettes:
+            try:
+                _cassettes[path] = Cassette(load(path), positions_path(path))
+            except (IOError, ValueError) as ex:
+                raise cfy_exc.NonRecoverableError(
+                    "Can't load cassette %s: %s" % (path, str(ex))
+                )
+        return _cassettes[path]
+
+
+def clean_cassettes():
+    """forget loaded cassettes and positions of their replay, replay starts
+       from first record"""
+    with _cassettes_lock:
+        for path in _cassettes:
+            try:
+                os.remove(positions_path(path))
+            except OSError:
+                pass
+        _cassettes.clear()
+
+
+class _CassetteClient(nsx_call_log.ClientProxy):
+    """proxy of nsx client with calls to nsx replaced by _call"""
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name in nsx_call_log.CALL_METHODS:
+            return functools.partial(self._call, attr, name)
+        return attr
+
+
+class RecordingClient(_CassetteClient):
+    """proxy of nsx client which saves each call to cassette"""
+
+    def __init__(self, client, path):
+        self.client = client
+        self._path = path
+        self._lock = threading.Lock()
+
+    def _call(self, func, method, searched_resource, *args, **kwargs):
+        uri_parameters, body, query_parameters = _call_parameters(
+            args, kwargs
+        )
+        record = collections.OrderedDict([
+            ('method', method),
+            ('resource', searched_resource),
+            ('uri_parameters', uri_parameters),
+            ('query_parameters', query_parameters),
+            ('request', redact(body))
+        ])
+        started = time.time()
+        try:
+            result = func(searched_resource, *args, **kwargs)
+        except SystemExit as ex:
+            # client exits on unexpected status
+            record['latency'] = round(time.time() - started, 6)
+            record['exit'] = str(ex)
+            self._save(record)
+            raise
+        record['latency'] = round(time.time() - started, 6)
+        if isinstance(result, dict):
+            record['response'] = dict(
+                (name, result.get(name)) for name in RESPONSE_FIELDS
+            )
+            record['response']['body'] = redact(result.get('body'))
+        else:
+            # read_all_pages returns only list of objects
+            record['result'] = redact(result)
+        self._save(record)
+        return result
+
+    def _save(self, record):
+        line = json.dumps(record, separators=(',', ':')) + "\n"
+        with self._lock:
+            with open(self._path, 'ab') as cassette_file:
+                fcntl.flock(cassette_file, fcntl.LOCK_EX)
+                try:
+                    with gzip.GzipFile(
+                        fileobj=cassette_file, mode='ab'
+                    ) as member:
+                        member.write(line)
+                finally:
+                    fcntl.flock(cassette_file, fcntl.LOCK_UN)
+
+
+class ReplayClient(_CassetteClient):
+    """proxy of nsx client which serves calls from cassette"""
+
+    def __init__(self, client, cassette, latency_scale=1.0):
+        self.client = client
+        self._cassette = cassette
+        self._latency_scale = latency_scale
+
+    def _call(self, func, method, searched_resource, *args, **kwargs):
+        uri_parameters, _, query_parameters = _call_parameters(
+            args, kwargs
+        )
+        record = self._cassette.next_record(call_key(
+            method, searched_resource, uri_parameters, query_parameters
+        ))
+        if not record:
+            raise cfy_exc.NonRecoverableError(
+                "No recorded response for %s %s %s" % (
+                    method, searched_resource, uri_parameters or {}
+                )
+            )
+        if self._latency_scale > 0:
+            time.sleep(record.get('latency', 0) * self._latency_scale)
+        if 'exit' in record:
+            raise SystemExit(record['exit'])
+        # caller can change response, repeated record must be same
+        if 'result' in record:
+            return copy.deepcopy(record['result'])
+        return copy.deepcopy(dict(record['response']))
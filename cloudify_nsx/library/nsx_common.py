@@ -12,7 +12,19 @@
 #    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
+import contextlib
+import copy
+import errno
+import fcntl
+import functools
+import hashlib
+import inspect
+import json
 import os
+import random
+import re
+import tempfile
+import threading
 import time
 import yaml
 
@@ -21,10 +33,27 @@ from cloudify.context import NODE_INSTANCE
 from pkg_resources import resource_filename
 from nsxramlclient.client import NsxClient
 from cloudify import exceptions as cfy_exc
+import nsx_call_log
+import nsx_cassette
+import nsx_inventory
+import nsx_plan
+import nsx_raml_index
 
 MANAGER_PLUGIN_FILES = os.path.join('/etc', 'cloudify', 'nsx_plugin')
 DEFAULT_CONFIG_PATH = os.path.join(MANAGER_PLUGIN_FILES,
                                    'connection_config.yaml')
+RAML_INDEX_DIR = os.path.join(MANAGER_PLUGIN_FILES, 'raml_index')
+LOCK_DIR = os.path.join(MANAGER_PLUGIN_FILES, 'locks')
+INVENTORY_FILE = os.path.join(MANAGER_PLUGIN_FILES, 'inventory.sqlite')
+# max time in seconds for wait lock of edge feature
+LOCK_TIMEOUT = 300
+
+# count of objects requested in one page of big listings
+SEARCH_PAGE_SIZE = 256
+
+# attempts to apply mutation again when object has been changed by other
+# operation between our read and write
+VERSIONED_UPDATE_ATTEMPTS = 5
 
 
 def _cleanup_properties(value):
@@ -69,74 +98,128 @@ def _cleanup_if_empty(value):
         return None
 
 
-def _validate(check_dict, validate_rules, use_existing):
-    """Validate inputs for node creation"""
-    result = {}
-    for name in validate_rules:
-        rule = validate_rules[name]
-        required_value = rule.get('required', False)
-        external_use_value = rule.get('external_use', False)
-        default_value = rule.get('default', False)
-        set_none = rule.get('set_none', False)
+def _values_set(values):
+    """allowed values as set for fast check, None if values unhashable"""
+    try:
+        return frozenset(values)
+    except TypeError:
+        return None
+
+
+class _RuleField(object):
+    """one field rule from validate rules with precomputed checks"""
+
+    __slots__ = ('name', 'required', 'external_use', 'has_default',
+                 'default', 'set_none', 'values', 'values_set', 'sub',
+                 'boolean', 'string', 'caseinsensitive')
+
+    def __init__(self, name, rule):
+        self.name = name
+        self.required = rule.get('required', False)
+        self.external_use = rule.get('external_use', False)
+        self.has_default = 'default' in rule
+        self.default = rule.get('default', False)
+        self.set_none = rule.get('set_none', False)
+        self.caseinsensitive = rule.get('caseinsensitive', False)
+
         values = rule.get('values', False)
+        if self.caseinsensitive and values:
+            values = [str(v).lower() for v in values]
+        self.values = values
+        self.values_set = _values_set(values) if values else None
+
         sub_checks = rule.get('sub', None)
+        self.sub = RulesValidator(sub_checks) if sub_checks else None
+
         value_type = rule.get('type', 'string')
-        caseinsensitive = rule.get('caseinsensitive', False)
+        self.boolean = value_type == 'boolean'
+        self.string = value_type == 'string'
+
+    def _allowed(self, value):
+        if self.values_set is not None:
+            try:
+                return value in self.values_set
+            except TypeError:
+                # unhashable value
+                pass
+        return value in self.values
+
+    def validate(self, check_dict, use_existing):
+        name = self.name
 
         # we can have value == false and default == true, so only check
         # field in list
-        if 'default' in rule and name not in check_dict:
-            value = default_value
+        if self.has_default and name not in check_dict:
+            value = self.default
         else:
             value = check_dict.get(name)
 
-        # external
-        if use_existing and external_use_value and not value:
-            raise cfy_exc.NonRecoverableError(
-                "don't have external value for %s" % name
-            )
-
-        # not external
-        if not use_existing and not external_use_value:
+        if use_existing:
+            # external
+            if self.external_use and not value:
+                raise cfy_exc.NonRecoverableError(
+                    "don't have external value for %s" % name
+                )
+        elif not self.external_use:
             # zero/true/false is also value
-            if required_value and not value and not isinstance(value, int):
+            if self.required and not value and not isinstance(value, int):
                 raise cfy_exc.NonRecoverableError(
                     "don't have value for %s " % name
                 )
 
-        # cleanup value/values in case caseinsensitive string
-        if caseinsensitive and value:
+        # cleanup value in case caseinsensitive string
+        if self.caseinsensitive and value:
             value = value.lower()
 
-        if caseinsensitive and values:
-            values = [str(v).lower() for v in values]
-
-        if set_none and not value:
+        if self.set_none and not value:
             # empty value
             value = None
         else:
             # looks as we have some list of posible values
-            if values:
-                if value not in values:
-                    raise cfy_exc.NonRecoverableError(
-                        "Wrong value %s=%s not in %s" % (
-                            name, str(value), str(values)
-                        )
+            if self.values and not self._allowed(value):
+                raise cfy_exc.NonRecoverableError(
+                    "Wrong value %s=%s not in %s" % (
+                        name, str(value), str(self.values)
                     )
-            if sub_checks:
-                value = _validate(value, sub_checks, use_existing)
-                if set_none:
+                )
+            if self.sub:
+                value = self.sub.validate(value, use_existing)
+                if self.set_none:
                     value = _cleanup_if_empty(value)
 
         # sory some time we have mistake in value for boolean fields
-        if value_type == 'boolean' and isinstance(value, basestring):
+        if self.boolean and isinstance(value, basestring):
             value = str(value).lower() == 'true'
         # for case value==0 and we need check difference with None and False
-        elif value_type == 'string' and isinstance(value, int):
+        elif self.string and isinstance(value, int):
             value = str(value)
-        result[name] = value
+        return value
 
-    return result
+
+class RulesValidator(object):
+    """validate rules (dict used by _validate) prepared once, can be
+       created on module import and used instead of rules dict"""
+
+    __slots__ = ('fields',)
+
+    def __init__(self, validate_rules):
+        self.fields = [
+            _RuleField(name, validate_rules[name]) for name in validate_rules
+        ]
+
+    def validate(self, check_dict, use_existing):
+        result = {}
+        for field in self.fields:
+            result[field.name] = field.validate(check_dict, use_existing)
+        return result
+
+
+def _validate(check_dict, validate_rules, use_existing):
+    """Validate inputs for node creation, validate_rules is dict of rules
+       or RulesValidator"""
+    if not isinstance(validate_rules, RulesValidator):
+        validate_rules = RulesValidator(validate_rules)
+    return validate_rules.validate(check_dict, use_existing)
 
 
 def _get_properties(name, kwargs):
@@ -187,6 +270,51 @@ def get_properties_and_validate(name, kwargs, validate_dict):
     )
 
 
+def validate_list(name, values, validate_dict, use_existing):
+    """validate each item in list of properties"""
+    if not isinstance(values, list):
+        raise cfy_exc.NonRecoverableError(
+            "%s must be list" % name
+        )
+    if not isinstance(validate_dict, RulesValidator):
+        validate_dict = RulesValidator(validate_dict)
+    return [
+        validate_dict.validate(value, use_existing) for value in values
+    ]
+
+
+def edge_item_rules(validate_rules):
+    """validate rules of node with one item of edge (rule, pool, binding),
+       rules of item are used for each item in list in bulk node"""
+    validate_rules = copy.deepcopy(validate_rules)
+    validate_rules["esg_id"] = {
+        "required": True
+    }
+    return validate_rules
+
+
+def item_arguments(item_dict, validate_rules, check_item=None):
+    """arguments of nsx call from validated item, check_item(item_dict)
+       can raise error for wrong combination of values"""
+    if check_item:
+        check_item(item_dict)
+    return {
+        name: item_dict[name] for name in validate_rules
+    }
+
+
+def validate_items(name, values, validate_rules, use_existing,
+                   check_item=None):
+    """arguments of nsx call for each item in list of properties, all
+       items are checked before any request to nsx"""
+    return [
+        item_arguments(item_dict, validate_rules, check_item)
+        for item_dict in validate_list(
+            name, values, validate_rules, use_existing
+        )
+    ]
+
+
 def remove_properties(name):
     """remove name from runtime properties"""
     if 'resource_id' in ctx.instance.runtime_properties:
@@ -199,6 +327,56 @@ def remove_properties(name):
         del ctx.instance.runtime_properties[name]
 
 
+def _restore_properties(runtime_properties, original):
+    """restore runtime properties changed by dry run"""
+    for name in list(runtime_properties.keys()):
+        if name not in original:
+            del runtime_properties[name]
+    runtime_properties.update(original)
+
+
+def _save_plan(runtime_properties, original, operation, plan):
+    """restore runtime properties changed by dry run and save plan"""
+    _restore_properties(runtime_properties, original)
+    plans = dict(runtime_properties.get('nsx_plan') or {})
+    plans[operation] = plan.to_dict()
+    runtime_properties['nsx_plan'] = plans
+
+
+def with_dry_run(func):
+    """operation with 'dry_run' input: inputs are validated and state is
+       read from nsx, changes are saved to 'nsx_plan' runtime property
+       instead of nsx, other runtime properties are not changed"""
+    @functools.wraps(func)
+    def wrapper(**kwargs):
+        if not _auth_flag(kwargs, 'dry_run') or ctx.type != NODE_INSTANCE:
+            return func(**kwargs)
+
+        runtime_properties = ctx.instance.runtime_properties
+        original = copy.deepcopy(dict(runtime_properties))
+        plan = nsx_plan.Plan()
+        nsx_plan.select(plan)
+        try:
+            func(**kwargs)
+        except nsx_plan.PlanStopped as ex:
+            # next requests depend on planned changes
+            plan.stopped = str(ex)
+            ctx.logger.info("Planning stopped: %s" % plan.stopped)
+        except Exception:
+            # issue with inputs or state is reported as in real run
+            _restore_properties(runtime_properties, original)
+            raise
+        finally:
+            nsx_plan.select(None)
+
+        _save_plan(
+            runtime_properties, original, ctx.operation.name or 'operation',
+            plan
+        )
+        ctx.logger.info("Planned %s changes" % len(plan.calls))
+    return wrapper
+
+
 def delete_object(func_call, element_struct, kwargs, elements_to_clean=None):
     """Common code for delete object with client/resource_id params"""
     use_existing, _ = get_properties(element_struct, kwargs)
@@ -226,8 +404,10 @@ def delete_object(func_call, element_struct, kwargs, elements_to_clean=None):
     attempt_with_rerun(
         func_call,
         client_session=client_session,
-        resource_id=resource_id
+        resource_id=resource_id,
+        retry_policy=get_retry_policy(kwargs)
     )
+    inventory_forget(kwargs, resource_id)
 
     ctx.logger.info("delete %s" % resource_id)
 
@@ -237,23 +417,326 @@ def delete_object(func_call, element_struct, kwargs, elements_to_clean=None):
             remove_properties(name)
 
 
+class RetryPolicy(object):
+    """Exponential backoff with jitter, limited by attempts and deadline"""
+
+    def __init__(self, attempts=11, delay=3, backoff=2, max_delay=30,
+                 jitter=0.2, deadline=330):
+        """
+        :param attempts: max count of attempts
+        :param delay: delay in seconds after first failed attempt
+        :param backoff: multiplier for delay after each failed attempt
+        :param max_delay: max delay in seconds between attempts
+        :param jitter: random part of delay, 0.2 means +-20%
+        :param deadline: max time in seconds for all attempts
+        """
+        self.attempts = int(attempts)
+        self.delay = float(delay)
+        self.backoff = float(backoff)
+        self.max_delay = float(max_delay)
+        self.jitter = float(jitter)
+        self.deadline = float(deadline)
+
+    def next_delay(self, attempt):
+        """delay after failed attempt, attempt is started from 0"""
+        delay = min(self.max_delay, self.delay * (self.backoff ** attempt))
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        return max(0, delay)
+
+
+def get_retry_policy(kwargs, name='retry', **defaults):
+    """retry policy from 'retry' (or other name) in
+       nsx_auth/connection_config.yaml, defaults are used for not set
+       fields"""
+    retry = {}
+    retry.update(defaults)
+    retry.update(_nsx_auth_config(kwargs).get(name) or {})
+    try:
+        return RetryPolicy(**retry)
+    except (TypeError, ValueError) as ex:
+        raise cfy_exc.NonRecoverableError(
+            "Wrong %s policy %s: %s" % (name, str(retry), str(ex))
+        )
+
+
+def _lock_dir():
+    """directory for lock files, shared by all agent processes"""
+    if os.path.isdir(MANAGER_PLUGIN_FILES):
+        return LOCK_DIR
+    return os.path.join(tempfile.gettempdir(), 'cloudify_nsx_locks')
+
+
+class FileLock(object):
+    """Cross process lock based on flock of local file"""
+
+    def __init__(self, name, timeout=None):
+        self.name = name
+        self.timeout = LOCK_TIMEOUT if timeout is None else timeout
+        self._file = None
+
+    def _path(self):
+        lock_dir = _lock_dir()
+        if not os.path.isdir(lock_dir):
+            try:
+                os.makedirs(lock_dir)
+            except OSError as ex:
+                # created by other process
+                if ex.errno != errno.EEXIST:
+                    raise
+        return os.path.join(
+            lock_dir, re.sub(r'[^\w.-]', '_', self.name) + '.lock'
+        )
+
+    def __enter__(self):
+        self._file = open(self._path(), 'a')
+        started = time.time()
+        while True:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except IOError as ex:
+                if ex.errno not in (errno.EAGAIN, errno.EACCES):
+                    self._file.close()
+                    raise
+            if time.time() - started > self.timeout:
+                self._file.close()
+                raise cfy_exc.RecoverableError(
+                    message="Lock %s is still used by other operation" % (
+                        self.name
+                    )
+                )
+            time.sleep(0.1)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+
+# function(name) that returns context manager for lock, replace it for use
+# some other backend than local files
+lock_backend = FileLock
+
+
+# nsx document of edge changed by resource, resources of same document
+# share one lock: update of routingConfig overwrites bgp, ospf and static
+# routes, update of firewall overwrites default policy and rules
+EDGE_DOCUMENTS = {
+    'routingConfig': 'routing',
+    'routingConfigStatic': 'routing',
+    'routingGlobalConfig': 'routing',
+    'routingBGP': 'routing',
+    'routingOSPF': 'routing',
+    'defaultFirewallPolicy': 'firewall',
+    'firewallRules': 'firewall',
+    'dhcpRelay': 'dhcp',
+    'dhcpPool': 'dhcp',
+    'dhcpStaticBinding': 'dhcp',
+    'edgeNat': 'nat',
+    'edgeNatRules': 'nat',
+    'vnic': 'interfaces',
+    'interfaces': 'interfaces'
+}
+
+# documents of edge replaced by update of whole nsxEdge
+EDGE_WHOLE_DOCUMENTS = ('dhcp', 'firewall', 'interfaces', 'nat', 'routing')
+
+
+# names of edge locks held by current thread
+_held_edge_locks = threading.local()
+
+
+def _edge_lock_name(edge_id, feature):
+    return "%s_%s" % (edge_id, EDGE_DOCUMENTS.get(feature, feature))
+
+
+def _held_locks():
+    if not hasattr(_held_edge_locks, 'names'):
+        _held_edge_locks.names = set()
+    return _held_edge_locks.names
+
+
+def edge_lock_held(edge_id, feature):
+    """True if current thread holds lock of edge document"""
+    return _edge_lock_name(edge_id, feature) in _held_locks()
+
+
+@contextlib.contextmanager
+def edge_lock(edge_id, feature):
+    """lock for change of edge document (routing, firewall, dhcp, nat),
+       feature can be name of resource from such document, lock already
+       held by current thread is reused"""
+    name = _edge_lock_name(edge_id, feature)
+    held = _held_locks()
+    if name in held:
+        yield
+        return
+    with lock_backend(name):
+        held.add(name)
+        try:
+            yield
+        finally:
+            held.discard(name)
+
+
+@contextlib.contextmanager
+def edge_locks(edge_id, features):
+    """locks of several edge documents, taken in same order by all
+       operations"""
+    documents = sorted(set(
+        EDGE_DOCUMENTS.get(feature, feature) for feature in features
+    ))
+    if not documents:
+        yield
+        return
+    with edge_lock(edge_id, documents[0]):
+        with edge_locks(edge_id, documents[1:]):
+            yield
+
+
+def edge_locked(feature, argument='esg_id', part=None):
+    """decorator, run function with lock of edge feature, edge id is value
+       of argument or part of argument value splitted by '|'"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            edge_id = inspect.getcallargs(func, *args, **kwargs)[argument]
+            if part is not None:
+                parts = str(edge_id).split("|")
+                # function itself will raise error about wrong id
+                edge_id = parts[part] if len(parts) > part else None
+            if not edge_id:
+                return func(*args, **kwargs)
+            with edge_lock(edge_id, feature):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def document_version(document):
+    """content hash of nsx object, nsx has not returned version
+       for each part of edge configuration"""
+    return hashlib.sha256(
+        json.dumps(document, sort_keys=True, default=str)
+    ).hexdigest()
+
+
+def versioned_update(read_func, write_func, mutation,
+                     attempts=VERSIONED_UPDATE_ATTEMPTS, edge_document=None):
+    """Change document returned by read_func with mutation(document) and
+       save it by write_func(document), return result of mutation.
+
+       Document is read again before write and if it has been changed by
+       other operation, mutation is applied to new version of document.
+       Read before write is skipped if current thread holds edge_lock of
+       edge_document - (edge_id, feature)."""
+    document = read_func()
+    if edge_document and edge_lock_held(*edge_document):
+        # nobody else can change document
+        candidate = copy.deepcopy(document)
+        result = mutation(candidate)
+        if candidate != document:
+            write_func(candidate)
+        return result
+    for attempt in xrange(attempts):
+        version = document_version(document)
+        candidate = copy.deepcopy(document)
+        result = mutation(candidate)
+        if document_version(candidate) == version:
+            # nothing to save
+            return result
+        current = read_func()
+        if document_version(current) == version:
+            write_func(candidate)
+            return result
+        ctx.logger.info(
+            "Object has been changed by other operation, apply changes "
+            "to new version, %s attempts left" % (attempts - attempt - 1)
+        )
+        document = current
+    raise cfy_exc.RecoverableError(
+        message="Object has been changed by other operations %s times" % (
+            attempts
+        )
+    )
+
+
+def _func_name(func):
+    """name of func for logs, partial is logged by name of wrapped func"""
+    if isinstance(func, functools.partial):
+        func = func.func
+    return getattr(func, '__name__', repr(func))
+
+
+def wait_for(func, **kwargs):
+    """Poll func until it returns something different from None,
+       delays between polls are defined by retry_policy,
+       return last func result (None if we have not waited)"""
+    name = _func_name(func)
+    policy = kwargs.pop('retry_policy', None) or RetryPolicy()
+    started = time.time()
+    attempt = 0
+    while True:
+        result = func(**kwargs)
+        if result is not None:
+            ctx.logger.info("%s: done after %s polls in %.2f seconds" % (
+                name, attempt + 1, time.time() - started
+            ))
+            return result
+        delay = policy.next_delay(attempt)
+        if (
+            attempt + 1 >= policy.attempts or
+            time.time() - started + delay > policy.deadline or
+            # planned changes are never done
+            nsx_plan.current() is not None
+        ):
+            ctx.logger.info("%s: not done after %s polls in %.2f seconds" % (
+                name, attempt + 1, time.time() - started
+            ))
+            return None
+        time.sleep(delay)
+        attempt += 1
+
+
 def attempt_with_rerun(func, **kwargs):
-    """Rerun func several times, useful after dlr/esg delete"""
-    i = 10
-    while i >= 0:
+    """Rerun func several times, useful after dlr/esg delete,
+       delays between attempts are defined by retry_policy,
+       return list of attempts durations"""
+    name = _func_name(func)
+    policy = kwargs.pop('retry_policy', None) or RetryPolicy()
+    started = time.time()
+    timings = []
+    attempt = 0
+    while True:
+        attempt_started = time.time()
         try:
             func(**kwargs)
-            return
+            timings.append(time.time() - attempt_started)
+            if attempt:
+                ctx.logger.info("%s: attempts timings: %s" % (
+                    name, ", ".join("%.2f" % t for t in timings)
+                ))
+            return timings
         except cfy_exc.RecoverableError as ex:
+            timings.append(time.time() - attempt_started)
+            attempts_left = policy.attempts - attempt - 1
             ctx.logger.error("%s: %s attempts left: Message: %s " % (
-                func.__name__, i, str(ex)
+                name, attempts_left, str(ex)
             ))
-            if not i:
+            delay = policy.next_delay(attempt)
+            if (
+                attempts_left <= 0 or
+                time.time() - started + delay > policy.deadline
+            ):
+                ctx.logger.info("%s: attempts timings: %s" % (
+                    name, ", ".join("%.2f" % t for t in timings)
+                ))
                 raise cfy_exc.RecoverableError(
-                    message="Retry %s little later" % func.__name__
+                    message="Retry %s little later" % name
                 )
-        time.sleep(30)
-        i -= 1
+        time.sleep(delay)
+        attempt += 1
 
 
 def _nsx_login_file():
@@ -277,18 +760,69 @@ def _nsx_login_file():
     return cfg
 
 
-def nsx_login(kwargs):
-    """Use values form properties/of file for login to nsx"""
+def default_raml_file():
+    """raml embedded to plugin"""
+    resource_dir = resource_filename(__name__, 'api_spec')
+    return '{}/nsxvapi.raml'.format(resource_dir)
+
+
+def _nsx_client(raml_file, ip, user, password):
+    """create client, reuse precompiled raml index if we have such"""
+    if not nsx_raml_index.client_supported():
+        ctx.logger.info(
+            "Raml index is not supported with nsxramlclient %s" %
+            nsx_raml_index.client_version()
+        )
+        return NsxClient(raml_file, ip, user, password)
+
+    try:
+        raml_root = nsx_raml_index.load(RAML_INDEX_DIR, raml_file)
+    except Exception as ex:
+        ctx.logger.info("Can't load raml index: %s" % str(ex))
+        raml_root = None
+
+    if raml_root:
+        ctx.logger.info("Used raml index for %s" % raml_file)
+        return nsx_raml_index.IndexedNsxClient(
+            raml_root, raml_file, ip, user, password
+        )
+
+    client = NsxClient(raml_file, ip, user, password)
+
+    # only local files can be indexed, and only in existed config directory
+    if (
+        os.path.isdir(MANAGER_PLUGIN_FILES) and
+        nsx_raml_index.raml_hash(raml_file)
+    ):
+        try:
+            nsx_raml_index.save(
+                RAML_INDEX_DIR, raml_file,
+                nsx_raml_index.client_raml_root(client)
+            )
+        except Exception as ex:
+            ctx.logger.info("Can't save raml index: %s" % str(ex))
+
+    return client
+
+
+def _nsx_auth_config(kwargs):
+    """Merge nsx_auth from properties/inputs with config file"""
     if ctx.type == NODE_INSTANCE:
         nsx_auth = _get_properties('nsx_auth', kwargs)
     else:
         nsx_auth = kwargs.get('nsx_auth')
 
-    ctx.logger.info("NSX login...")
-
     # get file config
     cfg_auth = _nsx_login_file()
-    cfg_auth.update(nsx_auth)
+    cfg_auth.update(nsx_auth or {})
+    return cfg_auth
+
+
+def nsx_login(kwargs):
+    """Use values form properties/of file for login to nsx"""
+    ctx.logger.info("NSX login...")
+
+    cfg_auth = _nsx_auth_config(kwargs)
 
     # check values
     user = cfg_auth.get('username')
@@ -310,15 +844,102 @@ def nsx_login(kwargs):
 
     raml_file = cfg_auth.get('raml')
     if not raml_file:
-        resource_dir = resource_filename(__name__, 'api_spec')
-        raml_file = '{}/nsxvapi.raml'.format(resource_dir)
+        raml_file = default_raml_file()
         ctx.logger.info("Will be used internal: %s" % raml_file)
 
-    client = NsxClient(raml_file, ip, user, password)
+    client = _nsx_client(raml_file, ip, user, password)
     ctx.logger.info("NSX logged in")
+    return _wrap_client(client, cfg_auth)
+
+
+def _wrap_client(client, cfg_auth):
+    """add record/replay, instrumentation and dry run to client"""
+    client = _instrument_client(_cassette_client(client, cfg_auth), cfg_auth)
+    plan = nsx_plan.current()
+    if plan is not None:
+        ctx.logger.info("Dry run, changes will be only planned")
+        return nsx_plan.PlanningClient(client, plan)
     return client
 
 
+def _auth_flag(cfg_auth, name):
+    """boolean value from nsx_auth/connection_config.yaml"""
+    value = cfg_auth.get(name) or False
+    if isinstance(value, basestring):
+        return value.lower() == 'true'
+    return bool(value)
+
+
+def _save_call_summary(runtime_properties, operation, summary):
+    """save summary of nsx calls made by operation"""
+    calls = dict(runtime_properties.get('nsx_calls') or {})
+    calls[operation] = summary
+    runtime_properties['nsx_calls'] = calls
+
+
+def _cassette_client(client, cfg_auth):
+    """wrap client by recorder/player of calls, 'cassette',
+       'cassette_mode' and 'cassette_latency' in
+       nsx_auth/connection_config.yaml"""
+    path = cfg_auth.get('cassette')
+    if not path:
+        return client
+
+    mode = cfg_auth.get('cassette_mode') or nsx_cassette.RECORD
+    if mode == nsx_cassette.RECORD:
+        ctx.logger.info("NSX calls will be recorded to %s" % path)
+        return nsx_cassette.RecordingClient(client, path)
+    if mode != nsx_cassette.REPLAY:
+        raise cfy_exc.NonRecoverableError(
+            "Unknown cassette mode %s" % str(mode)
+        )
+
+    latency_scale = cfg_auth.get('cassette_latency')
+    if latency_scale is None:
+        latency_scale = 1
+    try:
+        latency_scale = float(latency_scale)
+    except (TypeError, ValueError) as ex:
+        raise cfy_exc.NonRecoverableError(
+            "Wrong cassette latency %s: %s" % (str(latency_scale), str(ex))
+        )
+    ctx.logger.info("NSX calls will be replayed from %s" % path)
+    return nsx_cassette.ReplayClient(
+        client, nsx_cassette.get_cassette(path), latency_scale
+    )
+
+
+def _instrument_client(client, cfg_auth):
+    """wrap client by recorder of calls, 'call_log', 'slow_call' and
+       'call_summary' in nsx_auth/connection_config.yaml"""
+    log_calls = _auth_flag(cfg_auth, 'call_log')
+    call_summary = _auth_flag(cfg_auth, 'call_summary')
+    slow_call = cfg_auth.get('slow_call') or 0
+    try:
+        slow_call = float(slow_call)
+    except (TypeError, ValueError) as ex:
+        raise cfy_exc.NonRecoverableError(
+            "Wrong slow call threshold %s: %s" % (str(slow_call), str(ex))
+        )
+
+    if not log_calls and not call_summary and slow_call <= 0:
+        return client
+
+    on_summary = None
+    if call_summary and ctx.type == NODE_INSTANCE:
+        on_summary = functools.partial(
+            _save_call_summary, ctx.instance.runtime_properties,
+            ctx.operation.name or 'operation'
+        )
+
+    nsx_call_log.install_response_hook(client)
+    # logger is selected in operation thread, proxy can be used
+    # from worker threads without ctx
+    return nsx_call_log.InstrumentedClient(
+        client, ctx.logger, log_calls, max(slow_call, 0), on_summary
+    )
+
+
 def check_raw_result(result_raw):
     """check that we have 'success' http status"""
     if result_raw['status'] < 200 or result_raw['status'] >= 300:
@@ -368,9 +989,9 @@ def nsx_struct_get_list(nsx_object, path):
     """create path to searched part and convert part to list"""
     path_list = path.split("/")
     selected_obj = nsx_object
-    # select parent
+    # select parent, empty xml element is None
     for path in path_list[:-1]:
-        if path not in selected_obj:
+        if not selected_obj.get(path):
             selected_obj[path] = {}
         selected_obj = selected_obj[path]
 
@@ -378,7 +999,7 @@ def nsx_struct_get_list(nsx_object, path):
     last_part = path_list[-1]
 
     # create if not exist
-    if last_part not in selected_obj:
+    if not selected_obj.get(last_part):
         selected_obj[last_part] = []
 
     # convert dict to list
@@ -388,30 +1009,194 @@ def nsx_struct_get_list(nsx_object, path):
     return selected_obj[last_part]
 
 
-def nsx_search(client_session, path, name, searched_resource, **kwargs):
-    """search object by name in path in response
-       from nsx_read(searched_resource, **kwargs)
-       and return object_id, object"""
+def nsx_read_pages(client_session, path, searched_resource, page_size=None,
+                   **kwargs):
+    """generator of (objects, last_page) from list in path of response
+       from nsx_read(searched_resource, **kwargs), with page_size list is
+       read by pages with startIndex/pageSize, next page is requested
+       only when previous has been processed"""
 
     path_list = path.split("/")
     first_part = "/".join(path_list[:-1])
     last_part = path_list[-1]
 
-    nsx_object = nsx_read(
-        client_session, first_part, searched_resource, **kwargs
+    start_index = 0
+    while True:
+        read_kwargs = kwargs
+        if page_size:
+            query_parameters = dict(kwargs.get('query_parameters_dict') or {})
+            query_parameters['startIndex'] = str(start_index)
+            query_parameters['pageSize'] = str(page_size)
+            read_kwargs = dict(kwargs, query_parameters_dict=query_parameters)
+
+        nsx_object = nsx_read(
+            client_session, first_part, searched_resource, **read_kwargs
+        )
+
+        if not nsx_object:
+            yield [], True
+            return
+
+        objects = nsx_struct_get_list(nsx_object, last_part)
+        start_index += len(objects)
+
+        # nsx without paging support returns full list without pagingInfo
+        paging_info = nsx_object.get('pagingInfo') if page_size else None
+        last_page = (
+            not paging_info or not objects or
+            start_index >= int(paging_info.get('totalCount') or 0)
+        )
+
+        yield objects, last_page
+
+        if last_page:
+            return
+
+
+def nsx_search(client_session, path, name, searched_resource, page_size=None,
+               **kwargs):
+    """search object by name in path in response
+       from nsx_read(searched_resource, **kwargs)
+       and return object_id, object, pages after page with
+       such object are not requested"""
+
+    for nsx_objects, _ in nsx_read_pages(
+        client_session, path, searched_resource, page_size, **kwargs
+    ):
+        for nsx_object in nsx_objects:
+            if 'name' in nsx_object:
+                if str(nsx_object['name']) == str(name):
+                    return nsx_object['objectId'], nsx_object
+
+    return None, None
+
+
+def _inventory_listing(client_session, path, searched_resource, **kwargs):
+    """objects from all pages of listing"""
+    listing = []
+    for objects, _ in nsx_read_pages(
+        client_session, path, searched_resource, **kwargs
+    ):
+        listing.extend(objects)
+    return listing
+
+
+def _inventory_edges(client_session, edge_type):
+    """edges of one type, esg and dlr can have same name"""
+    return [
+        edge for edge in client_session.read_all_pages('nsxEdges', 'read')
+        if edge.get('edgeType') == edge_type
+    ]
+
+
+# readers of full listing for each type of objects in inventory,
+# called with client_session and scope
+INVENTORY_LISTINGS = {
+    'esg': lambda client_session, scope: _inventory_edges(
+        client_session, 'gatewayServices'
+    ),
+    'dlr': lambda client_session, scope: _inventory_edges(
+        client_session, 'distributedRouter'
+    ),
+    'lswitch': lambda client_session, scope: client_session.read_all_pages(
+        'logicalSwitchesGlobal', 'read'
+    ),
+    'tag': lambda client_session, scope: _inventory_listing(
+        client_session, 'body/securityTags/securityTag', 'securityTag',
+        page_size=SEARCH_PAGE_SIZE
+    ),
+    'group': lambda client_session, scope: _inventory_listing(
+        client_session, 'body/list/securitygroup', 'secGroupScope',
+        page_size=SEARCH_PAGE_SIZE, uri_parameters={'scopeId': scope}
+    ),
+    'policy': lambda client_session, scope: _inventory_listing(
+        client_session, 'body/securityPolicies/securityPolicy',
+        'securityPolicyID', uri_parameters={'ID': "all"}
     )
+}
 
-    if not nsx_object:
-        return None, None
 
-    nsx_objects = nsx_struct_get_list(nsx_object, last_part)
+def get_multi_vm_tag(kwargs):
+    """nsx supports attach of tag to many vms by one request,
+       'multi_vm_tag' in nsx_auth/connection_config.yaml"""
+    return _auth_flag(_nsx_auth_config(kwargs), 'multi_vm_tag')
 
-    for nsx_object in nsx_objects:
-        if 'name' in nsx_object:
-            if str(nsx_object['name']) == str(name):
-                return nsx_object['objectId'], nsx_object
-    else:
-        return None, None
+
+def get_edge_version_check(kwargs):
+    """check version of edge before skip of unchanged edge settings,
+       'edge_version_check' in nsx_auth/connection_config.yaml"""
+    return _auth_flag(_nsx_auth_config(kwargs), 'edge_version_check')
+
+
+def get_inventory_ttl(kwargs):
+    """time in seconds while ids from inventory are used without
+       check in nsx, 'inventory' in nsx_auth/connection_config.yaml"""
+    ttl = _nsx_auth_config(kwargs).get('inventory') or 0
+    try:
+        return float(ttl)
+    except (TypeError, ValueError) as ex:
+        raise cfy_exc.NonRecoverableError(
+            "Wrong inventory ttl %s: %s" % (str(ttl), str(ex))
+        )
+
+
+def _inventory(kwargs):
+    """inventory, nsx host and ttl, None if inventory is disabled"""
+    ttl = get_inventory_ttl(kwargs)
+    if ttl <= 0:
+        return None
+    if not os.path.isdir(os.path.dirname(INVENTORY_FILE)):
+        return None
+    host = _nsx_auth_config(kwargs).get('host')
+    if not host and ctx.type == NODE_INSTANCE:
+        host = ctx.instance.host_ip
+    return nsx_inventory.Inventory(INVENTORY_FILE), host, ttl
+
+
+def inventory_search(client_session, kwargs, obj_type, name, read_func,
+                     scope=''):
+    """search object by name in inventory and return object_id, None,
+       without inventory return read_func() result"""
+    inventory = _inventory(kwargs)
+    if not inventory:
+        return read_func()
+    storage, host, ttl = inventory
+
+    object_id = storage.get(host, obj_type, scope, name, ttl)
+    if object_id:
+        ctx.logger.info("%s found in inventory" % object_id)
+        return object_id, None
+
+    # we can't trust to miss in inventory, objects can be created by
+    # other tools, so refresh all objects of such type
+    objects = [
+        (str(nsx_object['name']), nsx_object['objectId'])
+        for nsx_object in INVENTORY_LISTINGS[obj_type](client_session, scope)
+        if 'name' in nsx_object
+    ]
+    storage.replace(host, obj_type, scope, objects)
+    ctx.logger.info("Inventory of %s refreshed" % obj_type)
+
+    for object_name, object_id in objects:
+        if object_name == str(name):
+            return object_id, None
+    return None, None
+
+
+def inventory_save(kwargs, obj_type, name, object_id, scope=''):
+    """write object created by plugin to inventory"""
+    inventory = _inventory(kwargs)
+    if inventory and nsx_plan.current() is None:
+        storage, host, _ = inventory
+        storage.put(host, obj_type, scope, name, object_id)
+
+
+def inventory_forget(kwargs, object_id):
+    """drop object deleted by plugin from inventory"""
+    inventory = _inventory(kwargs)
+    if inventory and nsx_plan.current() is None:
+        storage, host, _ = inventory
+        storage.forget(host, object_id)
 
 
 def all_relationships_are_present(relationships,
@@ -11,11 +11,25 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import copy
+import functools
 import nsx_common as common
+import nsx_resource_id as resource_ids
 import nsx_nat as nsx_nat
 from cloudify import exceptions as cfy_exc
 from cloudify import ctx
 
+# edge deploy usually takes 1-3 minutes, poll often at start and
+# return control to cloudify (with retry) after deadline
+EDGE_POLL_POLICY = {
+    'attempts': 60,
+    'delay': 2,
+    'backoff': 1.5,
+    'max_delay': 15,
+    'jitter': 0.1,
+    'deadline': 240
+}
+
 
 def get_edgegateway(client_session, edgeId):
     raw_result = client_session.read('nsxEdge', uri_parameters={
@@ -25,6 +39,95 @@ def get_edgegateway(client_session, edgeId):
     return raw_result['body']['edge']
 
 
+def _normalize_value(value):
+    """convert value to form used by nsx in xml"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, long, float)):
+        return str(value)
+    if value == '':
+        return None
+    return value
+
+
+def diff_fields(current, desired, path=""):
+    """list of fields from desired that have different value in current,
+       fields that are not in desired are ignored"""
+    if isinstance(desired, dict):
+        if not isinstance(current, dict):
+            current = {}
+        changes = []
+        for name in sorted(desired.keys()):
+            changes += diff_fields(
+                current.get(name), desired[name],
+                "%s/%s" % (path, name) if path else name
+            )
+        return changes
+    if isinstance(desired, list):
+        current_list = current if isinstance(current, list) else [current]
+        if (
+            len(current_list) != len(desired) or
+            any(diff_fields(current_item, desired_item)
+                for current_item, desired_item in zip(current_list, desired))
+        ):
+            return [path]
+        return []
+    if _normalize_value(current) != _normalize_value(desired):
+        return [path]
+    return []
+
+
+def update_if_changed(client_session, resource, esg_id, current, desired,
+                      uri_parameters=None):
+    """send desired to nsx only if desired has some difference with current,
+       return list of changed fields"""
+    changes = diff_fields(current, desired)
+    if not changes:
+        ctx.logger.info("%s: no changes for %s" % (resource, esg_id))
+        return changes
+
+    ctx.logger.info("%s: changed %s for %s" % (
+        resource, ", ".join(changes), esg_id
+    ))
+    raw_result = client_session.update(
+        resource, uri_parameters=uri_parameters or {'edgeId': str(esg_id)},
+        request_body_dict=desired
+    )
+    common.check_raw_result(raw_result)
+    return changes
+
+
+def _read_edge_feature(client_session, resource, esg_id):
+    raw_result = client_session.read(
+        resource, uri_parameters={'edgeId': str(esg_id)}
+    )
+    common.check_raw_result(raw_result)
+    return raw_result['body'] or {}
+
+
+def _write_edge_feature(client_session, resource, esg_id, document):
+    raw_result = client_session.update(
+        resource, uri_parameters={'edgeId': str(esg_id)},
+        request_body_dict=document
+    )
+    common.check_raw_result(raw_result)
+
+
+def update_edge_feature(client_session, esg_id, resource, mutation):
+    """read-modify-write of edge feature under lock of feature"""
+    with common.edge_lock(esg_id, resource):
+        return common.versioned_update(
+            functools.partial(
+                _read_edge_feature, client_session, resource, esg_id
+            ),
+            functools.partial(
+                _write_edge_feature, client_session, resource, esg_id
+            ),
+            mutation, edge_document=(esg_id, resource)
+        )
+
+
+@common.edge_locked('interfaces', 'dlr_id')
 def dlr_add_interface(client_session, dlr_id, interface_ls_id, interface_ip,
                       interface_subnet, name=None, vnic=None):
     """
@@ -56,11 +159,12 @@ def dlr_add_interface(client_session, dlr_id, interface_ls_id, interface_ip,
     )
     common.check_raw_result(result_raw)
     ifindex = result_raw['body']['interfaces']['interface']['index']
-    resource_id = "%s|%s" % (ifindex, dlr_id)
+    resource_id = resource_ids.DlrInterfaceId(ifindex, dlr_id).encode()
 
     return ifindex, resource_id
 
 
+@common.edge_locked('firewall')
 def esg_fw_default_set(client_session, esg_id, def_action,
                        logging_enabled=None):
     """
@@ -76,6 +180,11 @@ def esg_fw_default_set(client_session, esg_id, def_action,
     if not logging_enabled:
         logging_enabled = 'false'
 
+    current_policy = common.nsx_read(
+        client_session, 'body',
+        'defaultFirewallPolicy', uri_parameters={'edgeId': esg_id}
+    )
+
     def_policy_body = client_session.extract_resource_body_example(
         'defaultFirewallPolicy', 'update'
     )
@@ -83,24 +192,19 @@ def esg_fw_default_set(client_session, esg_id, def_action,
     firewall_default_policy['action'] = def_action
     firewall_default_policy['loggingEnabled'] = logging_enabled
 
-    cfg_result = client_session.update('defaultFirewallPolicy',
-                                       uri_parameters={'edgeId': esg_id},
-                                       request_body_dict=def_policy_body)
-
-    common.check_raw_result(cfg_result)
+    update_if_changed(
+        client_session, 'defaultFirewallPolicy', esg_id, current_policy,
+        def_policy_body, uri_parameters={'edgeId': esg_id}
+    )
 
 
+@common.edge_locked('interfaces', 'resource_id', 1)
 def dlr_del_interface(client_session, resource_id):
     """
     This function deletes an interface gw to one dlr
     :param resource_id: response from dlr_add_interface
     """
-    try:
-        ifindex, dlr_id = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    ifindex, dlr_id = resource_ids.DlrInterfaceId.decode(resource_id)
 
     result_raw = client_session.delete(
         'interfaces', uri_parameters={'edgeId': dlr_id},
@@ -150,6 +254,7 @@ def get_uplink_vnic(client_session, esg_id, uplink_ls_id):
     )
 
 
+@common.edge_locked('dhcp')
 def dhcp_server(client_session, esg_id, enabled=None, syslog_enabled=None,
                 syslog_level=None):
     """
@@ -213,6 +318,7 @@ def dhcp_server(client_session, esg_id, enabled=None, syslog_enabled=None,
         common.check_raw_result(result)
 
 
+@common.edge_locked('dhcp')
 def update_dhcp_relay(client_session, esg_id, relayServer=None,
                       relayAgents=None):
     current_relay_config = client_session.extract_resource_body_example(
@@ -239,6 +345,7 @@ def del_dhcp_relay(client_session, resource_id):
     common.check_raw_result(raw_result)
 
 
+@common.edge_locked('routing')
 def routing_global_config(client_session, esg_id, enabled,
                           routingGlobalConfig=None, staticRouting=None):
 
@@ -252,22 +359,27 @@ def routing_global_config(client_session, esg_id, enabled,
     if staticRouting:
         routing['routing']['staticRouting'] = staticRouting
 
-    raw_result = client_session.update(
-        'routingConfig', uri_parameters={'edgeId': str(esg_id)},
-        request_body_dict=routing
+    current_routing = common.nsx_read(
+        client_session, 'body',
+        'routingConfig', uri_parameters={'edgeId': str(esg_id)}
     )
 
-    common.check_raw_result(raw_result)
+    update_if_changed(
+        client_session, 'routingConfig', esg_id, current_routing, routing
+    )
 
 
+@common.edge_locked('routing')
 def update_bgp(client_session, esg_id, enabled, defaultOriginate,
                gracefulRestart, redistribution, localAS):
 
-    current_bgp = common.nsx_read(
+    original_bgp = common.nsx_read(
         client_session, 'body',
         'routingBGP', uri_parameters={'edgeId': esg_id}
     )
 
+    current_bgp = copy.deepcopy(original_bgp)
+
     if not current_bgp:
         # for fully "disabled" case
         current_bgp = {
@@ -300,27 +412,17 @@ def update_bgp(client_session, esg_id, enabled, defaultOriginate,
     if localAS:
         current_bgp['bgp']['localAS'] = localAS
 
-    raw_result = client_session.update(
-        'routingBGP', uri_parameters={'edgeId': str(esg_id)},
-        request_body_dict=current_bgp
+    update_if_changed(
+        client_session, 'routingBGP', esg_id, original_bgp, current_bgp
     )
 
-    common.check_raw_result(raw_result)
-
-
-def add_bgp_neighbour(client_session, esg_id, use_existing, ipAddress,
-                      remoteAS, weight, holdDownTimer, keepAliveTimer,
-                      password, protocolAddress, forwardingAddress):
-    current_bgp = common.nsx_read(
-        client_session, 'body',
-        'routingBGP', uri_parameters={'edgeId': esg_id}
-    )
 
-    if not current_bgp:
+def _add_bgp_neighbour(current_bgp, esg_id, use_existing, ipAddress,
+                       remoteAS, weight, holdDownTimer, keepAliveTimer,
+                       password, protocolAddress, forwardingAddress):
+    if not current_bgp.get('bgp'):
         # for fully "disabled" case
-        current_bgp = {
-            'bgp': {}
-        }
+        current_bgp['bgp'] = {}
 
     if not current_bgp['bgp'].get('bgpNeighbours'):
         current_bgp['bgp']['bgpNeighbours'] = {}
@@ -387,17 +489,22 @@ def add_bgp_neighbour(client_session, esg_id, use_existing, ipAddress,
                 bgp_neighbour['forwardingAddress'] = forwardingAddress
             bgp_neighbours.append(bgp_neighbour)
 
-    raw_result = client_session.update(
-        'routingBGP', uri_parameters={'edgeId': str(esg_id)},
-        request_body_dict=current_bgp
-    )
+    return resource_ids.BgpNeighbourId(
+        esg_id, ipAddress, remoteAS, protocolAddress, forwardingAddress
+    ).encode()
 
-    common.check_raw_result(raw_result)
 
-    return "%s|%s|%s|%s|%s" % (
-        esg_id, ipAddress, remoteAS,
-        protocolAddress if protocolAddress else "",
-        forwardingAddress if forwardingAddress else ""
+def add_bgp_neighbour(client_session, esg_id, use_existing, ipAddress,
+                      remoteAS, weight, holdDownTimer, keepAliveTimer,
+                      password, protocolAddress, forwardingAddress):
+    return update_edge_feature(
+        client_session, esg_id, 'routingBGP', functools.partial(
+            _add_bgp_neighbour, esg_id=esg_id, use_existing=use_existing,
+            ipAddress=ipAddress, remoteAS=remoteAS, weight=weight,
+            holdDownTimer=holdDownTimer, keepAliveTimer=keepAliveTimer,
+            password=password, protocolAddress=protocolAddress,
+            forwardingAddress=forwardingAddress
+        )
     )
 
 
@@ -408,15 +515,41 @@ def del_edge(client_session, resource_id):
     common.check_raw_result(raw_result)
 
 
-def del_bgp_neighbour(client_session, resource_id):
-    try:
-        ids = resource_id.split("|")
-
-        esg_id, ipAddress, remoteAS, protocolAddress, forwardingAddress = ids
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
+def get_edge_vm_id(edge):
+    """vm id of first deployed appliance or None"""
+    appliances = common.nsx_struct_get_list(edge, "appliances/appliance")
+    for appliance in appliances:
+        if appliance.get('vmId'):
+            return appliance['vmId']
+    return None
+
+
+def edge_deployed(client_session, edge_id):
+    """edge description if edge has deployed appliance, None otherwise"""
+    edge = get_edgegateway(client_session, edge_id)
+    if get_edge_vm_id(edge):
+        return edge
+    return None
+
+
+def wait_edge_deployed(client_session, edge_id, kwargs):
+    """poll edge status until appliance has been deployed,
+       return edge description or None if we run out of time"""
+    return common.wait_for(
+        edge_deployed,
+        client_session=client_session,
+        edge_id=edge_id,
+        retry_policy=common.get_retry_policy(
+            kwargs, 'edge_poll', **EDGE_POLL_POLICY
         )
+    )
+
+
+@common.edge_locked('routing', 'resource_id', 0)
+def del_bgp_neighbour(client_session, resource_id):
+    esg_id, ipAddress, remoteAS, protocolAddress, forwardingAddress = (
+        resource_ids.BgpNeighbourId.decode(resource_id)
+    )
 
     current_bgp = common.nsx_read(
         client_session, 'body',
@@ -466,17 +599,13 @@ def del_bgp_neighbour(client_session, resource_id):
     common.check_raw_result(raw_result)
 
 
+@common.edge_locked('routing', 'neighbour_id', 0)
 def add_bgp_neighbour_filter(client_session, use_existing, neighbour_id,
                              action, ipPrefixGe, ipPrefixLe, direction,
                              network):
-    try:
-        ids = neighbour_id.split("|")
-
-        esg_id, ipAddress, remoteAS, protocolAddress, forwardingAddress = ids
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    esg_id, ipAddress, remoteAS, protocolAddress, forwardingAddress = (
+        resource_ids.BgpNeighbourId.decode(neighbour_id)
+    )
 
     current_bgp = common.nsx_read(
         client_session, 'body',
@@ -575,21 +704,17 @@ def add_bgp_neighbour_filter(client_session, use_existing, neighbour_id,
 
     common.check_raw_result(raw_result)
 
-    return str(network) + "|" + neighbour_id
+    return resource_ids.BgpNeighbourFilterId.from_neighbour(
+        network, neighbour_id
+    ).encode()
 
 
+@common.edge_locked('routing', 'resource_id', 1)
 def del_bgp_neighbour_filter(client_session, resource_id):
-    ids = resource_id.split("|")
-    if len(ids) != 6:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID'
-        )
-    network = ids[0]
-    esg_id = ids[1]
-    ipAddress = ids[2]
-    remoteAS = ids[3]
-    protocolAddress = ids[4]
-    forwardingAddress = ids[5]
+    (
+        network, esg_id, ipAddress, remoteAS, protocolAddress,
+        forwardingAddress
+    ) = resource_ids.BgpNeighbourFilterId.decode(resource_id)
 
     current_bgp = common.nsx_read(
         client_session, 'body',
@@ -659,6 +784,7 @@ def del_bgp_neighbour_filter(client_session, resource_id):
     common.check_raw_result(raw_result)
 
 
+@common.edge_locked('routing')
 def ospf_create(client_session, esg_id, enabled, defaultOriginate,
                 gracefulRestart, redistribution, protocolAddress=None,
                 forwardingAddress=None):
@@ -668,7 +794,9 @@ def ospf_create(client_session, esg_id, enabled, defaultOriginate,
 
     common.check_raw_result(raw_result)
 
-    current_ospf = raw_result['body']
+    original_ospf = raw_result['body']
+
+    current_ospf = copy.deepcopy(original_ospf)
 
     if not current_ospf:
         # for fully "disabled" case
@@ -705,22 +833,14 @@ def ospf_create(client_session, esg_id, enabled, defaultOriginate,
     if forwardingAddress:
         current_ospf['ospf']['forwardingAddress'] = forwardingAddress
 
-    raw_result = client_session.update(
-        'routingOSPF', uri_parameters={'edgeId': str(esg_id)},
-        request_body_dict=current_ospf
+    update_if_changed(
+        client_session, 'routingOSPF', esg_id, original_ospf, current_ospf
     )
 
-    common.check_raw_result(raw_result)
-
-
-def add_esg_ospf_area(client_session, esg_id, area_id, use_existing, area_type,
-                      auth):
-    raw_result = client_session.read(
-        'routingOSPF', uri_parameters={'edgeId': esg_id})
-
-    common.check_raw_result(raw_result)
 
-    ospf = raw_result['body']
+def _add_esg_ospf_area(ospf, esg_id, area_id, use_existing, area_type, auth):
+    if not ospf.get('ospf'):
+        ospf['ospf'] = {}
 
     if not ospf['ospf'].get('ospfAreas'):
         ospf['ospf']['ospfAreas'] = {}
@@ -760,25 +880,23 @@ def add_esg_ospf_area(client_session, esg_id, area_id, use_existing, area_type,
                 'type': area_type,
                 'authentication': auth})
 
-    raw_result = client_session.update(
-        'routingOSPF', uri_parameters={'edgeId': esg_id},
-        request_body_dict=ospf
-    )
-
-    common.check_raw_result(raw_result)
-
-    return "%s|%s" % (esg_id, area_id)
+    return resource_ids.OspfAreaId(esg_id, area_id).encode()
 
 
-def add_esg_ospf_interface(client_session, esg_id, area_id, vnic, use_existing,
-                           hello_interval, dead_interval, priority, cost):
+def add_esg_ospf_area(client_session, esg_id, area_id, use_existing, area_type,
+                      auth):
+    return update_edge_feature(
+        client_session, esg_id, 'routingOSPF', functools.partial(
+            _add_esg_ospf_area, esg_id=esg_id, area_id=area_id,
+            use_existing=use_existing, area_type=area_type, auth=auth
+        )
+    )
 
-    raw_result = client_session.read(
-        'routingOSPF', uri_parameters={'edgeId': esg_id})
 
-    common.check_raw_result(raw_result)
-
-    ospf = raw_result['body']
+def _add_esg_ospf_interface(ospf, esg_id, area_id, vnic, use_existing,
+                            hello_interval, dead_interval, priority, cost):
+    if not ospf.get('ospf'):
+        ospf['ospf'] = {}
 
     if not ospf['ospf'].get('ospfInterfaces'):
         ospf['ospf']['ospfInterfaces'] = {}
@@ -827,23 +945,24 @@ def add_esg_ospf_interface(client_session, esg_id, area_id, vnic, use_existing,
                 'priority': priority,
                 'cost': cost})
 
-    raw_result = client_session.update(
-        'routingOSPF', uri_parameters={'edgeId': esg_id},
-        request_body_dict=ospf
-    )
+    return resource_ids.OspfInterfaceId(esg_id, area_id, vnic).encode()
 
-    common.check_raw_result(raw_result)
 
-    return "%s|%s|%s" % (esg_id, area_id, vnic)
+def add_esg_ospf_interface(client_session, esg_id, area_id, vnic, use_existing,
+                           hello_interval, dead_interval, priority, cost):
+    return update_edge_feature(
+        client_session, esg_id, 'routingOSPF', functools.partial(
+            _add_esg_ospf_interface, esg_id=esg_id, area_id=area_id,
+            vnic=vnic, use_existing=use_existing,
+            hello_interval=hello_interval, dead_interval=dead_interval,
+            priority=priority, cost=cost
+        )
+    )
 
 
+@common.edge_locked('routing', 'resource_id', 0)
 def del_esg_ospf_area(client_session, resource_id):
-    try:
-        esg_id, area_id = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    esg_id, area_id = resource_ids.OspfAreaId.decode(resource_id)
 
     raw_result = client_session.read(
         'routingOSPF', uri_parameters={'edgeId': esg_id})
@@ -876,13 +995,9 @@ def del_esg_ospf_area(client_session, resource_id):
     common.check_raw_result(raw_result)
 
 
+@common.edge_locked('routing', 'resource_id', 0)
 def del_esg_ospf_interface(client_session, resource_id):
-    try:
-        esg_id, area_id, vnic = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    esg_id, area_id, vnic = resource_ids.OspfInterfaceId.decode(resource_id)
 
     raw_result = client_session.read(
         'routingOSPF', uri_parameters={'edgeId': esg_id})
@@ -920,6 +1035,7 @@ def del_esg_ospf_interface(client_session, resource_id):
     common.check_raw_result(raw_result)
 
 
+@common.edge_locked('interfaces')
 def esg_cfg_interface(client_session, esg_id, ifindex, ipaddr=None,
                       netmask=None, prefixlen=None, name=None, mtu=None,
                       is_connected=None, portgroup_id=None, vnic_type=None,
@@ -987,9 +1103,10 @@ def esg_cfg_interface(client_session, esg_id, ifindex, ipaddr=None,
         'vnic', uri_parameters={'index': ifindex, 'edgeId': esg_id},
         request_body_dict=vnic_config)
     common.check_raw_result(cfg_result)
-    return ifindex, "%s|%s" % (ifindex, esg_id)
+    return ifindex, resource_ids.EsgInterfaceId(ifindex, esg_id).encode()
 
 
+@common.edge_locked('interfaces', 'resource_id', 1)
 def esg_clear_interface(client_session, resource_id):
     """
     This function resets the vnic configuration of an ESG to its default
@@ -998,12 +1115,7 @@ def esg_clear_interface(client_session, resource_id):
     :param resource_id: response from esg_cfg_interface
     :return: Returns True on successful configuration of the Interface
     """
-    try:
-        ifindex, esg_id = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    ifindex, esg_id = resource_ids.EsgInterfaceId.decode(resource_id)
 
     vnic_config = client_session.read(
         'vnic', uri_parameters={'index': ifindex, 'edgeId': esg_id}
@@ -1036,196 +1148,121 @@ def remove_properties_edges():
     common.remove_properties('ospf')
     common.remove_properties('bgp')
     common.remove_properties('nat')
+    common.remove_properties('edge_fingerprints')
 
 
-def update_common_edges(client_session, resource_id, kwargs, esg_restriction):
+def _edge_section(obj, name):
+    """sub dictionary, create if not exists or empty"""
+    if not obj.get(name):
+        obj[name] = {}
+    return obj[name]
 
-    validation_rules_firewall = {
-        "action": {
-            "default": "accept"
-        },
-        "logging": {
-            "default": False,
-            "type": "boolean"
-        }
-    }
-
-    _, firewall = common.get_properties_and_validate(
-        'firewall', kwargs, validation_rules_firewall
-    )
-
-    esg_fw_default_set(
-        client_session,
-        resource_id,
-        firewall['action'],
-        firewall['logging']
-    )
 
-    validation_rules_dhcp = {
-        "enabled": {
-            "default": True,
-            "type": "boolean"
-        },
-        "syslog_enabled": {
-            "default": False,
-            "type": "boolean"
-        },
-        "syslog_level": {
-            "default": "INFO",
-            "caseinsensitive": True,
-            "values": [
-                "EMERGENCY",
-                "ALERT",
-                "CRITICAL",
-                "ERROR",
-                "WARNING",
-                "NOTICE",
-                "INFO",
-                "DEBUG"
-            ]
-        }
-    }
+def _merge_section(section, settings):
+    """set fields from settings to section, other fields of section are
+       kept (ip prefixes and static routes from child nodes)"""
+    for name, value in settings.items():
+        if isinstance(value, dict) and isinstance(section.get(name), dict):
+            _merge_section(section[name], value)
+        else:
+            section[name] = copy.deepcopy(value)
 
-    _, dhcp = common.get_properties_and_validate(
-        'dhcp', kwargs, validation_rules_dhcp
-    )
 
-    dhcp_server(
-        client_session,
-        resource_id,
-        dhcp['enabled'],
-        dhcp['syslog_enabled'],
-        dhcp['syslog_level']
-    )
+def compose_edge_features(edge, firewall, dhcp, routing, ospf, bgp,
+                          nat=None):
+    """apply validated features settings to edge description in memory,
+       same changes as esg_fw_default_set, dhcp_server,
+       routing_global_config, update_bgp, ospf_create and nat_service,
+       features with None settings are not changed"""
+    features = _edge_section(edge, 'features')
 
-    validation_rules_routing = {
-        "enabled": {
-            "default": True,
-            "type": "boolean"
-        },
-        "staticRouting": {
-            "set_none": True,
-            "sub": {
-                "defaultRoute": {
-                    "set_none": True,
-                    "sub": {
-                        "gatewayAddress": {
-                            "set_none": True
-                        },
-                        "vnic": {
-                            "set_none": True
-                        },
-                        "mtu": {
-                            "set_none": True
-                        }
-                    }
-                }
-            }
-        },
-        "routingGlobalConfig": {
-            "sub": {
-                "routerId": {
-                    "set_none": True
-                },
-                "ecmp": {
-                    "default": False,
-                    "type": "boolean"
-                },
-                "logging": {
-                    "sub": {
-                        "logLevel": {
-                            "default": "INFO",
-                            "caseinsensitive": True,
-                            "values": [
-                                "EMERGENCY",
-                                "ALERT",
-                                "CRITICAL",
-                                "ERROR",
-                                "WARNING",
-                                "NOTICE",
-                                "INFO",
-                                "DEBUG"
-                            ]
-                        },
-                        "enable": {
-                            "default": False,
-                            "type": "boolean"
-                        }
-                    }
-                }
-            }
-        }
-    }
+    # firewall
+    if firewall is not None:
+        default_policy = _edge_section(
+            _edge_section(features, 'firewall'), 'defaultPolicy'
+        )
+        default_policy['action'] = firewall['action']
+        common.set_boolean_property(
+            default_policy, 'loggingEnabled', firewall['logging']
+        )
 
-    _, routing = common.get_properties_and_validate(
-        'routing', kwargs, validation_rules_routing
-    )
-    routing_global_config(
-        client_session, resource_id,
-        routing['enabled'], routing['routingGlobalConfig'],
-        routing['staticRouting']
-    )
+    # dhcp
+    if dhcp is not None:
+        dhcp_feature = _edge_section(features, 'dhcp')
+        common.set_boolean_property(dhcp_feature, 'enabled', dhcp['enabled'])
+        dhcp_logging = _edge_section(dhcp_feature, 'logging')
+        common.set_boolean_property(
+            dhcp_logging, 'enable', dhcp['syslog_enabled']
+        )
+        if dhcp['syslog_level']:
+            dhcp_logging['logLevel'] = dhcp['syslog_level']
+
+    # routing
+    if routing is not None:
+        routing_feature = _edge_section(features, 'routing')
+        common.set_boolean_property(
+            routing_feature, 'enabled', routing['enabled']
+        )
+        for name in ['routingGlobalConfig', 'staticRouting']:
+            if routing[name]:
+                _merge_section(
+                    _edge_section(routing_feature, name), routing[name]
+                )
+
+    # ospf/bgp
+    for name, settings in [('ospf', ospf), ('bgp', bgp)]:
+        if settings is None:
+            continue
+        protocol = _edge_section(_edge_section(features, 'routing'), name)
+        for field in ['enabled', 'defaultOriginate', 'gracefulRestart']:
+            common.set_boolean_property(protocol, field, settings[field])
+        common.set_boolean_property(
+            _edge_section(protocol, 'redistribution'), 'enabled',
+            settings['redistribution']
+        )
+        for field in ['protocolAddress', 'forwardingAddress', 'localAS']:
+            if settings.get(field):
+                protocol[field] = settings[field]
+
+    # nat, only esg
+    if nat:
+        common.set_boolean_property(
+            _edge_section(features, 'nat'), 'enabled', nat['enabled']
+        )
 
-    validation_rules_ospf = {
-        "enabled": {
-            "default": False,
-            "type": "boolean"
-        },
-        "defaultOriginate": {
-            "default": False,
-            "type": "boolean"
-        },
-        "gracefulRestart": {
-            "default": False,
-            "type": "boolean"
-        },
-        "redistribution": {
-            "default": False,
-            "type": "boolean"
-        }
-    }
+    return edge
 
-    if not esg_restriction:
-        validation_rules_ospf["protocolAddress"] = {
-            "set_none": True
-        }
-        validation_rules_ospf["forwardingAddress"] = {
-            "set_none": True
-        }
 
-    _, ospf = common.get_properties_and_validate(
-        'ospf', kwargs, validation_rules_ospf
-    )
+def update_edge_features_separately(client_session, resource_id, firewall,
+                                    dhcp, routing, ospf, bgp, nat=None):
+    """update features by separate request for each feature,
+       features with None settings are not changed"""
+    if firewall is not None:
+        esg_fw_default_set(
+            client_session,
+            resource_id,
+            firewall['action'],
+            firewall['logging']
+        )
 
-    validation_rules_bgp = {
-        "enabled": {
-            "default": False,
-            "type": "boolean"
-        },
-        "defaultOriginate": {
-            "default": False,
-            "type": "boolean"
-        },
-        "gracefulRestart": {
-            "default": False,
-            "type": "boolean"
-        },
-        "redistribution": {
-            "default": False,
-            "type": "boolean"
-        },
-        "localAS": {
-            "type": "string",
-            "set_none": True
-        }
-    }
+    if dhcp is not None:
+        dhcp_server(
+            client_session,
+            resource_id,
+            dhcp['enabled'],
+            dhcp['syslog_enabled'],
+            dhcp['syslog_level']
+        )
 
-    _, bgp = common.get_properties_and_validate(
-        'bgp', kwargs, validation_rules_bgp
-    )
+    if routing is not None:
+        routing_global_config(
+            client_session, resource_id,
+            routing['enabled'], routing['routingGlobalConfig'],
+            routing['staticRouting']
+        )
 
     # disable bgp before change ospf (if need)
-    if not bgp['enabled']:
+    if bgp is not None and not bgp['enabled']:
         update_bgp(
             client_session, resource_id,
             bgp['enabled'], bgp['defaultOriginate'],
@@ -1233,22 +1270,16 @@ def update_common_edges(client_session, resource_id, kwargs, esg_restriction):
             bgp['localAS']
         )
 
-    if esg_restriction:
-        ospf_create(
-            client_session, resource_id,
-            ospf['enabled'], ospf['defaultOriginate'],
-            ospf['gracefulRestart'], ospf['redistribution']
-        )
-    else:
+    if ospf is not None:
         ospf_create(
             client_session, resource_id,
             ospf['enabled'], ospf['defaultOriginate'],
             ospf['gracefulRestart'], ospf['redistribution'],
-            ospf['protocolAddress'], ospf['forwardingAddress']
+            ospf.get('protocolAddress'), ospf.get('forwardingAddress')
         )
 
     # enable bgp after change ospf (if need)
-    if bgp['enabled']:
+    if bgp is not None and bgp['enabled']:
         update_bgp(
             client_session, resource_id,
             bgp['enabled'], bgp['defaultOriginate'],
@@ -1256,22 +1287,292 @@ def update_common_edges(client_session, resource_id, kwargs, esg_restriction):
             bgp['localAS']
         )
 
-    if esg_restriction:
-        validation_rules_nat = {
-            "enabled": {
-                "default": True,
+    if nat:
+        nsx_nat.nat_service(
+            client_session,
+            resource_id,
+            nat['enabled']
+        )
+
+
+# sections of edge settings applied by update_common_edges
+EDGE_SECTIONS = ('firewall', 'dhcp', 'routing', 'ospf', 'bgp', 'nat')
+
+# validation of edge features in update_common_edges, prepared on import
+EDGE_FIREWALL_VALIDATOR = common.RulesValidator({
+    "action": {
+        "default": "accept"
+    },
+    "logging": {
+        "default": False,
+        "type": "boolean"
+    }
+})
+
+EDGE_DHCP_VALIDATOR = common.RulesValidator({
+    "enabled": {
+        "default": True,
+        "type": "boolean"
+    },
+    "syslog_enabled": {
+        "default": False,
+        "type": "boolean"
+    },
+    "syslog_level": {
+        "default": "INFO",
+        "caseinsensitive": True,
+        "values": [
+            "EMERGENCY",
+            "ALERT",
+            "CRITICAL",
+            "ERROR",
+            "WARNING",
+            "NOTICE",
+            "INFO",
+            "DEBUG"
+        ]
+    }
+})
+
+EDGE_ROUTING_VALIDATOR = common.RulesValidator({
+    "enabled": {
+        "default": True,
+        "type": "boolean"
+    },
+    "staticRouting": {
+        "set_none": True,
+        "sub": {
+            "defaultRoute": {
+                "set_none": True,
+                "sub": {
+                    "gatewayAddress": {
+                        "set_none": True
+                    },
+                    "vnic": {
+                        "set_none": True
+                    },
+                    "mtu": {
+                        "set_none": True
+                    }
+                }
+            }
+        }
+    },
+    "routingGlobalConfig": {
+        "sub": {
+            "routerId": {
+                "set_none": True
+            },
+            "ecmp": {
+                "default": False,
                 "type": "boolean"
+            },
+            "logging": {
+                "sub": {
+                    "logLevel": {
+                        "default": "INFO",
+                        "caseinsensitive": True,
+                        "values": [
+                            "EMERGENCY",
+                            "ALERT",
+                            "CRITICAL",
+                            "ERROR",
+                            "WARNING",
+                            "NOTICE",
+                            "INFO",
+                            "DEBUG"
+                        ]
+                    },
+                    "enable": {
+                        "default": False,
+                        "type": "boolean"
+                    }
+                }
             }
         }
+    }
+})
+
+_EDGE_OSPF_RULES = {
+    "enabled": {
+        "default": False,
+        "type": "boolean"
+    },
+    "defaultOriginate": {
+        "default": False,
+        "type": "boolean"
+    },
+    "gracefulRestart": {
+        "default": False,
+        "type": "boolean"
+    },
+    "redistribution": {
+        "default": False,
+        "type": "boolean"
+    }
+}
+
+EDGE_OSPF_VALIDATOR = common.RulesValidator(_EDGE_OSPF_RULES)
+
+DLR_OSPF_VALIDATOR = common.RulesValidator(dict(
+    _EDGE_OSPF_RULES,
+    protocolAddress={
+        "set_none": True
+    },
+    forwardingAddress={
+        "set_none": True
+    }
+))
+
+EDGE_BGP_VALIDATOR = common.RulesValidator({
+    "enabled": {
+        "default": False,
+        "type": "boolean"
+    },
+    "defaultOriginate": {
+        "default": False,
+        "type": "boolean"
+    },
+    "gracefulRestart": {
+        "default": False,
+        "type": "boolean"
+    },
+    "redistribution": {
+        "default": False,
+        "type": "boolean"
+    },
+    "localAS": {
+        "type": "string",
+        "set_none": True
+    }
+})
+
+EDGE_NAT_VALIDATOR = common.RulesValidator({
+    "enabled": {
+        "default": True,
+        "type": "boolean"
+    }
+})
+
+
+def edge_fingerprints(sections):
+    """hash of each validated section of edge settings, None sections
+       are skipped"""
+    return dict(
+        (name, common.document_version(settings))
+        for name, settings in sections.items()
+        if settings is not None
+    )
+
+
+def edge_version(edge):
+    """version of edge configuration, nsx increases it on each change"""
+    version = edge.get('version')
+    return str(version) if version is not None else None
 
+
+def _apply_edge_sections(client_session, resource_id, edge, sections):
+    """apply sections of edge settings, None sections are not changed"""
+    settings = [sections.get(name) for name in EDGE_SECTIONS]
+    if edge.get('features'):
+        # update all features by one request
+        original_edge = copy.deepcopy(edge)
+        compose_edge_features(edge, *settings)
+        update_if_changed(
+            client_session, 'nsxEdge', resource_id, {'edge': original_edge},
+            {'edge': edge}, uri_parameters={'edgeId': resource_id}
+        )
+    else:
+        ctx.logger.info("Edge has not returned features, update separately")
+        update_edge_features_separately(
+            client_session, resource_id, *settings
+        )
+
+
+def update_common_edges(client_session, resource_id, kwargs, esg_restriction):
+
+    _, firewall = common.get_properties_and_validate(
+        'firewall', kwargs, EDGE_FIREWALL_VALIDATOR
+    )
+
+    _, dhcp = common.get_properties_and_validate(
+        'dhcp', kwargs, EDGE_DHCP_VALIDATOR
+    )
+
+    _, routing = common.get_properties_and_validate(
+        'routing', kwargs, EDGE_ROUTING_VALIDATOR
+    )
+
+    _, ospf = common.get_properties_and_validate(
+        'ospf', kwargs,
+        EDGE_OSPF_VALIDATOR if esg_restriction else DLR_OSPF_VALIDATOR
+    )
+
+    _, bgp = common.get_properties_and_validate(
+        'bgp', kwargs, EDGE_BGP_VALIDATOR
+    )
+
+    nat = None
+    if esg_restriction:
         _, nat = common.get_properties_and_validate(
-            'nat', kwargs, validation_rules_nat
+            'nat', kwargs, EDGE_NAT_VALIDATOR
         )
 
-        nsx_nat.nat_service(
-            client_session,
-            resource_id,
-            nat['enabled']
+    sections = {
+        'firewall': firewall,
+        'dhcp': dhcp,
+        'routing': routing,
+        'ospf': ospf,
+        'bgp': bgp,
+        'nat': nat
+    }
+    fingerprints = edge_fingerprints(sections)
+    applied = ctx.instance.runtime_properties.get('edge_fingerprints') or {}
+    changed = [
+        name for name in EDGE_SECTIONS
+        if name in fingerprints and
+        (applied.get('sections') or {}).get(name) != fingerprints[name]
+    ]
+    version_check = common.get_edge_version_check(kwargs)
+
+    edge = None
+    if not changed and version_check and applied.get('version'):
+        # cheap check that nobody has changed edge after our apply
+        edge = get_edgegateway(client_session, resource_id)
+        if edge_version(edge) != applied['version']:
+            ctx.logger.info("Edge %s: version %s is changed to %s" % (
+                resource_id, applied['version'], edge_version(edge)
+            ))
+            changed = [name for name in EDGE_SECTIONS if name in fingerprints]
+
+    if changed:
+        ctx.logger.info("Edge %s: apply %s" % (
+            resource_id, ", ".join(changed)
+        ))
+        # update of whole edge replaces documents changed by other nodes,
+        # so edge is read and saved under locks of all such documents
+        with common.edge_locks(resource_id, common.EDGE_WHOLE_DOCUMENTS):
+            edge = get_edgegateway(client_session, resource_id)
+            _apply_edge_sections(
+                client_session, resource_id, edge, dict(
+                    (name, sections[name] if name in changed else None)
+                    for name in EDGE_SECTIONS
+                )
+            )
+            version = edge_version(edge)
+            if version_check:
+                # version is changed by our updates
+                version = edge_version(get_edgegateway(
+                    client_session, resource_id
+                ))
+        ctx.instance.runtime_properties['edge_fingerprints'] = {
+            'sections': fingerprints,
+            'version': version
+        }
+    else:
+        ctx.logger.info(
+            "Edge %s: features are not changed after last apply" %
+            resource_id
         )
 
     if (
@@ -1281,7 +1582,11 @@ def update_common_edges(client_session, resource_id, kwargs, esg_restriction):
         # If you change the following code block you will probably break vRops
         # integration
 
-        parameters = get_edgegateway(client_session, resource_id)
+        parameters = edge or get_edgegateway(client_session, resource_id)
+        if not get_edge_vm_id(parameters):
+            parameters = wait_edge_deployed(
+                client_session, resource_id, kwargs
+            ) or parameters
 
         ctx.instance.runtime_properties['name'] = parameters['name']
 
@@ -1289,14 +1594,9 @@ def update_common_edges(client_session, resource_id, kwargs, esg_restriction):
             "Edge name: %s" % ctx.instance.runtime_properties['name']
         )
 
-        appliances = common.nsx_struct_get_list(parameters,
-                                                "appliances/appliance")
-        vmId = None
-        for appliance in appliances:
-            if 'vmId' in appliance:
-                vmId = appliance['vmId']
-                ctx.logger.info("Base VM: %s" % appliance['vmId'])
-                break
+        vmId = get_edge_vm_id(parameters)
+        if vmId:
+            ctx.logger.info("Base VM: %s" % vmId)
 
         ctx.instance.runtime_properties['vsphere_server_id'] = vmId
 
@@ -1306,19 +1606,9 @@ def update_common_edges(client_session, resource_id, kwargs, esg_restriction):
             )
 
 
-def add_routing_prefix(client_session, use_existing, esg_id, name, ipAddress):
-
-    raw_result = client_session.read(
-        'routingConfig', uri_parameters={'edgeId': str(esg_id)})
-
-    common.check_raw_result(raw_result)
-
-    routing = raw_result['body']
-
-    if not routing:
-        routing = {
-            'routing': {}
-        }
+def _add_routing_prefix(routing, use_existing, esg_id, name, ipAddress):
+    if not routing.get('routing'):
+        routing['routing'] = {}
 
     if not routing['routing'].get('routingGlobalConfig'):
         routing['routing']['routingGlobalConfig'] = {}
@@ -1363,23 +1653,21 @@ def add_routing_prefix(client_session, use_existing, esg_id, name, ipAddress):
             }
             prefixes.append(prefix)
 
-    raw_result = client_session.update(
-        'routingConfig', uri_parameters={'edgeId': str(esg_id)},
-        request_body_dict=routing
-    )
+    return resource_ids.RoutingPrefixId(esg_id, name).encode()
 
-    common.check_raw_result(raw_result)
 
-    return "%s|%s" % (esg_id, name)
+def add_routing_prefix(client_session, use_existing, esg_id, name, ipAddress):
+    return update_edge_feature(
+        client_session, esg_id, 'routingConfig', functools.partial(
+            _add_routing_prefix, use_existing=use_existing, esg_id=esg_id,
+            name=name, ipAddress=ipAddress
+        )
+    )
 
 
+@common.edge_locked('routing', 'resource_id', 0)
 def del_routing_prefix(client_session, resource_id):
-    try:
-        esg_id, name = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    esg_id, name = resource_ids.RoutingPrefixId.decode(resource_id)
 
     raw_result = client_session.read(
         'routingConfig', uri_parameters={'edgeId': str(esg_id)})
@@ -1423,46 +1711,25 @@ def del_routing_prefix(client_session, resource_id):
     common.check_raw_result(raw_result)
 
 
-def add_routing_rule(client_session, use_existing, esg_id, routing_type,
-                     prefixName, routing_from, action):
-
-    # convert boolean to 'correct' string values for routing
-    if routing_from:
-        for key in routing_from:
-            if routing_from[key]:
-                routing_from[key] = "true"
-            else:
-                routing_from[key] = "false"
-
-    raw_result = client_session.read(
-        'routingConfig', uri_parameters={'edgeId': str(esg_id)})
-
-    common.check_raw_result(raw_result)
-
-    routing = raw_result['body']
-
-    if not routing:
-        routing = {
-            'routing': {}
-        }
+def _add_routing_rule(routing, use_existing, esg_id, routing_type,
+                      prefixName, routing_from, action):
+    if not routing.get('routing'):
+        routing['routing'] = {}
 
     # search routing type
-    if routing_type in routing['routing']:
-        routing_sub_dict = routing['routing'][routing_type]
+    routing_sub_dict = routing['routing'].get(routing_type)
 
     if not isinstance(routing_sub_dict, dict):
         routing['routing'][routing_type] = routing_sub_dict = {}
 
     # seach redistribution
-    if 'redistribution' in routing_sub_dict:
-        redistribution = routing_sub_dict['redistribution']
+    redistribution = routing_sub_dict.get('redistribution')
 
     if not isinstance(redistribution, dict):
         redistribution = routing_sub_dict['redistribution'] = {}
 
     # parent rules
-    if 'rules' in redistribution:
-        redistribution_rules = redistribution['rules']
+    redistribution_rules = redistribution.get('rules')
 
     if not isinstance(redistribution_rules, dict):
         redistribution['rules'] = redistribution_rules = {}
@@ -1505,23 +1772,36 @@ def add_routing_rule(client_session, use_existing, esg_id, routing_type,
             }
             rules.append(rule)
 
-    raw_result = client_session.update(
-        'routingConfig', uri_parameters={'edgeId': str(esg_id)},
-        request_body_dict=routing
-    )
+    return resource_ids.RoutingRuleId(
+        esg_id, routing_type, prefixName
+    ).encode()
 
-    common.check_raw_result(raw_result)
 
-    return "%s|%s|%s" % (esg_id, routing_type, prefixName)
+def add_routing_rule(client_session, use_existing, esg_id, routing_type,
+                     prefixName, routing_from, action):
+
+    # convert boolean to 'correct' string values for routing
+    if routing_from:
+        for key in routing_from:
+            if routing_from[key]:
+                routing_from[key] = "true"
+            else:
+                routing_from[key] = "false"
+
+    return update_edge_feature(
+        client_session, esg_id, 'routingConfig', functools.partial(
+            _add_routing_rule, use_existing=use_existing, esg_id=esg_id,
+            routing_type=routing_type, prefixName=prefixName,
+            routing_from=routing_from, action=action
+        )
+    )
 
 
+@common.edge_locked('routing', 'resource_id', 0)
 def del_routing_rule(client_session, resource_id):
-    try:
-        esg_id, routing_type, prefixName = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    esg_id, routing_type, prefixName = resource_ids.RoutingRuleId.decode(
+        resource_id
+    )
 
     raw_result = client_session.read(
         'routingConfig', uri_parameters={'edgeId': str(esg_id)})
@@ -1534,22 +1814,19 @@ def del_routing_rule(client_session, resource_id):
         return
 
     # search routing type
-    if routing_type in routing['routing']:
-        routing_sub_dict = routing['routing'][routing_type]
+    routing_sub_dict = routing['routing'].get(routing_type)
 
     if not isinstance(routing_sub_dict, dict):
         routing['routing'][routing_type] = routing_sub_dict = {}
 
     # seach redistribution
-    if 'redistribution' in routing_sub_dict:
-        redistribution = routing_sub_dict['redistribution']
+    redistribution = routing_sub_dict.get('redistribution')
 
     if not isinstance(redistribution, dict):
         redistribution = routing_sub_dict['redistribution'] = {}
 
     # parent rules
-    if 'rules' in redistribution:
-        redistribution_rules = redistribution['rules']
+    redistribution_rules = redistribution.get('rules')
 
     if not isinstance(redistribution_rules, dict):
         redistribution['rules'] = redistribution_rules = {}
@@ -1583,6 +1860,7 @@ def del_routing_rule(client_session, resource_id):
     common.check_raw_result(raw_result)
 
 
+@common.edge_locked('routing', 'resource_id', 0)
 def esg_dgw_clear(client_session, resource_id):
     """
     This function clears the default gateway config on an ESG
@@ -1590,12 +1868,7 @@ def esg_dgw_clear(client_session, resource_id):
     :param resource_id: response from esg_dgw_set
     :return: True on success, False on failure
     """
-    try:
-        esg_id, _ = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    esg_id, _ = resource_ids.EsgGatewayId.decode(resource_id)
 
     rtg_cfg = client_session.read(
         'routingConfigStatic', uri_parameters={'edgeId': esg_id}
@@ -1609,6 +1882,7 @@ def esg_dgw_clear(client_session, resource_id):
     common.check_raw_result(cfg_result)
 
 
+@common.edge_locked('routing')
 def esg_dgw_set(client_session, esg_id, dgw_ip, vnic, mtu=None,
                 admin_distance=None):
     """
@@ -1641,7 +1915,24 @@ def esg_dgw_set(client_session, esg_id, dgw_ip, vnic, mtu=None,
         request_body_dict=rtg_cfg
     )
     common.check_raw_result(cfg_result)
-    return "%s|%s" % (esg_id, dgw_ip)
+    return resource_ids.EsgGatewayId(esg_id, dgw_ip).encode()
+
+
+def _esg_route_add(rtg_cfg, esg_id, new_route):
+    if not rtg_cfg.get('staticRouting'):
+        rtg_cfg['staticRouting'] = {}
+    if rtg_cfg['staticRouting'].get('staticRoutes'):
+        routes = common.nsx_struct_get_list(
+            rtg_cfg['staticRouting']['staticRoutes'], 'route'
+        )
+    else:
+        routes = []
+    routes.append(new_route)
+    rtg_cfg['staticRouting']['staticRoutes'] = {'route': routes}
+
+    return resource_ids.StaticRouteId(
+        esg_id, new_route['network'], new_route['nextHop']
+    ).encode()
 
 
 def esg_route_add(client_session, esg_id, network, next_hop, vnic=None,
@@ -1665,34 +1956,20 @@ def esg_route_add(client_session, esg_id, network, next_hop, vnic=None,
     if not admin_distance:
         admin_distance = '1'
 
-    rtg_cfg = client_session.read(
-        'routingConfigStatic', uri_parameters={'edgeId': esg_id}
-    )['body']
-    if rtg_cfg['staticRouting']['staticRoutes']:
-        routes = client_session.normalize_list_return(
-            rtg_cfg['staticRouting']['staticRoutes']['route']
-        )
-    else:
-        routes = []
-
     new_route = {
         'vnic': vnic, 'network': network, 'nextHop': next_hop,
         'adminDistance': admin_distance, 'mtu': mtu,
         'description': description
     }
-    routes.append(new_route)
-    rtg_cfg['staticRouting']['staticRoutes'] = {'route': routes}
 
-    cfg_result = client_session.update(
-        'routingConfigStatic', uri_parameters={'edgeId': esg_id},
-        request_body_dict=rtg_cfg
+    return update_edge_feature(
+        client_session, esg_id, 'routingConfigStatic', functools.partial(
+            _esg_route_add, esg_id=esg_id, new_route=new_route
+        )
     )
 
-    common.check_raw_result(cfg_result)
-
-    return "%s|%s|%s" % (esg_id, network, next_hop)
-
 
+@common.edge_locked('routing', 'resource_id', 0)
 def esg_route_del(client_session, resource_id):
     """
     This function deletes a static route to an ESG
@@ -1700,12 +1977,9 @@ def esg_route_del(client_session, resource_id):
     :param resource_id: response from esg_route_add
     :return: True on success, False on failure
     """
-    try:
-        esg_id, network, next_hop = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    esg_id, network, next_hop = resource_ids.StaticRouteId.decode(
+        resource_id
+    )
 
     rtg_cfg = client_session.read(
         'routingConfigStatic', uri_parameters={'edgeId': esg_id}
@@ -1739,6 +2013,42 @@ def esg_route_del(client_session, resource_id):
     common.check_raw_result(cfg_result)
 
 
+def _dhcp_pool(ip_range, default_gateway=None, subnet_mask=None,
+               domain_name=None, dns_server_1=None, dns_server_2=None,
+               lease_time=None, auto_dns=None):
+    """ipPool part of dhcp config"""
+    return {'ipRange': ip_range,
+            'defaultGateway': default_gateway,
+            'subnetMask': subnet_mask,
+            'domainName': domain_name,
+            'primaryNameServer': dns_server_1,
+            'secondaryNameServer': dns_server_2,
+            'leaseTime': lease_time,
+            'autoConfigureDNS': auto_dns}
+
+
+def _dhcp_binding(hostname, ip, mac=None, vm_id=None, vnic_id=None,
+                  default_gateway=None, subnet_mask=None, domain_name=None,
+                  dns_server_1=None, dns_server_2=None, lease_time=None,
+                  auto_dns=None):
+    """staticBinding part of dhcp config, binding by mac if mac is set,
+       otherwise by vm_id/vnic_id"""
+    binding_dict = {
+        'hostname': hostname, 'ipAddress': ip,
+        'defaultGateway': default_gateway, 'subnetMask': subnet_mask,
+        'domainName': domain_name, 'primaryNameServer': dns_server_1,
+        'secondaryNameServer': dns_server_2, 'leaseTime': lease_time,
+        'autoConfigureDNS': auto_dns
+    }
+    if mac:
+        binding_dict['macAddress'] = mac
+    else:
+        binding_dict['vmId'] = vm_id
+        binding_dict['vnicId'] = vnic_id
+    return binding_dict
+
+
+@common.edge_locked('dhcp')
 def add_dhcp_pool(client_session, esg_id, ip_range, default_gateway=None,
                   subnet_mask=None, domain_name=None, dns_server_1=None,
                   dns_server_2=None, lease_time=None, auto_dns=None):
@@ -1775,14 +2085,9 @@ def add_dhcp_pool(client_session, esg_id, ip_range, default_gateway=None,
         DHCP Pool
     """
 
-    dhcp_pool_dict = {'ipRange': ip_range,
-                      'defaultGateway': default_gateway,
-                      'subnetMask': subnet_mask,
-                      'domainName': domain_name,
-                      'primaryNameServer': dns_server_1,
-                      'secondaryNameServer': dns_server_2,
-                      'leaseTime': lease_time,
-                      'autoConfigureDNS': auto_dns}
+    dhcp_pool_dict = _dhcp_pool(ip_range, default_gateway, subnet_mask,
+                                domain_name, dns_server_1, dns_server_2,
+                                lease_time, auto_dns)
 
     result = client_session.create(
         'dhcpPool', uri_parameters={'edgeId': esg_id},
@@ -1791,9 +2096,10 @@ def add_dhcp_pool(client_session, esg_id, ip_range, default_gateway=None,
 
     common.check_raw_result(result)
 
-    return "%s|%s" % (esg_id, result['objectId'])
+    return resource_ids.DhcpPoolId(esg_id, result['objectId']).encode()
 
 
+@common.edge_locked('dhcp', 'resource_id', 0)
 def delete_dhcp_pool(client_session, resource_id):
     """
     This function deletes a DHCP Pools from an edge DHCP Server
@@ -1808,12 +2114,7 @@ def delete_dhcp_pool(client_session, resource_id):
     :return: Returns None if Edge was not found or the operation failed,
         returns true on success
     """
-    try:
-        esg_id, pool_id = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    esg_id, pool_id = resource_ids.DhcpPoolId.decode(resource_id)
 
     result = client_session.delete(
         'dhcpPoolID', uri_parameters={'edgeId': esg_id, 'poolID': pool_id})
@@ -1821,6 +2122,7 @@ def delete_dhcp_pool(client_session, resource_id):
     common.check_raw_result(result)
 
 
+@common.edge_locked('dhcp')
 def add_mac_binding(client_session, esg_id, mac, hostname, ip,
                     default_gateway=None, subnet_mask=None, domain_name=None,
                     dns_server_1=None, dns_server_2=None, lease_time=None,
@@ -1861,22 +2163,22 @@ def add_mac_binding(client_session, esg_id, mac, hostname, ip,
         binding
     """
 
-    binding_dict = {
-        'macAddress': mac, 'hostname': hostname, 'ipAddress': ip,
-        'defaultGateway': default_gateway, 'subnetMask': subnet_mask,
-        'domainName': domain_name, 'primaryNameServer': dns_server_1,
-        'secondaryNameServer': dns_server_2, 'leaseTime': lease_time,
-        'autoConfigureDNS': auto_dns
-    }
+    binding_dict = _dhcp_binding(
+        hostname, ip, mac=mac, default_gateway=default_gateway,
+        subnet_mask=subnet_mask, domain_name=domain_name,
+        dns_server_1=dns_server_1, dns_server_2=dns_server_2,
+        lease_time=lease_time, auto_dns=auto_dns
+    )
 
     result = client_session.create(
         'dhcpStaticBinding', uri_parameters={'edgeId': esg_id},
         request_body_dict={'staticBinding': binding_dict}
     )
     common.check_raw_result(result)
-    return "%s|%s" % (esg_id, result['objectId'])
+    return resource_ids.DhcpBindingId(esg_id, result['objectId']).encode()
 
 
+@common.edge_locked('dhcp')
 def add_vm_binding(client_session, esg_id, vm_id, vnic_id, hostname, ip,
                    default_gateway=None, subnet_mask=None, domain_name=None,
                    dns_server_1=None, dns_server_2=None, lease_time=None,
@@ -1921,22 +2223,22 @@ def add_vm_binding(client_session, esg_id, vm_id, vnic_id, hostname, ip,
         binding
     """
 
-    binding_dict = {'vmId': vm_id, 'vnicId': vnic_id, 'hostname': hostname,
-                    'ipAddress': ip, 'defaultGateway': default_gateway,
-                    'subnetMask': subnet_mask, 'domainName': domain_name,
-                    'primaryNameServer': dns_server_1,
-                    'secondaryNameServer': dns_server_2,
-                    'leaseTime': lease_time,
-                    'autoConfigureDNS': auto_dns}
+    binding_dict = _dhcp_binding(
+        hostname, ip, vm_id=vm_id, vnic_id=vnic_id,
+        default_gateway=default_gateway, subnet_mask=subnet_mask,
+        domain_name=domain_name, dns_server_1=dns_server_1,
+        dns_server_2=dns_server_2, lease_time=lease_time, auto_dns=auto_dns
+    )
 
     result = client_session.create(
         'dhcpStaticBinding', uri_parameters={'edgeId': esg_id},
         request_body_dict={'staticBinding': binding_dict}
     )
     common.check_raw_result(result)
-    return "%s|%s" % (esg_id, result['objectId'])
+    return resource_ids.DhcpBindingId(esg_id, result['objectId']).encode()
 
 
+@common.edge_locked('dhcp', 'resource_id', 0)
 def delete_dhcp_binding(client_session, resource_id):
     """
     This function deletes a DHCP binding from an edge DHCP Server
@@ -1951,12 +2253,7 @@ def delete_dhcp_binding(client_session, resource_id):
     :return: Returns None if Edge was not found or the operation failed,
         returns true on success
     """
-    try:
-        esg_id, bindingID = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    esg_id, bindingID = resource_ids.DhcpBindingId.decode(resource_id)
 
     result = client_session.delete(
         'dhcpStaticBindingID',
@@ -1964,3 +2261,150 @@ def delete_dhcp_binding(client_session, resource_id):
     )
 
     common.check_raw_result(result)
+
+
+DHCP_POOLS = 'dhcp/ipPools/ipPool'
+DHCP_BINDINGS = 'dhcp/staticBindings/staticBinding'
+
+
+def _dhcp_items(dhcp_config, path):
+    """pools or bindings from dhcp config as list, config is not changed"""
+    part = dhcp_config
+    for name in path.split("/"):
+        part = (part or {}).get(name)
+    if not part:
+        return []
+    return part if isinstance(part, list) else [part]
+
+
+def _set_dhcp_items(dhcp_config, path, items):
+    names = path.split("/")
+    part = dhcp_config
+    for name in names[:-1]:
+        if not part.get(name):
+            part[name] = {}
+        part = part[name]
+    part[names[-1]] = items
+
+
+def _add_dhcp_items(pools, bindings, dhcp_config):
+    """append pools and bindings to dhcp config,
+       return ids of pools and bindings existed before"""
+    existed_pools = _dhcp_items(dhcp_config, DHCP_POOLS)
+    existed_bindings = _dhcp_items(dhcp_config, DHCP_BINDINGS)
+    if pools:
+        _set_dhcp_items(
+            dhcp_config, DHCP_POOLS, existed_pools + copy.deepcopy(pools)
+        )
+    if bindings:
+        _set_dhcp_items(
+            dhcp_config, DHCP_BINDINGS,
+            existed_bindings + copy.deepcopy(bindings)
+        )
+    return (
+        set(pool.get('poolId') for pool in existed_pools),
+        set(binding.get('bindingId') for binding in existed_bindings)
+    )
+
+
+def _new_dhcp_ids(esg_id, items, id_class, id_name, key_name, existed_ids,
+                  requested):
+    """resource ids of created pools or bindings in order of request,
+       created object is found by key (ip range of pool, ip of binding)"""
+    created = [
+        item for item in items
+        if item.get(id_name) and item[id_name] not in existed_ids
+    ]
+    new_ids = []
+    for request in requested:
+        for item in created:
+            if item.get(key_name) == request[key_name]:
+                created.remove(item)
+                new_ids.append(id_class(esg_id, item[id_name]).encode())
+                break
+        else:
+            raise cfy_exc.NonRecoverableError(
+                "Can't find created %s on %s" % (request[key_name], esg_id)
+            )
+    return new_ids
+
+
+def dhcp_bulk_to_resource_id(esg_id, pool_ids, binding_ids):
+    """Generate resource_id from esg_id and resource ids of pools and
+       bindings"""
+    return resource_ids.DhcpBulkId(
+        esg_id,
+        [resource_ids.DhcpPoolId.decode(pool_id).pool_id
+         for pool_id in pool_ids],
+        [resource_ids.DhcpBindingId.decode(binding_id).binding_id
+         for binding_id in binding_ids]
+    ).encode()
+
+
+@common.edge_locked('dhcp')
+def add_dhcp_bulk(client_session, esg_id, pools, bindings):
+    """Add pools and bindings by one update of dhcp config, pools is list
+       of dicts with arguments of add_dhcp_pool, bindings is list of dicts
+       with arguments of _dhcp_binding. Return resource ids of pools and
+       bindings (same as from add_dhcp_pool/add_*_binding) and
+       resource_id for delete_dhcp_bulk"""
+    pools = [_dhcp_pool(**pool) for pool in pools]
+    bindings = [_dhcp_binding(**binding) for binding in bindings]
+
+    existed_pools, existed_bindings = common.versioned_update(
+        functools.partial(_read_edge_feature, client_session, 'dhcp', esg_id),
+        functools.partial(
+            _write_edge_feature, client_session, 'dhcp', esg_id
+        ),
+        functools.partial(_add_dhcp_items, pools, bindings),
+        edge_document=(esg_id, 'dhcp')
+    )
+
+    # nsx has assigned ids to new objects
+    dhcp_config = _read_edge_feature(client_session, 'dhcp', esg_id)
+    pool_ids = _new_dhcp_ids(
+        esg_id, _dhcp_items(dhcp_config, DHCP_POOLS),
+        resource_ids.DhcpPoolId, 'poolId', 'ipRange', existed_pools, pools
+    )
+    binding_ids = _new_dhcp_ids(
+        esg_id, _dhcp_items(dhcp_config, DHCP_BINDINGS),
+        resource_ids.DhcpBindingId, 'bindingId', 'ipAddress',
+        existed_bindings, bindings
+    )
+
+    return pool_ids, binding_ids, dhcp_bulk_to_resource_id(
+        esg_id, pool_ids, binding_ids
+    )
+
+
+def _remove_dhcp_items(pool_ids, binding_ids, dhcp_config):
+    for path, id_name, ids in [
+        (DHCP_POOLS, 'poolId', pool_ids),
+        (DHCP_BINDINGS, 'bindingId', binding_ids)
+    ]:
+        items = _dhcp_items(dhcp_config, path)
+        kept = [item for item in items if item.get(id_name) not in ids]
+        if len(kept) != len(items):
+            _set_dhcp_items(dhcp_config, path, kept)
+
+
+@common.edge_locked('dhcp', 'resource_id', 0)
+def delete_dhcp_bulk(client_session, resource_id):
+    """Delete pools and bindings by one update of dhcp config,
+       as resource_id used response from add_dhcp_bulk"""
+    esg_id, pool_ids, binding_ids = resource_ids.DhcpBulkId.decode(
+        resource_id
+    )
+
+    common.versioned_update(
+        functools.partial(_read_edge_feature, client_session, 'dhcp', esg_id),
+        functools.partial(
+            _write_edge_feature, client_session, 'dhcp', esg_id
+        ),
+        functools.partial(
+            _remove_dhcp_items,
+            set(pool_ids),
+            set(binding_ids)
+        ),
+        edge_document=(esg_id, 'dhcp')
+    )
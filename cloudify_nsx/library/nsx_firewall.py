@@ -12,14 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import nsx_common as common
+import nsx_resource_id as resource_ids
 from cloudify import exceptions as cfy_exc
 
 
-def add_firewall_rule(client_session, esg_id, application='any',
-                      direction='any', name="", loggingEnabled=False,
-                      matchTranslated=False, destination='any',
-                      enabled=True, source='any', action='accept',
-                      ruleTag=None, description=None):
+def _firewall_rule(application='any', direction='any', name="",
+                   loggingEnabled=False, matchTranslated=False,
+                   destination='any', enabled=True, source='any',
+                   action='accept', ruleTag=None, description=None):
+    """firewall rule struct for request"""
 
     firewallRule = {
         'name': name,
@@ -41,9 +42,70 @@ def add_firewall_rule(client_session, esg_id, application='any',
     if description:
         firewallRule['description'] = description
 
+    return firewallRule
+
+
+@common.edge_locked('firewall')
+def add_firewall_rule(client_session, esg_id, application='any',
+                      direction='any', name="", loggingEnabled=False,
+                      matchTranslated=False, destination='any',
+                      enabled=True, source='any', action='accept',
+                      ruleTag=None, description=None):
+
     firewall_spec = {}
     firewall_spec['firewallRules'] = {}
-    firewall_spec['firewallRules']['firewallRule'] = firewallRule
+    firewall_spec['firewallRules']['firewallRule'] = _firewall_rule(
+        application, direction, name, loggingEnabled, matchTranslated,
+        destination, enabled, source, action, ruleTag, description
+    )
+
+    result_raw = client_session.create(
+        'firewallRules', uri_parameters={'edgeId': esg_id},
+        request_body_dict=firewall_spec
+    )
+
+    common.check_raw_result(result_raw)
+
+    return result_raw['objectId'], resource_ids.FirewallRuleId(
+        esg_id, result_raw['objectId']
+    ).encode()
+
+
+def get_firewall_rule_ids(client_session, esg_id):
+    """ids of all rules in edge firewall"""
+    firewall = common.nsx_read(
+        client_session, 'body/firewall',
+        'nsxEdgeFirewallConfig', uri_parameters={'edgeId': esg_id}
+    )
+    if not firewall:
+        return []
+    return [
+        rule['id'] for rule in common.nsx_struct_get_list(
+            firewall, 'firewallRules/firewallRule'
+        ) if rule.get('id')
+    ]
+
+
+def firewall_rules_to_resource_id(esg_id, rule_ids):
+    """Generate resource_id from esg_id/rule_ids"""
+    return resource_ids.FirewallRulesId(esg_id, rule_ids).encode()
+
+
+@common.edge_locked('firewall')
+def add_firewall_rules(client_session, esg_id, rules):
+    """Create all rules by one request, rules is list of dicts with
+       arguments of add_firewall_rule, return ids of rules and
+       resource_id"""
+
+    firewall_spec = {
+        'firewallRules': {
+            'firewallRule': [_firewall_rule(**rule) for rule in rules]
+        }
+    }
+
+    # nsx returns location only for one rule, so new rules are
+    # found by compare with rules before create
+    existed_ids = set(get_firewall_rule_ids(client_session, esg_id))
 
     result_raw = client_session.create(
         'firewallRules', uri_parameters={'edgeId': esg_id},
@@ -52,18 +114,25 @@ def add_firewall_rule(client_session, esg_id, application='any',
 
     common.check_raw_result(result_raw)
 
-    return result_raw['objectId'], "%s|%s" % (esg_id, result_raw['objectId'])
+    rule_ids = [
+        rule_id for rule_id in get_firewall_rule_ids(client_session, esg_id)
+        if rule_id not in existed_ids
+    ]
+
+    if len(rule_ids) != len(rules):
+        raise cfy_exc.NonRecoverableError(
+            "Expected %s new rules on %s, but found: %s" % (
+                len(rules), esg_id, ",".join(rule_ids)
+            )
+        )
+
+    return rule_ids, firewall_rules_to_resource_id(esg_id, rule_ids)
 
 
 def delete_firewall_rule(client_session, resource_id):
     """Delete firewall rule, as resource_id used response
        from add_firewall_rule"""
-    try:
-        esg_id, rule_id = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    esg_id, rule_id = resource_ids.FirewallRuleId.decode(resource_id)
 
     result = client_session.delete(
         'firewallRule', uri_parameters={
@@ -71,3 +140,24 @@ def delete_firewall_rule(client_session, resource_id):
         })
 
     common.check_raw_result(result)
+
+
+@common.edge_locked('firewall', 'resource_id', 0)
+def delete_firewall_rules(client_session, resource_id):
+    """Delete firewall rules, as resource_id used response
+       from add_firewall_rules"""
+    esg_id, rule_ids = resource_ids.FirewallRulesId.decode(resource_id)
+
+    # rules can be already deleted by previous attempt
+    existed_ids = set(get_firewall_rule_ids(client_session, esg_id))
+
+    for rule_id in rule_ids:
+        if rule_id not in existed_ids:
+            continue
+
+        result = client_session.delete(
+            'firewallRule', uri_parameters={
+                'edgeId': esg_id, 'ruleId': rule_id
+            })
+
+        common.check_raw_result(result)
@@ -0,0 +1,111 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Local inventory of nsx objects.
+
+SQLite file with ids of nsx objects by nsx host, object type, scope and name.
+File is shared between operations and agent processes on same host, each
+call uses own short transaction, so parallel operations wait for each other
+only while row is written.
+"""
+import contextlib
+import sqlite3
+import time
+
+# seconds for wait of write lock from other process
+CONNECT_TIMEOUT = 30
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS objects (
+        host TEXT NOT NULL,
+        type TEXT NOT NULL,
+        scope TEXT NOT NULL,
+        name TEXT NOT NULL,
+        object_id TEXT NOT NULL,
+        updated REAL NOT NULL,
+        PRIMARY KEY (host, type, scope, name)
+    )""",
+    """CREATE INDEX IF NOT EXISTS objects_id ON objects (host, object_id)"""
+]
+
+
+class Inventory(object):
+    """ids of nsx objects saved in sqlite file"""
+
+    def __init__(self, path):
+        self.path = path
+        with self._transaction() as conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = sqlite3.connect(self.path, timeout=CONNECT_TIMEOUT)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, host, obj_type, scope, name, ttl):
+        """object id by name, None if not exist or older than ttl"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT object_id, updated FROM objects "
+                "WHERE host = ? AND type = ? AND scope = ? AND name = ?",
+                (str(host), obj_type, str(scope), str(name))
+            ).fetchone()
+        if not row:
+            return None
+        object_id, updated = row
+        if time.time() - updated > ttl:
+            return None
+        # nsxclient does not support unicode strings
+        return str(object_id)
+
+    def put(self, host, obj_type, scope, name, object_id):
+        """save object created by plugin"""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO objects "
+                "(host, type, scope, name, object_id, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (str(host), obj_type, str(scope), str(name),
+                 str(object_id), time.time())
+            )
+
+    def replace(self, host, obj_type, scope, objects):
+        """replace all objects of type in scope by fresh list
+           of (name, object_id), first object with such name wins"""
+        updated = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM objects "
+                "WHERE host = ? AND type = ? AND scope = ?",
+                (str(host), obj_type, str(scope))
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO objects "
+                "(host, type, scope, name, object_id, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(str(host), obj_type, str(scope), str(name),
+                  str(object_id), updated) for name, object_id in objects]
+            )
+
+    def forget(self, host, object_id):
+        """drop object deleted by plugin, ids are unique in nsx"""
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM objects WHERE host = ? AND object_id = ?",
+                (str(host), str(object_id))
+            )
@@ -11,10 +11,13 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import functools
 import nsx_common as common
+import nsx_resource_id as resource_ids
 from cloudify import exceptions as cfy_exc
 
 
+@common.edge_locked('nat')
 def nat_service(client_session, esg_id, enabled):
     change_needed = False
 
@@ -40,14 +43,11 @@ def nat_service(client_session, esg_id, enabled):
         common.check_raw_result(result)
 
 
-def add_nat_rule(client_session, esg_id, action, originalAddress,
-                 translatedAddress, vnic=None, ruleTag=None,
-                 loggingEnabled=False, enabled=True, description='',
-                 protocol='any', translatedPort='any', originalPort='any'):
-
-    nat_spec = client_session.extract_resource_body_example(
-        'edgeNatRules', 'create'
-    )
+def _nat_rule(action, originalAddress, translatedAddress, vnic=None,
+              ruleTag=None, loggingEnabled=False, enabled=True,
+              description='', protocol='any', translatedPort='any',
+              originalPort='any'):
+    """nat rule struct for request"""
 
     nat_rule = {
         'ruleTag': ruleTag,
@@ -57,20 +57,32 @@ def add_nat_rule(client_session, esg_id, action, originalAddress,
         'translatedAddress': translatedAddress,
         'description': description,
         'protocol': protocol,
-        'translatedPort': originalPort,
-        'originalPort': translatedPort
+        'translatedPort': translatedPort,
+        'originalPort': originalPort
     }
 
-    if loggingEnabled:
-        nat_rule['loggingEnabled'] = 'true'
-    else:
-        nat_rule['loggingEnabled'] = 'false'
-    if enabled:
-        nat_rule['enabled'] = 'true'
-    else:
-        nat_rule['enabled'] = 'false'
+    common.set_boolean_property(nat_rule, 'loggingEnabled', loggingEnabled)
+    common.set_boolean_property(nat_rule, 'enabled', enabled)
+
+    return nat_rule
+
+
+@common.edge_locked('nat')
+def add_nat_rule(client_session, esg_id, action, originalAddress,
+                 translatedAddress, vnic=None, ruleTag=None,
+                 loggingEnabled=False, enabled=True, description='',
+                 protocol='any', translatedPort='any', originalPort='any'):
+
+    nat_spec = client_session.extract_resource_body_example(
+        'edgeNatRules', 'create'
+    )
 
-    nat_spec['natRules']['natRule'] = nat_rule
+    # esg_nat always sent ports swapped, blueprints depend on it
+    nat_spec['natRules']['natRule'] = _nat_rule(
+        action, originalAddress, translatedAddress, vnic, ruleTag,
+        loggingEnabled, enabled, description, protocol,
+        translatedPort=originalPort, originalPort=translatedPort
+    )
 
     result_raw = client_session.create(
         'edgeNatRules', uri_parameters={'edgeId': esg_id},
@@ -79,17 +91,108 @@ def add_nat_rule(client_session, esg_id, action, originalAddress,
 
     common.check_raw_result(result_raw)
 
-    return "%s|%s" % (esg_id, result_raw['objectId'])
+    return resource_ids.NatRuleId(esg_id, result_raw['objectId']).encode()
 
 
-def delete_nat_rule(client_session, resource_id):
-    try:
-        esg_id, ruleID = resource_id.split("|")
-    except Exception as ex:
+def _read_nat_config(client_session, esg_id):
+    raw_result = client_session.read(
+        'edgeNat', uri_parameters={'edgeId': esg_id}
+    )
+    common.check_raw_result(raw_result)
+    return raw_result['body']
+
+
+def _write_nat_config(client_session, esg_id, nat_config):
+    raw_result = client_session.update(
+        'edgeNat', uri_parameters={'edgeId': esg_id},
+        request_body_dict=nat_config
+    )
+    common.check_raw_result(raw_result)
+
+
+def _nat_rules(nat_config):
+    """list of rules from nat config"""
+    if not (nat_config.get('nat') or {}).get('natRules'):
+        return []
+    return common.nsx_struct_get_list(nat_config, 'nat/natRules/natRule')
+
+
+def get_nat_rule_ids(client_session, esg_id):
+    """ids of all nat rules on edge"""
+    return [
+        rule['ruleId'] for rule in _nat_rules(
+            _read_nat_config(client_session, esg_id)
+        ) if rule.get('ruleId')
+    ]
+
+
+def nat_rules_to_resource_id(esg_id, rule_ids):
+    """Generate resource_id from esg_id/rule_ids"""
+    return resource_ids.NatRulesId(esg_id, rule_ids).encode()
+
+
+@common.edge_locked('nat')
+def add_nat_rules(client_session, esg_id, rules):
+    """Append all rules by one request, rules is list of dicts with
+       arguments of add_nat_rule, return ids of rules and resource_id"""
+
+    nat_spec = {
+        'natRules': {
+            'natRule': [_nat_rule(**rule) for rule in rules]
+        }
+    }
+
+    # nsx returns location only for one rule, so new rules are
+    # found by compare with rules before create
+    existed_ids = set(get_nat_rule_ids(client_session, esg_id))
+
+    result_raw = client_session.create(
+        'edgeNatRules', uri_parameters={'edgeId': esg_id},
+        request_body_dict=nat_spec
+    )
+
+    common.check_raw_result(result_raw)
+
+    rule_ids = [
+        rule_id for rule_id in get_nat_rule_ids(client_session, esg_id)
+        if rule_id not in existed_ids
+    ]
+
+    if len(rule_ids) != len(rules):
         raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
+            "Expected %s new rules on %s, but found: %s" % (
+                len(rules), esg_id, ",".join(rule_ids)
+            )
         )
+
+    return rule_ids, nat_rules_to_resource_id(esg_id, rule_ids)
+
+
+@common.edge_locked('nat', 'resource_id', 0)
+def delete_nat_rule(client_session, resource_id):
+    esg_id, ruleID = resource_ids.NatRuleId.decode(resource_id)
     result = client_session.delete(
         'edgeNatRule', uri_parameters={'edgeId': esg_id, 'ruleID': ruleID}
     )
     common.check_raw_result(result)
+
+
+def _remove_nat_rules(rule_ids, nat_config):
+    rules = _nat_rules(nat_config)
+    rules[:] = [
+        rule for rule in rules if rule.get('ruleId') not in rule_ids
+    ]
+
+
+@common.edge_locked('nat', 'resource_id', 0)
+def delete_nat_rules(client_session, resource_id):
+    """Delete nat rules by one update of nat config, as resource_id
+       used response from add_nat_rules"""
+    esg_id, rule_ids = resource_ids.NatRulesId.decode(resource_id)
+
+    common.versioned_update(
+        functools.partial(_read_nat_config, client_session, esg_id),
+        functools.partial(_write_nat_config, client_session, esg_id),
+        functools.partial(_remove_nat_rules, set(rule_ids)),
+        edge_document=(esg_id, 'nat')
+    )
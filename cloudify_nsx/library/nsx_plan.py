@@ -0,0 +1,176 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Plan of nsx changes for dry run.
+
+Proxy around client from nsx_login, reads are sent to nsx, each
+create/update/delete is saved to plan with resource name, parameters and
+size of request body and is not sent. Planned calls get success response,
+created objects get ids with PLANNED_PREFIX, requests with such ids can't
+be answered and stop planning.
+
+Plan is selected for current thread by operation, so nsx_login in same
+operation returns planning client.
+"""
+import functools
+import threading
+
+from nsxramlclient import xmloperations
+import nsx_call_log
+
+# methods of client which change objects in nsx
+PLANNED_METHODS = ('create', 'update', 'delete')
+
+# responses of nsx for planned methods
+PLANNED_STATUS = {
+    'create': 201,
+    'update': 204,
+    'delete': 204
+}
+
+# prefix of ids of objects created by plan
+PLANNED_PREFIX = 'dry-run-'
+
+# plan of operation in current thread
+_plans = threading.local()
+
+
+class PlanStopped(Exception):
+    """next request depends on planned change"""
+
+
+def current():
+    """plan of operation in current thread, None without dry run"""
+    return getattr(_plans, 'plan', None)
+
+
+def select(plan):
+    """set plan for current thread, None - disable dry run"""
+    _plans.plan = plan
+
+
+def request_size(request_body_dict):
+    """size of xml which will be sent to nsx"""
+    if not request_body_dict:
+        return 0
+    return len(xmloperations.dict_to_xml(request_body_dict))
+
+
+class Plan(object):
+    """planned calls and counters of calls"""
+
+    def __init__(self):
+        self.calls = []
+        self.reads = 0
+        self.stopped = None
+        self._lock = threading.Lock()
+
+    def add(self, method, resource, uri_parameters, query_parameters,
+            size):
+        with self._lock:
+            self.calls.append({
+                'method': method,
+                'resource': resource,
+                'uri_parameters': uri_parameters or {},
+                'query_parameters': query_parameters or {},
+                'size': size
+            })
+            return PLANNED_PREFIX + str(len(self.calls))
+
+    def add_read(self):
+        with self._lock:
+            self.reads += 1
+
+    def counts(self):
+        """count and size of planned calls, by method and resource"""
+        counts = {
+            'reads': self.reads,
+            'calls': len(self.calls),
+            'size': sum(call['size'] for call in self.calls),
+            'methods': {},
+            'resources': {}
+        }
+        for call in self.calls:
+            counts['methods'][call['method']] = (
+                counts['methods'].get(call['method'], 0) + 1
+            )
+            resource = counts['resources'].setdefault(
+                call['resource'], {'calls': 0, 'size': 0}
+            )
+            resource['calls'] += 1
+            resource['size'] += call['size']
+        return counts
+
+    def to_dict(self):
+        plan = {
+            'calls': list(self.calls),
+            'counts': self.counts(),
+            'complete': self.stopped is None
+        }
+        if self.stopped is not None:
+            plan['stopped'] = self.stopped
+        return plan
+
+
+def _planned_ids(parameters):
+    """values of parameters with ids of planned objects"""
+    if not isinstance(parameters, dict):
+        # pynsxv sends method name as uri parameters in read_all_pages
+        return []
+    return [
+        value for value in parameters.values()
+        if PLANNED_PREFIX in str(value)
+    ]
+
+
+class PlanningClient(nsx_call_log.ClientProxy):
+    """proxy of nsx client which saves changes to plan"""
+
+    def __init__(self, client, plan):
+        self.client = client
+        self.plan = plan
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name in nsx_call_log.CALL_METHODS:
+            return functools.partial(self._call, attr, name)
+        return attr
+
+    def _call(self, func, method, searched_resource, uri_parameters=None,
+              request_body_dict=None, query_parameters_dict=None, **kwargs):
+        planned_ids = _planned_ids(uri_parameters)
+        if planned_ids:
+            raise PlanStopped(
+                "%s %s requires planned %s" % (
+                    method, searched_resource, ", ".join(planned_ids)
+                )
+            )
+        if method not in PLANNED_METHODS:
+            self.plan.add_read()
+            return func(
+                searched_resource, uri_parameters, request_body_dict,
+                query_parameters_dict, **kwargs
+            )
+
+        object_id = self.plan.add(
+            method, searched_resource, uri_parameters,
+            query_parameters_dict, request_size(request_body_dict)
+        )
+        if method != 'create':
+            return {'status': PLANNED_STATUS[method], 'body': None}
+        return {
+            'status': PLANNED_STATUS[method],
+            'body': object_id,
+            'location': '/' + object_id,
+            'objectId': object_id
+        }
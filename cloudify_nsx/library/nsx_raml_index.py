@@ -0,0 +1,165 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Precompiled raml index.
+
+Parse of nsxvapi.raml takes seconds, so we save parsed raml structure
+(resources, uris, methods, body examples and schemas) as compressed pickle
+and reuse it on next login. Index file name contains hash of raml path and
+content, so any change in raml or custom raml path in config creates new
+index. Pickle can run any code on load, so index directory is created
+private and only files owned by current user without write access of
+other users are loaded.
+
+IndexedNsxClient repeats NsxClient.__init__ without raml parse, so index is
+used only with versions of nsxramlclient from SUPPORTED_CLIENT_VERSIONS,
+other versions get usual NsxClient.
+
+Build index before first run:
+
+    python -m cloudify_nsx.library.nsx_raml_index [raml_file] [index_dir]
+"""
+import cPickle
+import hashlib
+import os
+import pkg_resources
+import re
+import stat
+import sys
+import zlib
+
+import pyraml.parser
+from nsxramlclient import http_session
+from nsxramlclient.client import NsxClient, NsxRaml
+
+INDEX_SUFFIX = '.raml.idx'
+
+# versions of nsxramlclient with NsxClient.__init__ same as in
+# IndexedNsxClient, check it before add new version
+SUPPORTED_CLIENT_VERSIONS = ('2.0.7',)
+
+
+def client_version():
+    """installed version of nsxramlclient, None if unknown"""
+    try:
+        return pkg_resources.get_distribution('nsxramlclient').version
+    except pkg_resources.DistributionNotFound:
+        return None
+
+
+def client_supported():
+    """can we create NsxClient from index with installed nsxramlclient"""
+    return client_version() in SUPPORTED_CLIENT_VERSIONS
+
+
+class IndexedNsxClient(NsxClient):
+    """NsxClient created from precompiled raml structure,
+       same as NsxClient but without raml parse, check client_supported
+       before use"""
+
+    def __init__(self, raml_root, raml_file, nsxmanager, nsx_username,
+                 nsx_password):
+        self._nsx_raml_file = raml_file
+        self._nsxraml = NsxRaml.__new__(NsxRaml)
+        self._nsxraml._nsxraml = raml_root
+        self._nsxraml._base_uri = re.sub(
+            r'\{nsxmanager\}', nsxmanager, raml_root.baseUri
+        )
+        self._nsx_username = nsx_username
+        self._nsx_password = nsx_password
+        self._debug = None
+        self._verify = None
+        self._suppress_warnings = True
+        self.fail_mode = 'exit'
+        self._httpsession = http_session.Session(
+            self._nsx_username, self._nsx_password, self._debug,
+            self._verify, self._suppress_warnings, self.fail_mode
+        )
+
+
+def raml_hash(raml_file):
+    """hash of raml path and content, None if raml is not local file"""
+    if not os.path.isfile(raml_file):
+        return None
+    raml_hash = hashlib.sha256(os.path.abspath(raml_file))
+    with open(raml_file, 'rb') as f:
+        raml_hash.update(f.read())
+    return raml_hash.hexdigest()
+
+
+def index_path(index_dir, raml_file):
+    """path to index file for raml, None if raml can't be indexed"""
+    content_hash = raml_hash(raml_file)
+    if not content_hash:
+        return None
+    return os.path.join(index_dir, content_hash + INDEX_SUFFIX)
+
+
+def check_private(path):
+    """raise ValueError if path is not owned by current user or can be
+       changed by other users"""
+    path_stat = os.stat(path)
+    if path_stat.st_uid != os.getuid():
+        raise ValueError("%s is not owned by current user" % path)
+    if path_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise ValueError("%s is writable by other users" % path)
+
+
+def save(index_dir, raml_file, raml_root):
+    """save parsed raml to index, return path to index or None"""
+    path = index_path(index_dir, raml_file)
+    if not path:
+        return None
+    if not os.path.isdir(index_dir):
+        os.makedirs(index_dir, 0o700)
+    check_private(index_dir)
+    data = zlib.compress(cPickle.dumps(raml_root, cPickle.HIGHEST_PROTOCOL))
+    # write to temporary file and rename, parallel workers can read index
+    tmp_path = "%s.%s" % (path, os.getpid())
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.rename(tmp_path, path)
+    return path
+
+
+def load(index_dir, raml_file):
+    """load parsed raml from index, None if we don't have index"""
+    path = index_path(index_dir, raml_file)
+    if not path or not os.path.isfile(path):
+        return None
+    check_private(index_dir)
+    check_private(path)
+    with open(path, 'rb') as f:
+        return cPickle.loads(zlib.decompress(f.read()))
+
+
+def build(index_dir, raml_file):
+    """parse raml and save to index"""
+    return save(index_dir, raml_file, pyraml.parser.load(raml_file))
+
+
+def client_raml_root(client):
+    """parsed raml structure from NsxClient"""
+    return client._nsxraml._nsxraml
+
+
+if __name__ == '__main__':
+    import cloudify_nsx.library.nsx_common as nsx_common
+    raml_file = nsx_common.default_raml_file()
+    index_dir = nsx_common.RAML_INDEX_DIR
+    if len(sys.argv) > 1:
+        raml_file = sys.argv[1]
+    if len(sys.argv) > 2:
+        index_dir = sys.argv[2]
+    print build(index_dir, raml_file)
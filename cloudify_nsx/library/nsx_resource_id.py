@@ -0,0 +1,287 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Resource ids saved in runtime properties.
+
+Resource id is fields of nsx object joined by '|', fields with list of ids
+are joined by ','. Layout is same as in previous versions of plugin, so ids
+saved by them are decoded without changes. Each kind of id has own class
+with fields in __slots__, id is parsed once and checked before any request
+to nsx.
+"""
+from cloudify import exceptions as cfy_exc
+
+SEPARATOR = "|"
+LIST_SEPARATOR = ","
+
+# kind -> class of resource id
+KINDS = {}
+
+
+def _error(message):
+    return cfy_exc.NonRecoverableError(
+        'Unexpected error retrieving resource ID: %s' % message
+    )
+
+
+def register(cls):
+    """class decorator, save resource id class in KINDS"""
+    if cls.kind in KINDS:
+        raise ValueError("Resource id %s is already registered" % cls.kind)
+    cls._is_list = tuple(name in cls.lists for name in cls.__slots__)
+    cls._required = tuple(name not in cls.optional for name in cls.__slots__)
+    KINDS[cls.kind] = cls
+    return cls
+
+
+class ResourceId(object):
+    """base of resource ids, fields of id are listed in __slots__"""
+
+    __slots__ = ()
+
+    kind = None
+    # fields with list of ids
+    lists = ()
+    # fields which can be empty
+    optional = ()
+
+    _is_list = ()
+    _required = ()
+
+    def __init__(self, *values):
+        if len(values) != len(self.__slots__):
+            raise _error("%s id has %s fields instead of %s" % (
+                self.kind, len(values), len(self.__slots__)
+            ))
+        for name, is_list, required, value in zip(
+            self.__slots__, self._is_list, self._required, values
+        ):
+            if is_list:
+                if isinstance(value, basestring):
+                    value = value.split(LIST_SEPARATOR)
+                value = tuple(str(item) for item in value or () if item)
+                separator = any(
+                    SEPARATOR in item or LIST_SEPARATOR in item
+                    for item in value
+                )
+            else:
+                value = "" if value is None else str(value)
+                separator = SEPARATOR in value
+            if separator:
+                raise _error("%s of %s id contains separator" % (
+                    name, self.kind
+                ))
+            if required and not value:
+                raise _error("%s of %s id is empty" % (name, self.kind))
+            setattr(self, name, value)
+
+    @classmethod
+    def decode(cls, resource_id):
+        """parse resource id saved in runtime properties"""
+        if isinstance(resource_id, cls):
+            return resource_id
+        if not isinstance(resource_id, basestring):
+            raise _error("%s id is not string: %r" % (cls.kind, resource_id))
+        return cls(*resource_id.split(SEPARATOR))
+
+    def encode(self):
+        """string for save in runtime properties"""
+        return SEPARATOR.join(
+            LIST_SEPARATOR.join(value) if is_list else value
+            for value, is_list in zip(self, self._is_list)
+        )
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.kind, tuple(self)))
+
+    def __str__(self):
+        return self.encode()
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.encode())
+
+
+def decode(kind, resource_id):
+    """parse resource id of kind"""
+    if kind not in KINDS:
+        raise _error("unknown kind %s" % kind)
+    return KINDS[kind].decode(resource_id)
+
+
+def encode(kind, *values):
+    """resource id of kind from values of fields"""
+    if kind not in KINDS:
+        raise _error("unknown kind %s" % kind)
+    return KINDS[kind](*values).encode()
+
+
+@register
+class TagVmId(ResourceId):
+    kind = 'tag_vm'
+    __slots__ = ('tag_id', 'vm_id')
+
+
+@register
+class TagVmsId(ResourceId):
+    kind = 'tag_vms'
+    __slots__ = ('tag_id', 'vm_ids')
+    # empty if all vms had tag before
+    lists = optional = ('vm_ids',)
+
+
+@register
+class GroupMemberId(ResourceId):
+    kind = 'group_member'
+    __slots__ = ('security_group_id', 'member_id')
+
+
+@register
+class GroupMembersId(ResourceId):
+    kind = 'group_members'
+    __slots__ = ('security_group_id', 'member_ids', 'exclude_member_ids')
+    lists = optional = ('member_ids', 'exclude_member_ids')
+
+
+@register
+class PolicyGroupBindId(ResourceId):
+    kind = 'policy_group_bind'
+    __slots__ = ('security_group_id', 'security_policy_id')
+
+
+@register
+class PolicySectionId(ResourceId):
+    kind = 'policy_section'
+    __slots__ = ('category', 'security_policy_id')
+
+
+@register
+class FirewallRuleId(ResourceId):
+    kind = 'firewall_rule'
+    __slots__ = ('esg_id', 'rule_id')
+
+
+@register
+class FirewallRulesId(ResourceId):
+    kind = 'firewall_rules'
+    __slots__ = ('esg_id', 'rule_ids')
+    lists = ('rule_ids',)
+
+
+@register
+class NatRuleId(ResourceId):
+    kind = 'nat_rule'
+    __slots__ = ('esg_id', 'rule_id')
+
+
+@register
+class NatRulesId(ResourceId):
+    kind = 'nat_rules'
+    __slots__ = ('esg_id', 'rule_ids')
+    lists = ('rule_ids',)
+
+
+@register
+class DlrInterfaceId(ResourceId):
+    kind = 'dlr_interface'
+    __slots__ = ('ifindex', 'dlr_id')
+
+
+@register
+class EsgInterfaceId(ResourceId):
+    kind = 'esg_interface'
+    __slots__ = ('ifindex', 'esg_id')
+
+
+@register
+class EsgGatewayId(ResourceId):
+    kind = 'esg_gateway'
+    __slots__ = ('esg_id', 'dgw_ip')
+
+
+@register
+class StaticRouteId(ResourceId):
+    kind = 'static_route'
+    __slots__ = ('esg_id', 'network', 'next_hop')
+
+
+@register
+class BgpNeighbourId(ResourceId):
+    kind = 'bgp_neighbour'
+    __slots__ = ('esg_id', 'ip_address', 'remote_as', 'protocol_address',
+                 'forwarding_address')
+    optional = ('protocol_address', 'forwarding_address')
+
+
+@register
+class BgpNeighbourFilterId(ResourceId):
+    kind = 'bgp_neighbour_filter'
+    __slots__ = ('network', 'esg_id', 'ip_address', 'remote_as',
+                 'protocol_address', 'forwarding_address')
+    optional = ('protocol_address', 'forwarding_address')
+
+    @classmethod
+    def from_neighbour(cls, network, neighbour_id):
+        """filter id from network and id of bgp neighbour"""
+        return cls(network, *BgpNeighbourId.decode(neighbour_id))
+
+
+@register
+class OspfAreaId(ResourceId):
+    kind = 'ospf_area'
+    __slots__ = ('esg_id', 'area_id')
+
+
+@register
+class OspfInterfaceId(ResourceId):
+    kind = 'ospf_interface'
+    __slots__ = ('esg_id', 'area_id', 'vnic')
+
+
+@register
+class RoutingPrefixId(ResourceId):
+    kind = 'routing_prefix'
+    __slots__ = ('esg_id', 'name')
+
+
+@register
+class RoutingRuleId(ResourceId):
+    kind = 'routing_rule'
+    __slots__ = ('esg_id', 'routing_type', 'prefix_name')
+
+
+@register
+class DhcpPoolId(ResourceId):
+    kind = 'dhcp_pool'
+    __slots__ = ('esg_id', 'pool_id')
+
+
+@register
+class DhcpBindingId(ResourceId):
+    kind = 'dhcp_binding'
+    __slots__ = ('esg_id', 'binding_id')
+
+
+@register
+class DhcpBulkId(ResourceId):
+    kind = 'dhcp_bulk'
+    __slots__ = ('esg_id', 'pool_ids', 'binding_ids')
+    lists = optional = ('pool_ids', 'binding_ids')
@@ -11,14 +11,17 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import functools
 import nsx_common as common
+import nsx_resource_id as resource_ids
 from cloudify import exceptions as cfy_exc
 
 
 def get_group(client_session, scopeId, name):
     return common.nsx_search(
         client_session, 'body/list/securitygroup', name,
-        'secGroupScope', uri_parameters={'scopeId': scopeId}
+        'secGroupScope', page_size=common.SEARCH_PAGE_SIZE,
+        uri_parameters={'scopeId': scopeId}
     )
 
 
@@ -73,7 +76,7 @@ def add_group_exclude_member(client_session, security_group_id, member_id):
 
     common.check_raw_result(raw_result)
 
-    return "%s|%s" % (security_group_id, member_id)
+    return resource_ids.GroupMemberId(security_group_id, member_id).encode()
 
 
 def add_group_member(client_session, security_group_id, member_id):
@@ -86,7 +89,83 @@ def add_group_member(client_session, security_group_id, member_id):
 
     common.check_raw_result(raw_result)
 
-    return "%s|%s" % (security_group_id, member_id)
+    return resource_ids.GroupMemberId(security_group_id, member_id).encode()
+
+
+def _read_group(client_session, security_group_id):
+    return common.nsx_read(
+        client_session, 'body',
+        'secGroupObject', uri_parameters={'objectId': security_group_id}
+    )
+
+
+def _write_group(client_session, security_group_id, security_group):
+    raw_result = client_session.update(
+        'secGroupObject', uri_parameters={'objectId': security_group_id},
+        request_body_dict=security_group
+    )
+
+    common.check_raw_result(raw_result)
+
+
+def _unique(member_ids):
+    """member ids without duplicates in same order"""
+    result = []
+    for member_id in member_ids:
+        if member_id not in result:
+            result.append(member_id)
+    return result
+
+
+def _add_members(member_ids, exclude_member_ids, security_group):
+    """append members absent in group, return ids of appended members"""
+    added = []
+    for path, new_ids in [
+        ('securitygroup/member', member_ids),
+        ('securitygroup/excludeMember', exclude_member_ids)
+    ]:
+        members = common.nsx_struct_get_list(security_group, path)
+        existed_ids = set(member.get("objectId") for member in members)
+        new_ids = [
+            member_id for member_id in new_ids if member_id not in existed_ids
+        ]
+        members += [{"objectId": member_id} for member_id in new_ids]
+        added.append(new_ids)
+    return added
+
+
+def group_members_to_resource_id(security_group_id, member_ids,
+                                 exclude_member_ids):
+    """Generate resource_id from security_group_id and member ids"""
+    return resource_ids.GroupMembersId(
+        security_group_id, member_ids, exclude_member_ids
+    ).encode()
+
+
+def add_group_members(client_session, security_group_id, member_ids,
+                      exclude_member_ids):
+    """Add include and exclude members by one update of group, members
+       already in group are skipped. Return ids of added members and
+       resource_id for del_group_members"""
+    member_ids = _unique(member_ids)
+    exclude_member_ids = _unique(exclude_member_ids)
+
+    both = set(member_ids) & set(exclude_member_ids)
+    if both:
+        raise cfy_exc.NonRecoverableError(
+            "Members %s can't be included and excluded at the same time" %
+            ",".join(sorted(both))
+        )
+
+    member_ids, exclude_member_ids = common.versioned_update(
+        functools.partial(_read_group, client_session, security_group_id),
+        functools.partial(_write_group, client_session, security_group_id),
+        functools.partial(_add_members, member_ids, exclude_member_ids)
+    )
+
+    return member_ids, exclude_member_ids, group_members_to_resource_id(
+        security_group_id, member_ids, exclude_member_ids
+    )
 
 
 def set_dynamic_member(client_session, security_group_id, dynamic_set):
@@ -132,12 +211,9 @@ def del_dynamic_member(client_session, security_group_id):
 
 
 def del_group_member(client_session, resource_id):
-    try:
-        security_group_id, member_id = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    security_group_id, member_id = resource_ids.GroupMemberId.decode(
+        resource_id
+    )
 
     raw_result = client_session.delete(
         'secGroupMember', uri_parameters={
@@ -149,12 +225,9 @@ def del_group_member(client_session, resource_id):
 
 
 def del_group_exclude_member(client_session, resource_id):
-    try:
-        security_group_id, member_id = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    security_group_id, member_id = resource_ids.GroupMemberId.decode(
+        resource_id
+    )
 
     security_group = common.nsx_read(
         client_session, 'body',
@@ -180,6 +253,42 @@ def del_group_exclude_member(client_session, resource_id):
     common.check_raw_result(raw_result)
 
 
+def _remove_members(member_ids, exclude_member_ids, security_group):
+    """remove members, group is not changed if members already removed"""
+    group = security_group['securitygroup']
+    for name, ids in [
+        ('member', member_ids),
+        ('excludeMember', exclude_member_ids)
+    ]:
+        members = group.get(name) or []
+        if isinstance(members, dict):
+            members = [members]
+        kept = [
+            member for member in members
+            if member.get("objectId") not in ids
+        ]
+        if len(kept) != len(members):
+            group[name] = kept
+
+
+def del_group_members(client_session, resource_id):
+    """Delete include and exclude members by one update of group,
+       as resource_id used response from add_group_members"""
+    security_group_id, member_ids, exclude_member_ids = (
+        resource_ids.GroupMembersId.decode(resource_id)
+    )
+
+    common.versioned_update(
+        functools.partial(_read_group, client_session, security_group_id),
+        functools.partial(_write_group, client_session, security_group_id),
+        functools.partial(
+            _remove_members,
+            set(member_ids),
+            set(exclude_member_ids)
+        )
+    )
+
+
 def del_group(client_session, resource_id):
 
     client_session.delete('secGroupObject',
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import nsx_common as common
+import nsx_resource_id as resource_ids
 from cloudify import exceptions as cfy_exc
 
 
@@ -52,7 +53,9 @@ def policy_group_to_resource_id(security_group_id, security_policy_id):
             "Please recheck security_policy_id/security_group_id."
         )
 
-    return "%s|%s" % (security_group_id, security_policy_id)
+    return resource_ids.PolicyGroupBindId(
+        security_group_id, security_policy_id
+    ).encode()
 
 
 def add_policy_group_bind(client_session, security_policy_id,
@@ -120,16 +123,15 @@ def add_policy_section(client_session, security_policy_id, category, action):
 
     common.check_raw_result(raw_result)
 
-    return "%s|%s" % (category, security_policy_id)
+    return resource_ids.PolicySectionId(
+        category, security_policy_id
+    ).encode()
 
 
 def del_policy_section(client_session, resource_id):
-    try:
-        category, security_policy_id = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    category, security_policy_id = resource_ids.PolicySectionId.decode(
+        resource_id
+    )
 
     security_policy = common.nsx_read(
         client_session, 'body',
@@ -156,12 +158,9 @@ def del_policy_section(client_session, resource_id):
 
 
 def del_policy_group_bind(client_session, resource_id):
-    try:
-        security_group_id, security_policy_id = resource_id.split("|")
-    except Exception as ex:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID: %s' % str(ex)
-        )
+    security_group_id, security_policy_id = (
+        resource_ids.PolicyGroupBindId.decode(resource_id)
+    )
 
     security_policy = common.nsx_read(
         client_session, 'body',
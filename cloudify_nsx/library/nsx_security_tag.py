@@ -11,14 +11,19 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from multiprocessing.pool import ThreadPool
 import nsx_common as common
+import nsx_resource_id as resource_ids
 from cloudify import exceptions as cfy_exc
 
+# max parallel requests for attach/detach tag to vms one by one
+TAG_VM_WORKERS = 8
+
 
 def get_tag(client_session, name):
     return common.nsx_search(
         client_session, 'body/securityTags/securityTag',
-        name, 'securityTag'
+        name, 'securityTag', page_size=common.SEARCH_PAGE_SIZE
     )
 
 
@@ -58,7 +63,7 @@ def tag_vm_to_resource_id(tag_id, vm_id):
             "Please recheck tag_id/vm_id"
         )
 
-    return "%s|%s" % (tag_id, vm_id)
+    return resource_ids.TagVmId(tag_id, vm_id).encode()
 
 
 def add_tag_vm(client_session, tag_id, vm_id):
@@ -77,37 +82,155 @@ def add_tag_vm(client_session, tag_id, vm_id):
     return resource_id
 
 
-def delete_tag_vm(client_session, resource_id):
-    ids = resource_id.split("|")
-
-    if len(ids) != 2:
-        raise cfy_exc.NonRecoverableError(
-            'Unexpected error retrieving resource ID'
-        )
-
-    # get list of attached
+def get_tag_vm_ids(client_session, tag_id):
+    """set of ids of vms with attached tag"""
     attached_vms_raw = common.nsx_read(
         client_session, 'body',
-        'securityTagVMsList', uri_parameters={'tagId': ids[0]}
+        'securityTagVMsList', uri_parameters={'tagId': tag_id}
     )
 
     if not attached_vms_raw:
-        return
+        return set()
 
     attached_vms = common.nsx_struct_get_list(
         attached_vms_raw, 'basicinfolist/basicinfo'
     )
 
+    return set(vm.get('objectId') for vm in attached_vms)
+
+
+def delete_tag_vm(client_session, resource_id):
+    ids = resource_ids.TagVmId.decode(resource_id)
+
     # delete only attached
-    for vm in attached_vms:
-        if vm.get('objectId') == ids[1]:
-            result_raw = client_session.delete(
-                'securityTagVM',
-                uri_parameters={
-                    'tagId': ids[0],
-                    'vmMoid': ids[1]
+    if ids.vm_id in get_tag_vm_ids(client_session, ids.tag_id):
+        result_raw = client_session.delete(
+            'securityTagVM',
+            uri_parameters={
+                'tagId': ids.tag_id,
+                'vmMoid': ids.vm_id
+            }
+        )
+
+        common.check_raw_result(result_raw)
+
+
+def tag_vms_to_resource_id(tag_id, vm_ids):
+    """Generate resource_id from tag_id/vm_ids"""
+    if not vm_ids or not tag_id:
+        raise cfy_exc.NonRecoverableError(
+            "Please recheck tag_id/vm_ids"
+        )
+
+    return resource_ids.TagVmsId(tag_id, vm_ids).encode()
+
+
+def _assign_tag_vms(client_session, tag_id, vm_ids, action):
+    """attach/detach tag to all vms by one request, return False if
+       raml has no such request (NSX before 6.3)"""
+    try:
+        result_raw = client_session.create(
+            'securityTagVMsList',
+            uri_parameters={'tagId': tag_id},
+            query_parameters_dict={'action': action},
+            request_body_dict={
+                'securityTagAssignment': {
+                    'tagId': tag_id,
+                    'virtualMachineIds': {
+                        'string': vm_ids
+                    }
                 }
+            }
+        )
+    except AssertionError:
+        # nsxramlclient checks raml before send request
+        return False
+    common.check_raw_result(result_raw)
+    return True
+
+
+def _tag_vm_call(client_session, method, tag_id, vm_id):
+    """attach/detach one vm, run in worker thread so without ctx"""
+    try:
+        return getattr(client_session, method)(
+            'securityTagVM',
+            uri_parameters={
+                'tagId': tag_id,
+                'vmMoid': vm_id
+            }
+        )
+    except BaseException as ex:
+        # client exits on unexpected status, SystemExit in pool worker
+        # kills worker thread and pool waits result forever
+        return ex
+
+
+def _fan_out_tag_vms(client_session, method, tag_id, vm_ids):
+    """attach/detach vms one by one with TAG_VM_WORKERS parallel
+       requests"""
+    pool = ThreadPool(min(TAG_VM_WORKERS, len(vm_ids)))
+    try:
+        results = pool.map(
+            lambda vm_id: _tag_vm_call(client_session, method, tag_id, vm_id),
+            vm_ids
+        )
+    finally:
+        pool.close()
+        pool.join()
+
+    for vm_id, result_raw in zip(vm_ids, results):
+        if isinstance(result_raw, BaseException):
+            raise cfy_exc.NonRecoverableError(
+                "Can't change tag %s on %s: %s" % (
+                    tag_id, vm_id, str(result_raw)
+                )
             )
+        common.check_raw_result(result_raw)
+
+
+def add_tag_vms(client_session, tag_id, vm_ids, multi_vm=False):
+    """Attach tag to all vms, vms with tag are skipped. With multi_vm
+       used one request for all vms if raml has such request. Return
+       resource_id with only attached vms"""
+    unique_vm_ids = []
+    for vm_id in vm_ids:
+        if vm_id not in unique_vm_ids:
+            unique_vm_ids.append(vm_id)
+
+    # check ids before any request
+    tag_vms_to_resource_id(tag_id, unique_vm_ids)
+
+    attached = get_tag_vm_ids(client_session, tag_id)
+    new_vm_ids = [
+        vm_id for vm_id in unique_vm_ids if vm_id not in attached
+    ]
+
+    if new_vm_ids and not (
+        multi_vm and
+        _assign_tag_vms(client_session, tag_id, new_vm_ids, 'attach')
+    ):
+        _fan_out_tag_vms(client_session, 'update', tag_id, new_vm_ids)
+
+    # vms tagged before are not detached on delete
+    return resource_ids.TagVmsId(tag_id, new_vm_ids).encode()
+
+
+def delete_tag_vms(client_session, resource_id, multi_vm=False):
+    """Detach tag from vms, as resource_id used response from
+       add_tag_vms"""
+    tag_id, vm_ids = resource_ids.TagVmsId.decode(resource_id)
+    if not vm_ids:
+        # all vms had tag before create
+        return
 
-            common.check_raw_result(result_raw)
-            break
+    # delete only attached
+    attached = get_tag_vm_ids(client_session, tag_id)
+    vm_ids = [
+        vm_id for vm_id in vm_ids if vm_id in attached
+    ]
+
+    if vm_ids and not (
+        multi_vm and
+        _assign_tag_vms(client_session, tag_id, vm_ids, 'detach')
+    ):
+        _fan_out_tag_vms(client_session, 'delete', tag_id, vm_ids)
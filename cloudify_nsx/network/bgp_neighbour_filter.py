@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "neighbour_id": {
@@ -83,5 +84,6 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(cfy_dlr.del_bgp_neighbour_filter, 'filter', kwargs)
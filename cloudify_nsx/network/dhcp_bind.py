@@ -19,53 +19,63 @@ from cloudify import exceptions as cfy_exc
 import cloudify_nsx.library.nsx_esg_dlr as nsx_dhcp
 
 
-@operation
-def create(**kwargs):
-    validation_rules = {
-        "esg_id": {
-            "required": True
-        },
-        "vm_id": {
-            "set_none": True
-        },
-        "vnic_id": {
-            "set_none": True,
-            "type": "string"
-        },
-        "mac": {
-            "set_none": True
-        },
-        "hostname": {
-            "required": True
-        },
-        "ip": {
-            "required": True
-        },
-        "default_gateway": {
-            "set_none": True
-        },
-        "subnet_mask": {
-            "set_none": True
-        },
-        "domain_name": {
-            "set_none": True
-        },
-        "dns_server_1": {
-            "set_none": True
-        },
-        "dns_server_2": {
-            "set_none": True
-        },
-        "lease_time": {
-            "set_none": True
-        },
-        "auto_dns": {
-            "set_none": True
-        }
+# validation of one binding, same for binding in list of bindings
+BIND_VALIDATION_RULES = {
+    "vm_id": {
+        "set_none": True
+    },
+    "vnic_id": {
+        "set_none": True,
+        "type": "string"
+    },
+    "mac": {
+        "set_none": True
+    },
+    "hostname": {
+        "required": True
+    },
+    "ip": {
+        "required": True
+    },
+    "default_gateway": {
+        "set_none": True
+    },
+    "subnet_mask": {
+        "set_none": True
+    },
+    "domain_name": {
+        "set_none": True
+    },
+    "dns_server_1": {
+        "set_none": True
+    },
+    "dns_server_2": {
+        "set_none": True
+    },
+    "lease_time": {
+        "set_none": True
+    },
+    "auto_dns": {
+        "set_none": True
     }
+}
+
+
+def check_binding(bind_dict):
+    """binding is created for mac or for vm_id/vnic_id"""
+    if not bind_dict.get('mac') and not (
+        bind_dict.get('vnic_id') is not None and bind_dict.get('vm_id')
+    ):
+        raise cfy_exc.NonRecoverableError(
+            "Please fill vm_id/vnic_id or mac"
+        )
+
 
+@operation
+@common.with_dry_run
+def create(**kwargs):
     use_existing, bind_dict = common.get_properties_and_validate(
-        'bind', kwargs, validation_rules
+        'bind', kwargs, common.edge_item_rules(BIND_VALIDATION_RULES)
     )
 
     if use_existing:
@@ -118,6 +128,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     use_existing, bind_dict = common.get_properties('bind', kwargs)
 
@@ -138,7 +149,8 @@ def delete(**kwargs):
     common.attempt_with_rerun(
         nsx_dhcp.delete_dhcp_binding,
         client_session=client_session,
-        resource_id=resource_id
+        resource_id=resource_id,
+        retry_policy=common.get_retry_policy(kwargs)
     )
 
     ctx.logger.info("deleted %s" % resource_id)
@@ -0,0 +1,80 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+from cloudify import ctx
+from cloudify.decorators import operation
+import cloudify_nsx.library.nsx_common as common
+import cloudify_nsx.library.nsx_esg_dlr as nsx_dhcp
+import cloudify_nsx.network.dhcp_bind as dhcp_bind
+import cloudify_nsx.network.dhcp_pool as dhcp_pool
+
+
+@operation
+@common.with_dry_run
+def create(**kwargs):
+    validation_rules = {
+        "esg_id": {
+            "required": True
+        },
+        "pools": {
+            "default": []
+        },
+        "bindings": {
+            "default": []
+        }
+    }
+
+    use_existing, dhcp_dict = common.get_properties_and_validate(
+        'dhcp_bulk', kwargs, validation_rules
+    )
+
+    # all pools and bindings are checked before any request to nsx
+    pools = common.validate_items(
+        'pools', dhcp_dict['pools'],
+        dhcp_pool.POOL_VALIDATION_RULES, use_existing
+    )
+    bindings = common.validate_items(
+        'bindings', dhcp_dict['bindings'],
+        dhcp_bind.BIND_VALIDATION_RULES, use_existing,
+        dhcp_bind.check_binding
+    )
+
+    resource_id = ctx.instance.runtime_properties.get('resource_id')
+    if resource_id:
+        ctx.logger.info("Reused %s" % resource_id)
+        return
+
+    # credentials
+    client_session = common.nsx_login(kwargs)
+
+    pool_ids, binding_ids, resource_id = nsx_dhcp.add_dhcp_bulk(
+        client_session,
+        dhcp_dict['esg_id'],
+        pools,
+        bindings
+    )
+
+    ctx.instance.runtime_properties['resource_id'] = resource_id
+    ctx.instance.runtime_properties['pool_ids'] = pool_ids
+    ctx.instance.runtime_properties['binding_ids'] = binding_ids
+    ctx.logger.info("created %s" % resource_id)
+
+
+@operation
+@common.with_dry_run
+def delete(**kwargs):
+    common.delete_object(
+        nsx_dhcp.delete_dhcp_bulk, 'dhcp_bulk',
+        kwargs, ['pool_ids', 'binding_ids']
+    )
@@ -18,40 +18,40 @@ import cloudify_nsx.library.nsx_common as common
 import cloudify_nsx.library.nsx_esg_dlr as nsx_dhcp
 
 
-@operation
-def create(**kwargs):
-    validations_rules = {
-        "esg_id": {
-            "required": True
-        },
-        "ip_range": {
-            "required": True
-        },
-        "default_gateway": {
-            "set_none": True
-        },
-        "subnet_mask": {
-            "set_none": True
-        },
-        "domain_name": {
-            "set_none": True
-        },
-        "dns_server_1": {
-            "set_none": True
-        },
-        "dns_server_2": {
-            "set_none": True
-        },
-        "lease_time": {
-            "set_none": True
-        },
-        "auto_dns": {
-            "set_none": True
-        }
+# validation of one pool, same for pool in list of pools
+POOL_VALIDATION_RULES = {
+    "ip_range": {
+        "required": True
+    },
+    "default_gateway": {
+        "set_none": True
+    },
+    "subnet_mask": {
+        "set_none": True
+    },
+    "domain_name": {
+        "set_none": True
+    },
+    "dns_server_1": {
+        "set_none": True
+    },
+    "dns_server_2": {
+        "set_none": True
+    },
+    "lease_time": {
+        "set_none": True
+    },
+    "auto_dns": {
+        "set_none": True
     }
+}
+
 
+@operation
+@common.with_dry_run
+def create(**kwargs):
     use_existing, pool_dict = common.get_properties_and_validate(
-        'pool', kwargs, validations_rules
+        'pool', kwargs, common.edge_item_rules(POOL_VALIDATION_RULES)
     )
 
     if use_existing:
@@ -66,16 +66,11 @@ def create(**kwargs):
     # credentials
     client_session = common.nsx_login(kwargs)
 
-    resource_id = nsx_dhcp.add_dhcp_pool(client_session,
-                                         pool_dict['esg_id'],
-                                         pool_dict['ip_range'],
-                                         pool_dict['default_gateway'],
-                                         pool_dict['subnet_mask'],
-                                         pool_dict['domain_name'],
-                                         pool_dict['dns_server_1'],
-                                         pool_dict['dns_server_2'],
-                                         pool_dict['lease_time'],
-                                         pool_dict['auto_dns'])
+    resource_id = nsx_dhcp.add_dhcp_pool(
+        client_session,
+        pool_dict['esg_id'],
+        **common.item_arguments(pool_dict, POOL_VALIDATION_RULES)
+    )
 
     ctx.instance.runtime_properties['resource_id'] = resource_id
 
@@ -83,6 +78,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     use_existing, pool_dict = common.get_properties('pool', kwargs)
 
@@ -103,7 +99,8 @@ def delete(**kwargs):
     common.attempt_with_rerun(
         nsx_dhcp.delete_dhcp_pool,
         client_session=client_session,
-        resource_id=resource_id
+        resource_id=resource_id,
+        retry_policy=common.get_retry_policy(kwargs)
     )
 
     ctx.logger.info("deleted %s" % resource_id)
@@ -12,6 +12,7 @@
 #    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
+import functools
 from cloudify import ctx
 from cloudify.decorators import operation
 import pynsxv.library.nsx_dlr as nsx_router
@@ -21,6 +22,7 @@ import cloudify_nsx.library.nsx_esg_dlr as nsx_dlr
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "name": {
@@ -67,8 +69,10 @@ def create(**kwargs):
     resource_id = ctx.instance.runtime_properties.get('resource_id')
 
     if not use_existing and not resource_id:
-        resource_id, _ = nsx_router.dlr_read(
-            client_session, router_dict["name"]
+        resource_id, _ = common.inventory_search(
+            client_session, kwargs, 'dlr', router_dict["name"],
+            functools.partial(nsx_router.dlr_read, client_session,
+                              router_dict["name"])
         )
         if use_existing:
             ctx.instance.runtime_properties['resource_id'] = resource_id
@@ -94,6 +98,7 @@ def create(**kwargs):
             router_dict['uplink_ip'],
             router_dict['uplink_subnet'],
             router_dict['uplink_dgw'])
+        common.inventory_save(kwargs, 'dlr', router_dict['name'], resource_id)
         ctx.instance.runtime_properties['resource_id'] = resource_id
         ctx.logger.info("created %s" % resource_id)
 
@@ -106,6 +111,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     use_existing, router_dict = common.get_properties('router', kwargs)
 
@@ -126,9 +132,12 @@ def delete(**kwargs):
     common.attempt_with_rerun(
         nsx_dlr.del_edge,
         client_session=client_session,
-        resource_id=resource_id
+        resource_id=resource_id,
+        retry_policy=common.get_retry_policy(kwargs)
     )
 
+    common.inventory_forget(kwargs, resource_id)
+
     ctx.logger.info("deleted %s" % resource_id)
 
     nsx_dlr.remove_properties_edges()
@@ -82,6 +82,7 @@ common_validation_rules = {
 
 
 @operation
+@common.with_dry_run
 def create_dlr(**kwargs):
     validation_rules = {
         k: common_validation_rules[k] for k in common_validation_rules
@@ -96,10 +97,12 @@ def create_dlr(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def create_esg(**kwargs):
     _create(kwargs, common_validation_rules)
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(cfy_dlr.del_bgp_neighbour, 'neighbour', kwargs)
@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "dlr_id": {
@@ -73,6 +74,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     use_existing, interface = common.get_properties('interface', kwargs)
 
@@ -95,7 +97,8 @@ def delete(**kwargs):
     common.attempt_with_rerun(
         cfy_dlr.dlr_del_interface,
         client_session=client_session,
-        resource_id=resource_id
+        resource_id=resource_id,
+        retry_policy=common.get_retry_policy(kwargs)
     )
 
     ctx.logger.info("delete %s" % resource_id)
@@ -12,6 +12,7 @@
 #    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
+import functools
 from cloudify import ctx
 from cloudify.decorators import operation
 import pynsxv.library.nsx_esg as nsx_esg
@@ -21,6 +22,7 @@ import cloudify_nsx.library.nsx_esg_dlr as nsx_dlr
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         # we need name in any case of usage except predefined 'id'
@@ -76,7 +78,11 @@ def create(**kwargs):
         ctx.logger.info("Reused %s" % resource_id)
 
     if not resource_id:
-        resource_id, _ = nsx_esg.esg_read(client_session, edge_dict["name"])
+        resource_id, _ = common.inventory_search(
+            client_session, kwargs, 'esg', edge_dict["name"],
+            functools.partial(nsx_esg.esg_read, client_session,
+                              edge_dict["name"])
+        )
         if use_existing:
             ctx.instance.runtime_properties['resource_id'] = resource_id
             ctx.logger.info("Used existed %s" % resource_id)
@@ -101,6 +107,7 @@ def create(**kwargs):
             edge_dict['esg_username'],
             edge_dict['esg_remote_access']
         )
+        common.inventory_save(kwargs, 'esg', edge_dict['name'], resource_id)
 
         ctx.instance.runtime_properties['resource_id'] = resource_id
         ctx.logger.info("created %s" % resource_id)
@@ -109,6 +116,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     use_existing, edge_dict = common.get_properties('edge', kwargs)
 
@@ -131,9 +139,12 @@ def delete(**kwargs):
     common.attempt_with_rerun(
         nsx_dlr.del_edge,
         client_session=client_session,
-        resource_id=resource_id
+        resource_id=resource_id,
+        retry_policy=common.get_retry_policy(kwargs)
     )
 
+    common.inventory_forget(kwargs, resource_id)
+
     ctx.logger.info("delete %s" % resource_id)
 
     nsx_dlr.remove_properties_edges()
@@ -18,61 +18,61 @@ import cloudify_nsx.library.nsx_firewall as nsx_firewall
 import cloudify_nsx.library.nsx_common as common
 
 
-@operation
-def create(**kwargs):
-    validation_rules = {
-        "esg_id": {
-            "required": True
-        },
-        "ruleTag": {
-            "set_none": True
-        },
-        "name": {
-            "set_none": True
-        },
-        "source": {
-            "set_none": True
-        },
-        "destination": {
-            "set_none": True
-        },
-        "application": {
-            "set_none": True
-        },
-        "matchTranslated": {
-            "default": False,
-            "type": "boolean"
-        },
-        "direction": {
-            "values": [
-                "in",
-                "out"
-            ],
-            "set_none": True
-        },
-        "action": {
-            "required": True,
-            "values": [
-                "accept",
-                "deny",
-                "reject"
-            ]
-        },
-        "enabled": {
-            "default": True,
-            "type": "boolean"
-        },
-        "loggingEnabled": {
-            "default": False,
-            "type": "boolean"
-        },
-        "description": {
-            "set_none": True
-        }
+# validation of one rule, same for rule in list of rules
+RULE_VALIDATION_RULES = {
+    "ruleTag": {
+        "set_none": True
+    },
+    "name": {
+        "set_none": True
+    },
+    "source": {
+        "set_none": True
+    },
+    "destination": {
+        "set_none": True
+    },
+    "application": {
+        "set_none": True
+    },
+    "matchTranslated": {
+        "default": False,
+        "type": "boolean"
+    },
+    "direction": {
+        "values": [
+            "in",
+            "out"
+        ],
+        "set_none": True
+    },
+    "action": {
+        "required": True,
+        "values": [
+            "accept",
+            "deny",
+            "reject"
+        ]
+    },
+    "enabled": {
+        "default": True,
+        "type": "boolean"
+    },
+    "loggingEnabled": {
+        "default": False,
+        "type": "boolean"
+    },
+    "description": {
+        "set_none": True
     }
+}
+
 
+@operation
+@common.with_dry_run
+def create(**kwargs):
     use_existing, firewall_dict = common.get_properties_and_validate(
-        'rule', kwargs, validation_rules
+        'rule', kwargs, common.edge_item_rules(RULE_VALIDATION_RULES)
     )
 
     resource_id = ctx.instance.runtime_properties.get('resource_id')
@@ -86,17 +86,7 @@ def create(**kwargs):
     rule_id, resource_id = nsx_firewall.add_firewall_rule(
         client_session,
         firewall_dict['esg_id'],
-        firewall_dict['application'],
-        firewall_dict["direction"],
-        firewall_dict["name"],
-        firewall_dict["loggingEnabled"],
-        firewall_dict["matchTranslated"],
-        firewall_dict["destination"],
-        firewall_dict["enabled"],
-        firewall_dict["source"],
-        firewall_dict["action"],
-        firewall_dict["ruleTag"],
-        firewall_dict["description"]
+        **common.item_arguments(firewall_dict, RULE_VALIDATION_RULES)
     )
 
     ctx.instance.runtime_properties['resource_id'] = resource_id
@@ -105,6 +95,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(
         nsx_firewall.delete_firewall_rule, 'rule',
@@ -0,0 +1,68 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+from cloudify import ctx
+from cloudify.decorators import operation
+import cloudify_nsx.library.nsx_firewall as nsx_firewall
+import cloudify_nsx.library.nsx_common as common
+import cloudify_nsx.network.esg_firewall as esg_firewall
+
+
+@operation
+@common.with_dry_run
+def create(**kwargs):
+    validation_rules = {
+        "esg_id": {
+            "required": True
+        },
+        "rules": {
+            "required": True
+        }
+    }
+
+    use_existing, firewall_dict = common.get_properties_and_validate(
+        'firewall', kwargs, validation_rules
+    )
+
+    rules = common.validate_items(
+        'rules', firewall_dict['rules'],
+        esg_firewall.RULE_VALIDATION_RULES, use_existing
+    )
+
+    resource_id = ctx.instance.runtime_properties.get('resource_id')
+    if resource_id:
+        ctx.logger.info("Reused %s" % resource_id)
+        return
+
+    # credentials
+    client_session = common.nsx_login(kwargs)
+
+    rule_ids, resource_id = nsx_firewall.add_firewall_rules(
+        client_session,
+        firewall_dict['esg_id'],
+        rules
+    )
+
+    ctx.instance.runtime_properties['resource_id'] = resource_id
+    ctx.instance.runtime_properties['rule_ids'] = rule_ids
+    ctx.logger.info("created %s" % resource_id)
+
+
+@operation
+@common.with_dry_run
+def delete(**kwargs):
+    common.delete_object(
+        nsx_firewall.delete_firewall_rules, 'firewall',
+        kwargs, ['rule_ids']
+    )
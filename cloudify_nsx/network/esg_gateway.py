@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "esg_id": {
@@ -66,6 +67,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     use_existing, gateway = common.get_properties('gateway', kwargs)
 
@@ -86,7 +88,8 @@ def delete(**kwargs):
     common.attempt_with_rerun(
         nsx_esg.esg_dgw_clear,
         client_session=client_session,
-        resource_id=resource_id
+        resource_id=resource_id,
+        retry_policy=common.get_retry_policy(kwargs)
     )
 
     ctx.logger.info("delete %s" % resource_id)
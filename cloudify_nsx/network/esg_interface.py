@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "esg_id": {
@@ -102,6 +103,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     use_existing, interface = common.get_properties('interface', kwargs)
 
@@ -124,7 +126,8 @@ def delete(**kwargs):
     common.attempt_with_rerun(
         nsx_esg.esg_clear_interface,
         client_session=client_session,
-        resource_id=resource_id
+        resource_id=resource_id,
+        retry_policy=common.get_retry_policy(kwargs)
     )
 
     ctx.logger.info("delete %s" % resource_id)
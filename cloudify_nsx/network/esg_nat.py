@@ -18,51 +18,51 @@ import cloudify_nsx.library.nsx_common as common
 import cloudify_nsx.library.nsx_nat as nsx_nat
 
 
-@operation
-def create(**kwargs):
-    validation_rules = {
-        "esg_id": {
-            "required": True
-        },
-        "action": {
-            "required": True
-        },
-        "originalAddress": {
-            "required": True
-        },
-        "translatedAddress": {
-            "required": True
-        },
-        "vnic": {
-            "set_none": True
-        },
-        "ruleTag": {
-            "set_none": True
-        },
-        "loggingEnabled": {
-            "default": False,
-            "type": "boolean",
-        },
-        "enabled": {
-            "default": True,
-            "type": "boolean"
-        },
-        "description": {
-            "set_none": True
-        },
-        "protocol": {
-            "default": "any"
-        },
-        "translatedPort": {
-            "default": "any"
-        },
-        "originalPort": {
-            "default": "any"
-        }
+# validation of one rule, same for rule in list of rules
+RULE_VALIDATION_RULES = {
+    "action": {
+        "required": True
+    },
+    "originalAddress": {
+        "required": True
+    },
+    "translatedAddress": {
+        "required": True
+    },
+    "vnic": {
+        "set_none": True
+    },
+    "ruleTag": {
+        "set_none": True
+    },
+    "loggingEnabled": {
+        "default": False,
+        "type": "boolean",
+    },
+    "enabled": {
+        "default": True,
+        "type": "boolean"
+    },
+    "description": {
+        "set_none": True
+    },
+    "protocol": {
+        "default": "any"
+    },
+    "translatedPort": {
+        "default": "any"
+    },
+    "originalPort": {
+        "default": "any"
     }
+}
+
 
+@operation
+@common.with_dry_run
+def create(**kwargs):
     use_existing, nat_dict = common.get_properties_and_validate(
-        'rule', kwargs, validation_rules
+        'rule', kwargs, common.edge_item_rules(RULE_VALIDATION_RULES)
     )
 
     resource_id = ctx.instance.runtime_properties.get('resource_id')
@@ -76,22 +76,14 @@ def create(**kwargs):
     resource_id = nsx_nat.add_nat_rule(
         client_session,
         nat_dict['esg_id'],
-        nat_dict['action'],
-        nat_dict['originalAddress'],
-        nat_dict['translatedAddress'],
-        nat_dict['vnic'],
-        nat_dict['ruleTag'],
-        nat_dict['loggingEnabled'],
-        nat_dict['enabled'],
-        nat_dict['description'],
-        nat_dict['protocol'],
-        nat_dict['translatedPort'],
-        nat_dict['originalPort'])
+        **common.item_arguments(nat_dict, RULE_VALIDATION_RULES)
+    )
 
     ctx.instance.runtime_properties['resource_id'] = resource_id
     ctx.logger.info("created %s " % resource_id)
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(nsx_nat.delete_nat_rule, 'rule', kwargs)
@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "esg_id": {
@@ -74,6 +75,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     use_existing, route = common.get_properties('route', kwargs)
 
@@ -93,7 +95,8 @@ def delete(**kwargs):
     common.attempt_with_rerun(
         nsx_esg.esg_route_del,
         client_session=client_session,
-        resource_id=resource_id
+        resource_id=resource_id,
+        retry_policy=common.get_retry_policy(kwargs)
     )
 
     ctx.logger.info("delete %s" % resource_id)
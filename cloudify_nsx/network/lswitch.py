@@ -12,6 +12,7 @@
 #    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
+import functools
 from cloudify import ctx
 from cloudify.decorators import operation
 import cloudify_nsx.library.nsx_common as common
@@ -21,6 +22,7 @@ from cloudify import exceptions as cfy_exc
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         # we need name in any case of usage except predefined 'id'
@@ -61,8 +63,10 @@ def create(**kwargs):
         # no explicit id, validate params
         ctx.logger.info("checking switch: " + str(switch_dict))
 
-        resource_id, switch_params = nsx_logical_switch.logical_switch_read(
-            client_session, switch_dict["name"]
+        resource_id, switch_params = common.inventory_search(
+            client_session, kwargs, 'lswitch', switch_dict["name"],
+            functools.partial(nsx_logical_switch.logical_switch_read,
+                              client_session, switch_dict["name"])
         )
         if use_existing:
             ctx.instance.runtime_properties['resource_id'] = resource_id
@@ -82,6 +86,8 @@ def create(**kwargs):
                 switch_dict["name"], switch_mode
             )
             ctx.logger.info("created %s" % resource_id)
+            common.inventory_save(kwargs, 'lswitch', switch_dict['name'],
+                                  resource_id)
             switch_params = None
 
         ctx.instance.runtime_properties['resource_id'] = resource_id
@@ -119,6 +125,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(nsx_lswitch.del_logical_switch, 'switch',
                          kwargs, ['vsphere_network_id', 'name'])
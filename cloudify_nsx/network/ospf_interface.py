@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "dlr_id": {
@@ -78,6 +79,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     use_existing, interface = common.get_properties('interface', kwargs)
 
@@ -98,7 +100,8 @@ def delete(**kwargs):
     common.attempt_with_rerun(
         cfy_dlr.del_esg_ospf_interface,
         client_session=client_session,
-        resource_id=resource_id
+        resource_id=resource_id,
+        retry_policy=common.get_retry_policy(kwargs)
     )
 
     ctx.logger.info("deleted %s" % resource_id)
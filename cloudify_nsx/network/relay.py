@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "dlr_id": {
@@ -57,5 +58,6 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(cfy_dlr.del_dhcp_relay, 'relay', kwargs)
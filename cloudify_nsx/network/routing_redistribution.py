@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "dlr_id": {
@@ -81,19 +82,22 @@ def create(**kwargs):
     # credentials
     client_session = common.nsx_login(kwargs)
 
-    resource_id = cfy_dlr.add_routing_rule(client_session,
-                                           use_existing,
-                                           rule['dlr_id'],
-                                           rule['type'],
-                                           rule['prefixName'],
-                                           rule['from'],
-                                           rule['action'])
+    resource_id = cfy_dlr.add_routing_rule(
+        client_session,
+        use_existing,
+        rule['dlr_id'],
+        rule['type'],
+        rule['prefixName'],
+        rule['from'],
+        rule['action']
+    )
 
     ctx.instance.runtime_properties['resource_id'] = resource_id
     ctx.logger.info("created %s" % resource_id)
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     use_existing, area = common.get_properties('area', kwargs)
 
@@ -114,7 +118,8 @@ def delete(**kwargs):
     common.attempt_with_rerun(
         cfy_dlr.del_routing_rule,
         client_session=client_session,
-        resource_id=resource_id
+        resource_id=resource_id,
+        retry_policy=common.get_retry_policy(kwargs)
     )
 
     ctx.logger.info("deleted %s" % resource_id)
@@ -12,6 +12,7 @@
 #    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
+import functools
 from cloudify import ctx
 from cloudify.decorators import operation
 import cloudify_nsx.library.nsx_common as common
@@ -23,6 +24,7 @@ import cloudify_nsx.library.nsx_security_tag as nsx_security_tag
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "name": {
@@ -51,36 +53,51 @@ def create(**kwargs):
     # credentials
     client_session = common.nsx_login(kwargs)
 
+    scope = ''
     if nsx_object['type'] == 'group':
-        resource_id, _ = nsx_security_group.get_group(
+        read_func = functools.partial(
+            nsx_security_group.get_group,
             client_session,
             nsx_object['scopeId'],
             nsx_object['name']
         )
+        scope = nsx_object['scopeId']
     elif nsx_object['type'] == 'policy':
-        resource_id, _ = nsx_security_policy.get_policy(
+        read_func = functools.partial(
+            nsx_security_policy.get_policy,
             client_session,
             nsx_object['name']
         )
     elif nsx_object['type'] == 'tag':
-        resource_id, _ = nsx_security_tag.get_tag(
+        read_func = functools.partial(
+            nsx_security_tag.get_tag,
             client_session,
             nsx_object['name']
         )
     elif nsx_object['type'] == 'lswitch':
-        resource_id, switch_params = nsx_logical_switch.logical_switch_read(
+        read_func = functools.partial(
+            nsx_logical_switch.logical_switch_read,
             client_session, nsx_object['name']
         )
     elif nsx_object['type'] == 'router':
-        resource_id, _ = nsx_router.dlr_read(
+        read_func = functools.partial(
+            nsx_router.dlr_read,
             client_session, nsx_object['name']
         )
 
+    # routers are searched in list of dlr edges
+    obj_type = 'dlr' if nsx_object['type'] == 'router' else nsx_object['type']
+    resource_id, _ = common.inventory_search(
+        client_session, kwargs, obj_type, nsx_object['name'], read_func,
+        scope
+    )
+
     runtime_properties = ctx.instance.runtime_properties
     runtime_properties['resource_id'] = resource_id
     runtime_properties['use_external_resource'] = resource_id is not None
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.remove_properties('nsx_object')
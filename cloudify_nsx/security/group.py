@@ -12,6 +12,7 @@
 #    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
+import functools
 from cloudify import ctx
 from cloudify.decorators import operation
 import cloudify_nsx.library.nsx_security_group as nsx_security_group
@@ -20,6 +21,7 @@ from cloudify import exceptions as cfy_exc
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
 
     validation_rules = {
@@ -54,9 +56,12 @@ def create(**kwargs):
     client_session = common.nsx_login(kwargs)
 
     if not resource_id:
-        resource_id, _ = nsx_security_group.get_group(client_session,
-                                                      group['scopeId'],
-                                                      group['name'])
+        resource_id, _ = common.inventory_search(
+            client_session, kwargs, 'group', group['name'],
+            functools.partial(nsx_security_group.get_group, client_session,
+                              group['scopeId'], group['name']),
+            group['scopeId']
+        )
 
         if use_existing and resource_id:
             ctx.instance.runtime_properties['resource_id'] = resource_id
@@ -79,12 +84,15 @@ def create(**kwargs):
             group['excludeMember'],
             group['dynamicMemberDefinition']
         )
+        common.inventory_save(kwargs, 'group', group['name'], resource_id,
+                              group['scopeId'])
 
         ctx.instance.runtime_properties['resource_id'] = resource_id
         ctx.logger.info("created %s" % resource_id)
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(
         nsx_security_group.del_group, 'group',
@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     kwargs = common.get_properties_update(
         'dynamic_member', "security_group_id", kwargs,
@@ -61,6 +62,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     use_existing, dynamic_member = common.get_properties(
         'dynamic_member', kwargs
@@ -83,7 +85,8 @@ def delete(**kwargs):
     common.attempt_with_rerun(
         nsx_security_group.del_dynamic_member,
         client_session=client_session,
-        security_group_id=resource_id
+        security_group_id=resource_id,
+        retry_policy=common.get_retry_policy(kwargs)
     )
 
     ctx.logger.info("delete %s" % resource_id)
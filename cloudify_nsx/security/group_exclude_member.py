@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     kwargs = common.get_properties_update(
         'group_exclude_member', "security_group_id", kwargs,
@@ -59,6 +60,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(
         nsx_security_group.del_group_exclude_member, 'group_exclude_member',
@@ -0,0 +1,84 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+from cloudify import ctx
+from cloudify.decorators import operation
+from cloudify import exceptions as cfy_exc
+import cloudify_nsx.library.nsx_security_group as nsx_security_group
+import cloudify_nsx.library.nsx_common as common
+
+
+@operation
+@common.with_dry_run
+def create(**kwargs):
+    kwargs = common.get_properties_update(
+        'group_members', "security_group_id", kwargs,
+        target_relationship="cloudify.nsx.relationships.contained_in",
+        target_property="resource_id"
+    )
+
+    validation_rules = {
+        "security_group_id": {
+            "required": True,
+        },
+        # member ids
+        "members": {
+            "default": []
+        },
+        # exclude member ids
+        "exclude_members": {
+            "default": []
+        }
+    }
+
+    use_existing, group_members = common.get_properties_and_validate(
+        'group_members', kwargs, validation_rules
+    )
+
+    for name in ['members', 'exclude_members']:
+        if not isinstance(group_members[name], list):
+            raise cfy_exc.NonRecoverableError(
+                "%s must be list" % name
+            )
+
+    resource_id = ctx.instance.runtime_properties.get('resource_id')
+    if resource_id:
+        ctx.logger.info("Reused %s" % resource_id)
+        return
+
+    # credentials
+    client_session = common.nsx_login(kwargs)
+
+    member_ids, exclude_member_ids, resource_id = (
+        nsx_security_group.add_group_members(
+            client_session,
+            group_members['security_group_id'],
+            [str(member_id) for member_id in group_members['members']],
+            [str(member_id) for member_id in group_members['exclude_members']]
+        )
+    )
+
+    ctx.instance.runtime_properties['resource_id'] = resource_id
+    ctx.instance.runtime_properties['member_ids'] = member_ids
+    ctx.instance.runtime_properties['exclude_member_ids'] = exclude_member_ids
+    ctx.logger.info("created %s" % resource_id)
+
+
+@operation
+@common.with_dry_run
+def delete(**kwargs):
+    common.delete_object(
+        nsx_security_group.del_group_members, 'group_members',
+        kwargs, ['member_ids', 'exclude_member_ids']
+    )
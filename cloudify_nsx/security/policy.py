@@ -27,6 +27,7 @@ def _update_policy(exist_policy):
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "name": {
@@ -91,12 +92,14 @@ def create(**kwargs):
             policy['securityGroupBinding'],
             policy['actionsByCategory']
         )
+        common.inventory_save(kwargs, 'policy', policy['name'], resource_id)
 
         ctx.instance.runtime_properties['resource_id'] = resource_id
         ctx.logger.info("created %s" % resource_id)
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(
         nsx_security_policy.del_policy, 'policy',
@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "security_policy_id": {
@@ -54,6 +55,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(
         nsx_security_policy.del_policy_group_bind, 'policy_group_bind',
@@ -62,6 +64,7 @@ def delete(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def link(**kwargs):
     policy_id = ctx.source.instance.runtime_properties.get('resource_id')
     group_id = ctx.target.instance.runtime_properties.get('resource_id')
@@ -80,6 +83,7 @@ def link(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def unlink(**kwargs):
     policy_id = ctx.source.instance.runtime_properties.get('resource_id')
     group_id = ctx.target.instance.runtime_properties.get('resource_id')
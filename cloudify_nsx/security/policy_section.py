@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     kwargs = common.get_properties_update(
         'policy_section', "security_policy_id", kwargs,
@@ -64,6 +65,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(
         nsx_security_policy.del_policy_section, 'policy_section',
@@ -12,6 +12,7 @@
 #    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #    * See the License for the specific language governing permissions and
 #    * limitations under the License.
+import functools
 from cloudify import ctx
 from cloudify.decorators import operation
 import cloudify_nsx.library.nsx_security_tag as nsx_security_tag
@@ -20,6 +21,7 @@ from cloudify import exceptions as cfy_exc
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "name": {
@@ -43,8 +45,11 @@ def create(**kwargs):
     client_session = common.nsx_login(kwargs)
 
     if not resource_id:
-        resource_id, _ = nsx_security_tag.get_tag(client_session,
-                                                  tag['name'])
+        resource_id, _ = common.inventory_search(
+            client_session, kwargs, 'tag', tag['name'],
+            functools.partial(nsx_security_tag.get_tag, client_session,
+                              tag['name'])
+        )
 
         if use_existing and resource_id:
             ctx.instance.runtime_properties['resource_id'] = resource_id
@@ -64,11 +69,13 @@ def create(**kwargs):
             tag['name'],
             tag['description'],
         )
+        common.inventory_save(kwargs, 'tag', tag['name'], resource_id)
 
         ctx.instance.runtime_properties['resource_id'] = resource_id
         ctx.logger.info("created %s" % resource_id)
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(nsx_security_tag.delete_tag, 'tag', kwargs)
@@ -19,6 +19,7 @@ import cloudify_nsx.library.nsx_common as common
 
 
 @operation
+@common.with_dry_run
 def create(**kwargs):
     validation_rules = {
         "tag_id": {
@@ -52,6 +53,7 @@ def create(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def delete(**kwargs):
     common.delete_object(
         nsx_security_tag.delete_tag_vm, 'vm_tag',
@@ -60,6 +62,7 @@ def delete(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def link(**kwargs):
     vm_id = ctx.source.instance.runtime_properties.get('vsphere_server_id')
     tag_id = ctx.target.instance.runtime_properties.get('resource_id')
@@ -78,6 +81,7 @@ def link(**kwargs):
 
 
 @operation
+@common.with_dry_run
 def unlink(**kwargs):
     vm_id = ctx.source.instance.runtime_properties.get('vsphere_server_id')
     tag_id = ctx.target.instance.runtime_properties.get('resource_id')
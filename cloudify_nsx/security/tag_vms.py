@@ -0,0 +1,72 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+import functools
+from cloudify import ctx
+from cloudify.decorators import operation
+from cloudify import exceptions as cfy_exc
+import cloudify_nsx.library.nsx_security_tag as nsx_security_tag
+import cloudify_nsx.library.nsx_common as common
+
+
+@operation
+@common.with_dry_run
+def create(**kwargs):
+    validation_rules = {
+        "tag_id": {
+            "required": True
+        },
+        "vm_ids": {
+            "required": True
+        }
+    }
+
+    use_existing, vm_tags = common.get_properties_and_validate(
+        'vm_tags', kwargs, validation_rules
+    )
+
+    if not isinstance(vm_tags['vm_ids'], list):
+        raise cfy_exc.NonRecoverableError(
+            "vm_ids must be list"
+        )
+
+    resource_id = ctx.instance.runtime_properties.get('resource_id')
+    if resource_id:
+        ctx.logger.info("Reused %s" % resource_id)
+        return
+
+    # credentials
+    client_session = common.nsx_login(kwargs)
+
+    resource_id = nsx_security_tag.add_tag_vms(
+        client_session,
+        vm_tags['tag_id'],
+        [str(vm_id) for vm_id in vm_tags['vm_ids']],
+        common.get_multi_vm_tag(kwargs)
+    )
+
+    ctx.instance.runtime_properties['resource_id'] = resource_id
+    ctx.logger.info("created %s" % resource_id)
+
+
+@operation
+@common.with_dry_run
+def delete(**kwargs):
+    common.delete_object(
+        functools.partial(
+            nsx_security_tag.delete_tag_vms,
+            multi_vm=common.get_multi_vm_tag(kwargs)
+        ), 'vm_tags',
+        kwargs
+    )
@@ -0,0 +1,634 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Install/uninstall benchmark of blueprints against fake nsx.
+
+Scenarios repeat nsx nodes of blueprints from tests/integration/resources,
+vsphere nodes are replaced by fixed ids. Count of security groups, tags
+and bgp neighbours is scaled by parameters. Nodes are installed one by one
+in blueprint order and uninstalled in reverse order with lifecycle
+operations from plugin.yaml, recoverable errors are retried as by
+workflow. Result is printed as json, with --baseline result is compared
+with previous json and exit code is 1 on regression.
+
+    python -m tests.benchmarks.install_benchmark [--groups N] [--tags N]
+        [--neighbours N] [--latency SEC] [--output FILE]
+        [--baseline FILE] [--tolerance RATIO]
+"""
+import argparse
+import collections
+import copy
+import importlib
+import json
+import os
+import sys
+import time
+import yaml
+from cloudify import exceptions as cfy_exc
+from cloudify import mocks as cfy_mocks
+from cloudify.state import current_ctx
+import cloudify_nsx.library.nsx_common as common
+from tests.fakensx import FakeNsxManager
+
+PLUGIN_YAML = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'plugin.yaml'
+)
+
+# transport zone used by blueprints
+TRANSPORT_ZONE = 'Main_Zone'
+
+# retries of operation after recoverable error
+TASK_RETRIES = 5
+
+# ids of vsphere objects
+VSPHERE = {
+    'datacenter': 'datacenter-1',
+    'datastore': 'datastore-1',
+    'cluster': 'domain-c1',
+    'vm': 'vm-%s'
+}
+
+# edges are deployed on vsphere nodes: relationship -> runtime properties
+# of target
+EDGE_TYPES = ('cloudify.nsx.esg', 'cloudify.nsx.dlr')
+EDGE_RELATIONSHIPS = {
+    'cloudify.nsx.relationships.deployed_on_datacenter': {
+        'vsphere_datacenter_id': VSPHERE['datacenter']
+    },
+    'cloudify.nsx.relationships.deployed_on_datastore': {
+        'vsphere_datastore_id': VSPHERE['datastore']
+    },
+    'cloudify.nsx.relationships.deployed_on_cluster': {
+        'vsphere_cluster_id': VSPHERE['cluster']
+    }
+}
+
+Node = collections.namedtuple('Node', ['name', 'type', 'properties',
+                                       'inputs'])
+
+
+class Attr(object):
+    """get_attribute of other node, resolved on install"""
+
+    def __init__(self, node, *path):
+        self.node = node
+        self.path = path
+
+    def resolve(self, runtime_properties):
+        value = runtime_properties[self.node]
+        for name in self.path:
+            value = value[name]
+        return value
+
+
+def _resolve(value, runtime_properties):
+    if isinstance(value, Attr):
+        return value.resolve(runtime_properties)
+    if isinstance(value, dict):
+        return dict(
+            (key, _resolve(sub_value, runtime_properties))
+            for key, sub_value in value.items()
+        )
+    if isinstance(value, list):
+        return [_resolve(item, runtime_properties) for item in value]
+    return value
+
+
+def esg_functionality(params):
+    """nodes of esg_functionality.yaml"""
+    return [
+        Node('master_lswitch', 'cloudify.nsx.lswitch', {'switch': {
+            'name': 'master_switch', 'transport_zone': TRANSPORT_ZONE,
+            'mode': 'UNICAST_MODE'
+        }}, {}),
+        Node('esg', 'cloudify.nsx.esg', {
+            'edge': {
+                'name': 'real_edge', 'esg_pwd': 'SeCrEt010203!',
+                'esg_remote_access': True
+            },
+            'firewall': {'action': 'accept', 'logging': False},
+            'dhcp': {
+                'enabled': True, 'syslog_enabled': False,
+                'syslog_level': 'INFO'
+            },
+            'nat': {'enabled': True}
+        }, {'edge': {
+            'default_pg': Attr('master_lswitch', 'vsphere_network_id')
+        }}),
+        Node('slave_lswitch', 'cloudify.nsx.lswitch', {'switch': {
+            'name': 'slave_switch', 'transport_zone': TRANSPORT_ZONE,
+            'mode': 'UNICAST_MODE'
+        }}, {}),
+        Node('esg_interface', 'cloudify.nsx.esg_interface', {'interface': {
+            'ifindex': 3, 'ipaddr': '192.168.3.1',
+            'netmask': '255.255.255.0', 'prefixlen': 24,
+            'name': 'router_interface', 'mtu': 1500, 'is_connected': 'true',
+            'vnic_type': 'internal', 'enable_send_redirects': 'true',
+            'enable_proxy_arp': 'true', 'secondary_ips': '192.168.3.128'
+        }}, {'interface': {
+            'esg_id': Attr('esg', 'resource_id'),
+            'portgroup_id': Attr('slave_lswitch', 'resource_id')
+        }}),
+        Node('nat_rule', 'cloudify.nsx.esg_nat', {'rule': {
+            'action': 'dnat', 'translatedAddress': '192.168.10.1',
+            'originalAddress': '192.168.1.2', 'vnic': 3, 'ruleTag': 65538,
+            'loggingEnabled': False, 'enabled': True,
+            'description': 'some nat rule', 'protocol': 'any',
+            'translatedPort': 'any', 'originalPort': 'any'
+        }}, {'rule': {'esg_id': Attr('esg', 'resource_id')}}),
+        Node('firewall_rule', 'cloudify.nsx.esg_firewall', {'rule': {
+            'name': 'http', 'loggingEnabled': False,
+            'matchTranslated': False, 'enabled': True, 'source': 'any',
+            'action': 'accept', 'description': 'Some Firewall Rule',
+            'direction': 'in', 'application': 'any'
+        }}, {'rule': {
+            'esg_id': Attr('esg', 'resource_id'),
+            'destination': {'groupingObjectId': VSPHERE['cluster']}
+        }}),
+        Node('esg_gateway', 'cloudify.nsx.esg_gateway', {'gateway': {
+            'dgw_ip': '192.168.3.11', 'vnic': 3, 'mtu': 1500,
+            'admin_distance': 1
+        }}, {'gateway': {'esg_id': Attr('esg', 'resource_id')}}),
+        Node('esg_route', 'cloudify.nsx.esg_route', {'route': {
+            'network': '192.168.10.0/24', 'next_hop': '192.168.3.10',
+            'vnic': 3, 'mtu': 1500, 'admin_distance': 1,
+            'description': 'Some cool route'
+        }}, {'route': {'esg_id': Attr('esg', 'resource_id')}}),
+        Node('esg_pool', 'cloudify.nsx.dhcp_pool', {'pool': {
+            'ip_range': '192.168.5.128-192.168.5.250',
+            'default_gateway': '192.168.5.1',
+            'subnet_mask': '255.255.255.0', 'domain_name': 'internal.test',
+            'dns_server_1': '8.8.8.8', 'dns_server_2': '192.168.5.1',
+            'lease_time': 'infinite', 'auto_dns': True
+        }}, {'pool': {'esg_id': Attr('esg', 'resource_id')}}),
+        Node('esg_pool_bind', 'cloudify.nsx.dhcp_binding', {'bind': {
+            'mac': '11:22:33:44:55:66', 'hostname': 'secret.server',
+            'ip': '192.168.5.251', 'default_gateway': '192.168.5.1',
+            'subnet_mask': '255.255.255.0',
+            'domain_name': 'secret.internal.test',
+            'dns_server_1': '8.8.8.8', 'dns_server_2': '192.168.5.1',
+            'lease_time': 'infinite', 'auto_dns': True
+        }}, {'bind': {'esg_id': Attr('esg', 'resource_id')}})
+    ]
+
+
+def dlr_with_bgp_functionality(params):
+    """nodes of dlr_with_bgp_functionality.yaml, with N bgp neighbours"""
+    nodes = [
+        Node('master_lswitch', 'cloudify.nsx.lswitch', {'switch': {
+            'name': 'master_switch', 'transport_zone': TRANSPORT_ZONE,
+            'mode': 'UNICAST_MODE'
+        }}, {}),
+        Node('nsx_dlr', 'cloudify.nsx.dlr', {
+            'router': {
+                'name': 'some_router', 'dlr_pwd': 'SeCrEt010203!',
+                'dlr_size': 'compact'
+            },
+            'firewall': {'action': 'accept', 'logging': False},
+            'dhcp': {
+                'enabled': True, 'syslog_enabled': False,
+                'syslog_level': 'INFO'
+            },
+            'routing': {
+                'enabled': True,
+                'routingGlobalConfig': {
+                    'routerId': '192.168.1.11',
+                    'logging': {'logLevel': 'info', 'enable': False},
+                    'ecmp': False
+                },
+                'staticRouting': {
+                    'defaultRoute': {'gatewayAddress': '192.168.1.43'}
+                }
+            },
+            'bgp': {'enabled': True, 'localAS': 64520, 'redistribution': True}
+        }, {'router': {
+            'ha_ls_id': Attr('master_lswitch', 'resource_id'),
+            'uplink_ls_id': Attr('master_lswitch', 'resource_id'),
+            'uplink_ip': '192.168.1.11',
+            'uplink_subnet': '255.255.255.0',
+            'uplink_dgw': '192.168.1.1'
+        }})
+    ]
+    for index in xrange(params['neighbours']):
+        nodes.append(Node(
+            'bgp_neighbour_%s' % index, 'cloudify.nsx.dlrBGPNeighbour', {},
+            {'neighbour': {
+                'dlr_id': Attr('nsx_dlr', 'resource_id'),
+                'ipAddress': '192.168.%s.%s' % (2 + index / 250,
+                                                1 + index % 250),
+                'remoteAS': 64521,
+                'protocolAddress': '192.168.1.20',
+                'forwardingAddress': '192.168.1.11'
+            }}
+        ))
+    if params['neighbours']:
+        nodes.append(Node(
+            'bgp_neighbour_filter', 'cloudify.nsx.esgBGPNeighbourFilter', {},
+            {'filter': {
+                'neighbour_id': Attr('bgp_neighbour_0', 'resource_id'),
+                'action': 'deny', 'ipPrefixGe': 30, 'direction': 'in',
+                'network': '192.169.1.0/24'
+            }}
+        ))
+    nodes += [
+        Node('dlr_ip_prefix', 'cloudify.nsx.dlr_routing_ip_prefix', {}, {
+            'prefix': {
+                'dlr_id': Attr('nsx_dlr', 'resource_id'),
+                'name': 'routing_prefix',
+                'ipAddress': '10.112.196.160/24'
+            }
+        }),
+        Node('dlr_bgp_redistribute',
+             'cloudify.nsx.routing_redistribution_rule', {}, {'rule': {
+                 'dlr_id': Attr('nsx_dlr', 'resource_id'),
+                 'prefixName': Attr('dlr_ip_prefix', 'prefix', 'name'),
+                 'type': 'bgp', 'from': {'ospf': True, 'static': True},
+                 'action': 'deny'
+             }})
+    ]
+    return nodes
+
+
+def security_functionality(params):
+    """nodes of security_functionality.yaml, with N slave groups and
+       N tags"""
+    nodes = [
+        Node('master_security_group', 'cloudify.nsx.security_group', {
+            'group': {'scopeId': 'globalroot-0', 'name': 'master_group'}
+        }, {}),
+        Node('master_security_policy', 'cloudify.nsx.security_policy', {}, {
+            'policy': {
+                'name': 'master_policy', 'description': 'MasterPolicy',
+                'precedence': 100,
+                'actionsByCategory': {
+                    'category': 'firewall',
+                    'action': {
+                        '@class': 'firewallSecurityAction',
+                        'name': 'firewall_name',
+                        'description': 'description',
+                        'category': 'firewall',
+                        'secondarySecurityGroup': {'objectId': Attr(
+                            'master_security_group', 'resource_id'
+                        )},
+                        'action': 'allow', 'direction': 'inbound'
+                    }
+                }
+            }
+        })
+    ]
+    for index in xrange(params['groups']):
+        group = 'slave_security_group_%s' % index
+        nodes += [
+            Node(group, 'cloudify.nsx.security_group', {'group': {
+                'scopeId': 'globalroot-0', 'name': 'slave_group_%s' % index
+            }}, {}),
+            Node('slave_master_security_group_bind_%s' % index,
+                 'cloudify.nsx.security_group_member', {}, {
+                     'group_member': {
+                         'security_group_id': Attr(
+                             'master_security_group', 'resource_id'
+                         ),
+                         'objectId': Attr(group, 'resource_id')
+                     }
+                 }),
+            Node('master_security_policy_bind_%s' % index,
+                 'cloudify.nsx.security_policy_group_bind', {}, {
+                     'policy_group_bind': {
+                         'security_policy_id': Attr(
+                             'master_security_policy', 'resource_id'
+                         ),
+                         'security_group_id': Attr(group, 'resource_id')
+                     }
+                 })
+        ]
+    for index in xrange(params['tags']):
+        tag = 'security_tag_%s' % index
+        nodes += [
+            Node(tag, 'cloudify.nsx.security_tag', {}, {'tag': {
+                'name': 'secret_tag_%s' % index,
+                'description': 'What can i say?'
+            }}),
+            Node('tag_vm_%s' % index, 'cloudify.nsx.security_tag_vm', {}, {
+                'vm_tag': {
+                    'tag_id': Attr(tag, 'resource_id'),
+                    'vm_id': VSPHERE['vm'] % index
+                }
+            })
+        ]
+    nodes.append(Node(
+        'master_security_policy_section',
+        'cloudify.nsx.security_policy_section', {}, {'policy_section': {
+            'security_policy_id': Attr(
+                'master_security_policy', 'resource_id'
+            ),
+            'category': 'endpoint',
+            'action': {
+                '@class': 'endpointSecurityAction',
+                'name': 'endpoint_check', 'actionType': 'DATA_SECURITY',
+                'description': 'description for DATA_SECURITY',
+                'isEnabled': 'true', 'isActionEnforced': 'false',
+                'category': 'endpoint', 'isActive': 'true'
+            }
+        }}
+    ))
+    return nodes
+
+
+SCENARIOS = collections.OrderedDict([
+    ('esg_functionality', esg_functionality),
+    ('dlr_with_bgp_functionality', dlr_with_bgp_functionality),
+    ('security_functionality', security_functionality)
+])
+
+
+def _plain(value):
+    """yaml mappings as dicts, pyraml replaces mapping type in yaml"""
+    if isinstance(value, dict):
+        return dict((key, _plain(sub_value))
+                    for key, sub_value in value.items())
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+def load_node_types(plugin_yaml=PLUGIN_YAML):
+    """node type -> (default properties, lifecycle operation -> function)"""
+    with open(plugin_yaml) as plugin_file:
+        plugin = yaml.safe_load(plugin_file)
+    node_types = {}
+    for name, node_type in plugin['node_types'].items():
+        defaults = dict(
+            (key, _plain(value['default']))
+            for key, value in (node_type.get('properties') or {}).items()
+            if 'default' in value
+        )
+        operations = {}
+        lifecycle = (node_type.get('interfaces') or {}).get(
+            'cloudify.interfaces.lifecycle'
+        ) or {}
+        for operation, implementation in lifecycle.items():
+            if isinstance(implementation, dict):
+                implementation = implementation['implementation']
+            # skip plugin name
+            module, function = implementation.split(".", 1)[1].rsplit(
+                ".", 1
+            )
+            operations[operation] = getattr(
+                importlib.import_module(module), function
+            )
+        node_types[name] = (defaults, operations)
+    return node_types
+
+
+def percentile(values, percent):
+    """nearest-rank percentile"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = max(int(-(-len(values) * percent // 100)), 1)
+    return values[rank - 1]
+
+
+class Runner(object):
+    """install/uninstall of nodes one by one with mock contexts"""
+
+    def __init__(self, nsx, node_types):
+        self.nsx = nsx
+        self.node_types = node_types
+        self.runtime_properties = {}
+        self.retries = 0
+
+    def _properties(self, node):
+        defaults, _ = self.node_types[node.type]
+        properties = copy.deepcopy(defaults)
+        properties.update(node.properties)
+        properties['nsx_auth'] = self.nsx.nsx_auth
+        return properties
+
+    def login(self):
+        """login as agent before first operation, return time"""
+        started = time.time()
+        current_ctx.set(cfy_mocks.MockCloudifyContext(
+            node_id='login', properties={}, runtime_properties={}
+        ))
+        try:
+            common.nsx_login({'nsx_auth': self.nsx.nsx_auth})
+        finally:
+            current_ctx.clear()
+        return time.time() - started
+
+    def _relationships(self, node):
+        if node.type not in EDGE_TYPES:
+            return []
+        return [cfy_mocks.MockRelationshipContext(
+            target=cfy_mocks.MockRelationshipSubjectContext(
+                node=None, instance=cfy_mocks.MockNodeInstanceContext(
+                    runtime_properties=dict(runtime_properties)
+                )
+            ),
+            type=relationship_type
+        ) for relationship_type, runtime_properties in (
+            EDGE_RELATIONSHIPS.items()
+        )]
+
+    def _execute(self, node, operation, inputs):
+        function = self.node_types[node.type][1].get(operation)
+        if not function:
+            return
+        for retry in xrange(TASK_RETRIES + 1):
+            ctx = cfy_mocks.MockCloudifyContext(
+                node_id=node.name, node_name=node.name,
+                properties=self._properties(node),
+                runtime_properties=self.runtime_properties.get(node.name),
+                relationships=self._relationships(node),
+                operation={
+                    'name': 'cloudify.interfaces.lifecycle.' + operation,
+                    'retry_number': retry
+                }
+            )
+            current_ctx.set(ctx)
+            try:
+                function(**inputs)
+                return
+            except cfy_exc.RecoverableError:
+                if retry == TASK_RETRIES:
+                    raise
+                self.retries += 1
+            finally:
+                # mock context replaces empty dict by own
+                self.runtime_properties[node.name] = (
+                    ctx.instance.runtime_properties
+                )
+                current_ctx.clear()
+
+    def run(self, nodes, operations, inputs=True):
+        """run operations for each node, return per node stats"""
+        stats = []
+        for node in nodes:
+            calls = len(self.nsx.calls)
+            started = time.time()
+            for operation in operations:
+                self._execute(node, operation, _resolve(
+                    node.inputs, self.runtime_properties
+                ) if inputs and operation == 'create' else {})
+            stats.append((time.time() - started, self.nsx.calls[calls:]))
+        return stats
+
+
+def _phase(stats, node_count):
+    latencies = [latency for latency, _ in stats]
+    calls = sum(len(node_calls) for _, node_calls in stats)
+    total = sum(latencies)
+    return {
+        'operations': len(stats),
+        'time': round(total, 4),
+        'ops_per_sec': round(len(stats) / total, 2) if total else None,
+        'api_calls': calls,
+        'api_calls_per_node': round(float(calls) / node_count, 2),
+        'p95_latency': round(percentile(latencies, 95), 4),
+        'max_latency': round(max(latencies or [0]), 4)
+    }
+
+
+def _by_resource(stats):
+    counters = collections.Counter()
+    for _, node_calls in stats:
+        for call in node_calls:
+            counters["%s %s" % (call.method, call.resource)] += 1
+    return dict(counters)
+
+
+def _left_objects(state):
+    return dict((name, len(objects)) for name, objects in [
+        ('edges', state.edges), ('switches', state.switches),
+        ('tags', state.tags), ('groups', state.groups),
+        ('policies', state.policies)
+    ] if objects)
+
+
+def run_scenario(name, params, latency=0, node_types=None):
+    """install and uninstall scenario, return result dict"""
+    nodes = SCENARIOS[name](params)
+    with FakeNsxManager(latency=latency, scopes=[TRANSPORT_ZONE]) as nsx:
+        # new process of agent in each run
+        runner = Runner(nsx, node_types or load_node_types())
+        # parse of raml on first login is not part of operations
+        login_time = runner.login()
+        install = runner.run(nodes, ['create', 'configure', 'start'])
+        uninstall = runner.run(
+            list(reversed(nodes)), ['stop', 'delete'], inputs=False
+        )
+        return {
+            'scenario': name,
+            'nodes': len(nodes),
+            'install': _phase(install, len(nodes)),
+            'uninstall': _phase(uninstall, len(nodes)),
+            'login_time': round(login_time, 4),
+            'retries': runner.retries,
+            'api_calls_by_resource': {
+                'install': _by_resource(install),
+                'uninstall': _by_resource(uninstall)
+            },
+            # objects which are not removed by uninstall
+            'left_objects': _left_objects(nsx.state)
+        }
+
+
+def run(params, latency=0, scenarios=None):
+    node_types = load_node_types()
+    return {
+        'parameters': dict(params, latency=latency),
+        'scenarios': [
+            run_scenario(name, params, latency, node_types)
+            for name in scenarios or SCENARIOS
+        ]
+    }
+
+
+def compare(result, baseline, tolerance):
+    """list of regressions against baseline result, api calls should not
+       grow, latency can grow only in tolerance"""
+    regressions = []
+    previous = dict(
+        (scenario['scenario'], scenario)
+        for scenario in baseline.get('scenarios', [])
+    )
+    for scenario in result['scenarios']:
+        old = previous.get(scenario['scenario'])
+        if not old or old['nodes'] != scenario['nodes']:
+            continue
+        for phase in ('install', 'uninstall'):
+            if scenario[phase]['api_calls'] > old[phase]['api_calls']:
+                regressions.append("%s %s: api calls %s -> %s" % (
+                    scenario['scenario'], phase, old[phase]['api_calls'],
+                    scenario[phase]['api_calls']
+                ))
+            if (
+                scenario[phase]['p95_latency'] >
+                old[phase]['p95_latency'] * (1 + tolerance)
+            ):
+                regressions.append("%s %s: p95 latency %s -> %s" % (
+                    scenario['scenario'], phase, old[phase]['p95_latency'],
+                    scenario[phase]['p95_latency']
+                ))
+        if scenario['left_objects'] and not old['left_objects']:
+            regressions.append("%s: objects left after uninstall %s" % (
+                scenario['scenario'], scenario['left_objects']
+            ))
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument('--groups', type=int, default=10)
+    parser.add_argument('--tags', type=int, default=10)
+    parser.add_argument('--neighbours', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0,
+                        help="latency of each nsx call, seconds")
+    parser.add_argument('--scenario', action='append',
+                        choices=list(SCENARIOS))
+    parser.add_argument('--output', help="save result to file")
+    parser.add_argument('--baseline', help="compare with previous result")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed growth of p95 latency")
+    args = parser.parse_args(argv)
+
+    # mock context logs to stdout, keep only json there
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        result = run({
+            'groups': args.groups,
+            'tags': args.tags,
+            'neighbours': args.neighbours
+        }, args.latency, args.scenario)
+    finally:
+        sys.stdout = stdout
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text)
+    print(text)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(result, json.load(baseline),
+                                  args.tolerance)
+        for regression in regressions:
+            sys.stderr.write("Regression: %s\n" % regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
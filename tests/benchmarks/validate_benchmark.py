@@ -0,0 +1,207 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Micro-benchmark of nsx_common validation.
+
+Compare previous interpretation of rule dicts on each call with rules
+prepared once by nsx_common.RulesValidator.
+
+    python -m tests.benchmarks.validate_benchmark [repeat]
+"""
+import sys
+import timeit
+import cloudify_nsx.library.nsx_common as common
+import cloudify_nsx.library.nsx_esg_dlr as nsx_esg_dlr
+import cloudify_nsx.network.dhcp_bind as dhcp_bind
+import cloudify_nsx.network.esg_nat as esg_nat
+from cloudify import exceptions as cfy_exc
+
+
+def legacy_validate(check_dict, validate_rules, use_existing):
+    """nsx_common._validate before RulesValidator, used as baseline"""
+    result = {}
+    for name in validate_rules:
+        rule = validate_rules[name]
+        required_value = rule.get('required', False)
+        external_use_value = rule.get('external_use', False)
+        default_value = rule.get('default', False)
+        set_none = rule.get('set_none', False)
+        values = rule.get('values', False)
+        sub_checks = rule.get('sub', None)
+        value_type = rule.get('type', 'string')
+        caseinsensitive = rule.get('caseinsensitive', False)
+
+        if 'default' in rule and name not in check_dict:
+            value = default_value
+        else:
+            value = check_dict.get(name)
+
+        if use_existing and external_use_value and not value:
+            raise cfy_exc.NonRecoverableError(
+                "don't have external value for %s" % name
+            )
+
+        if not use_existing and not external_use_value:
+            if required_value and not value and not isinstance(value, int):
+                raise cfy_exc.NonRecoverableError(
+                    "don't have value for %s " % name
+                )
+
+        if caseinsensitive and value:
+            value = value.lower()
+
+        if caseinsensitive and values:
+            values = [str(v).lower() for v in values]
+
+        if set_none and not value:
+            value = None
+        else:
+            if values:
+                if value not in values:
+                    raise cfy_exc.NonRecoverableError(
+                        "Wrong value %s=%s not in %s" % (
+                            name, str(value), str(values)
+                        )
+                    )
+            if sub_checks:
+                value = legacy_validate(value, sub_checks, use_existing)
+                if set_none:
+                    value = common._cleanup_if_empty(value)
+
+        if value_type == 'boolean' and isinstance(value, basestring):
+            value = str(value).lower() == 'true'
+        elif value_type == 'string' and isinstance(value, int):
+            value = str(value)
+        result[name] = value
+
+    return result
+
+
+LOG_LEVELS = [
+    "EMERGENCY", "ALERT", "CRITICAL", "ERROR", "WARNING", "NOTICE", "INFO",
+    "DEBUG"
+]
+
+# same rules as nsx_esg_dlr.EDGE_ROUTING_VALIDATOR
+ROUTING_RULES = {
+    "enabled": {"default": True, "type": "boolean"},
+    "staticRouting": {
+        "set_none": True,
+        "sub": {
+            "defaultRoute": {
+                "set_none": True,
+                "sub": {
+                    "gatewayAddress": {"set_none": True},
+                    "vnic": {"set_none": True},
+                    "mtu": {"set_none": True}
+                }
+            }
+        }
+    },
+    "routingGlobalConfig": {
+        "sub": {
+            "routerId": {"set_none": True},
+            "ecmp": {"default": False, "type": "boolean"},
+            "logging": {
+                "sub": {
+                    "logLevel": {
+                        "default": "INFO",
+                        "caseinsensitive": True,
+                        "values": LOG_LEVELS
+                    },
+                    "enable": {"default": False, "type": "boolean"}
+                }
+            }
+        }
+    }
+}
+
+ROUTING = {
+    "enabled": "true",
+    "staticRouting": {
+        "defaultRoute": {
+            "gatewayAddress": "192.168.1.1", "vnic": 0, "mtu": 1500
+        }
+    },
+    "routingGlobalConfig": {
+        "routerId": "192.168.1.2",
+        "ecmp": "false",
+        "logging": {"logLevel": "debug", "enable": "true"}
+    }
+}
+
+NAT_RULES = [{
+    "action": "dnat",
+    "originalAddress": "10.0.0.%s" % i,
+    "translatedAddress": "192.168.0.%s" % i,
+    "vnic": 1,
+    "originalPort": 80,
+    "translatedPort": 8080
+} for i in xrange(100)]
+
+BINDINGS = [{
+    "mac": "00:50:56:00:00:%02x" % i,
+    "hostname": "host%s" % i,
+    "ip": "192.168.0.%s" % i,
+    "lease_time": "infinite"
+} for i in xrange(100)]
+
+
+def cases():
+    """name, baseline call, compiled call"""
+    routing_validator = nsx_esg_dlr.EDGE_ROUTING_VALIDATOR
+    nat_validator = common.RulesValidator(esg_nat.RULE_VALIDATION_RULES)
+    bind_validator = common.RulesValidator(dhcp_bind.BIND_VALIDATION_RULES)
+    return [(
+        "edge routing (nested rules)",
+        lambda: legacy_validate(ROUTING, ROUTING_RULES, False),
+        lambda: routing_validator.validate(ROUTING, False)
+    ), (
+        "100 nat rules",
+        lambda: [legacy_validate(rule, esg_nat.RULE_VALIDATION_RULES, False)
+                 for rule in NAT_RULES],
+        lambda: [nat_validator.validate(rule, False) for rule in NAT_RULES]
+    ), (
+        "100 dhcp bindings",
+        lambda: [legacy_validate(bind, dhcp_bind.BIND_VALIDATION_RULES, False)
+                 for bind in BINDINGS],
+        lambda: [bind_validator.validate(bind, False) for bind in BINDINGS]
+    )]
+
+
+def run(repeat=2000):
+    """return list of (name, baseline usec, compiled usec, speedup)"""
+    results = []
+    for name, baseline, compiled in cases():
+        # both must return same result
+        assert baseline() == compiled(), name
+        baseline_time = min(timeit.repeat(baseline, number=repeat, repeat=3))
+        compiled_time = min(timeit.repeat(compiled, number=repeat, repeat=3))
+        results.append((
+            name,
+            baseline_time / repeat * 1000000,
+            compiled_time / repeat * 1000000,
+            baseline_time / compiled_time
+        ))
+    return results
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print("%-30s %12s %12s %8s" % (
+        "case", "dict, usec", "compiled", "speedup"
+    ))
+    for name, baseline_usec, compiled_usec, speedup in run(repeat):
+        print("%-30s %12.1f %12.1f %7.2fx" % (
+            name, baseline_usec, compiled_usec, speedup
+        ))
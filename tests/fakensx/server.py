@@ -0,0 +1,414 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""In-process fake of NSX Manager.
+
+Urls are routed by resources from nsxvapi.raml, so same raml is used by
+plugin client and by fake. Plugin client checks certificate of nsx, so
+server listens http on localhost and nsx_auth points to copy of raml with
+http base uri. Server checks basic auth, each call can be delayed or
+failed with configured status.
+
+    with FakeNsxManager() as nsx:
+        client_session = common.nsx_login({'nsx_auth': nsx.nsx_auth})
+"""
+import BaseHTTPServer
+import base64
+import collections
+import copy
+import os
+import re
+import shutil
+import socket
+import SocketServer
+import tempfile
+import threading
+import time
+import urllib
+import urlparse
+from lxml import etree
+from nsxramlclient import xmloperations
+import pyraml.parser
+import state as nsx_state
+
+RAML_FILE = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'cloudify_nsx', 'library',
+    'api_spec', 'nsxvapi.raml'
+)
+
+Route = collections.namedtuple('Route', ['regexp', 'name', 'methods'])
+
+Call = collections.namedtuple('Call', [
+    'method', 'resource', 'uri_parameters', 'query', 'status', 'latency'
+])
+
+# raml file -> parsed raml and routes, parse of raml is slow
+_raml_roots = {}
+_routes = {}
+
+# copy of raml with http base uri -> original raml
+_http_sources = {}
+
+
+def _collect_routes(resources, prefix, routes):
+    for path, resource in (resources or {}).items():
+        full_path = prefix + path
+        literal = 0
+        pattern = ""
+        for part in full_path.strip("/").split("/"):
+            match = re.match(r"^\{(\w+)\}$", part)
+            if match:
+                pattern += "/(?P<%s>[^/]+)" % match.group(1)
+            else:
+                pattern += "/" + re.escape(part)
+                literal += 1
+        routes.append((literal, Route(
+            re.compile("^" + pattern + "$"), resource.displayName,
+            set((resource.methods or {}).keys())
+        )))
+        _collect_routes(resource.resources, full_path, routes)
+
+
+def load_raml(raml_file=RAML_FILE):
+    """parsed raml, parsed once in process, copy of raml made for fake
+       is not parsed again"""
+    raml_file = os.path.abspath(raml_file)
+    if raml_file in _http_sources:
+        raml_root = copy.copy(load_raml(_http_sources[raml_file]))
+        raml_root.baseUri = _http_base_uri(raml_root.baseUri)
+        return raml_root
+    if raml_file not in _raml_roots:
+        _raml_roots[raml_file] = pyraml.parser.load(raml_file)
+    return _raml_roots[raml_file]
+
+
+def load_routes(raml_file=RAML_FILE):
+    """routes of resources from raml, literal urls go first"""
+    raml_file = os.path.abspath(raml_file)
+    if raml_file not in _routes:
+        routes = []
+        _collect_routes(load_raml(raml_file).resources, "", routes)
+        routes.sort(key=lambda route: -route[0])
+        _routes[raml_file] = [route for _, route in routes]
+    return _routes[raml_file]
+
+
+def _http_base_uri(base_uri):
+    return base_uri.replace('https://', 'http://', 1)
+
+
+def _http_raml(raml_file, directory):
+    """copy of raml with http base uri, files included by raml are
+       linked from original directory"""
+    source_directory = os.path.dirname(os.path.abspath(raml_file))
+    for name in os.listdir(source_directory):
+        os.symlink(
+            os.path.join(source_directory, name),
+            os.path.join(directory, name)
+        )
+    with open(raml_file) as source:
+        content = source.read()
+    http_file = os.path.join(directory, 'http_' + os.path.basename(raml_file))
+    with open(http_file, 'w') as target:
+        target.write(content.replace(
+            'baseUri: https://', 'baseUri: http://', 1
+        ))
+    _http_sources[http_file] = os.path.abspath(raml_file)
+    return http_file
+
+
+def _text(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, basestring):
+        return value
+    return str(value)
+
+
+def _append(parent, name, value):
+    if isinstance(value, list):
+        for item in value:
+            _append(parent, name, item)
+        return
+    element = etree.SubElement(parent, name)
+    if isinstance(value, dict):
+        for key, sub_value in value.items():
+            if key.startswith('@'):
+                element.set(key[1:], _text(sub_value))
+            else:
+                _append(element, key, sub_value)
+    elif value is not None:
+        element.text = _text(value)
+
+
+def to_xml(document):
+    """xml for dict with one root, empty values are kept as empty
+       elements"""
+    root = etree.Element('root')
+    for name, value in document.items():
+        _append(root, name, value)
+    return etree.tostring(root[0], encoding='UTF-8')
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # send response by one write, without delay of small packets
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length) if length else None
+        status, content, headers = self.server.manager.dispatch(
+            self.command.lower(), self.path, self.headers.get('Authorization'),
+            data
+        )
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_PUT = do_POST = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, *args, **kwargs):
+        BaseHTTPServer.HTTPServer.__init__(self, *args, **kwargs)
+        # keep-alive connections, closed on stop
+        self.connections = set()
+        self.connections_lock = threading.Lock()
+
+    def process_request_thread(self, request, client_address):
+        with self.connections_lock:
+            self.connections.add(request)
+        try:
+            SocketServer.ThreadingMixIn.process_request_thread(
+                self, request, client_address
+            )
+        finally:
+            with self.connections_lock:
+                self.connections.discard(request)
+
+    def close_connections(self):
+        with self.connections_lock:
+            for connection in self.connections:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except socket.error:
+                    pass
+
+
+class _Rule(object):
+    """latency or error for calls to resource/method, None - any"""
+
+    def __init__(self, resource, method, value, times=None):
+        self.resource = resource
+        self.method = method
+        self.value = value
+        # count of calls before rule is removed, None - forever
+        self.times = times
+
+    def match(self, resource, method):
+        return (
+            self.resource in (None, resource) and
+            self.method in (None, method)
+        )
+
+
+class FakeNsxManager(object):
+    """http server with state of nsx manager"""
+
+    def __init__(self, raml_file=RAML_FILE, username='admin',
+                 password='default', latency=0, scopes=None):
+        self.username = username
+        self.password = password
+        # scopes - names of transport zones
+        self.state = nsx_state.NsxState(scopes)
+        self.calls = []
+        self._raml_file = raml_file
+        self._routes = load_routes(raml_file)
+        self._latencies = []
+        self._errors = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._directory = None
+        self._http_raml = None
+        if latency:
+            self.set_latency(latency)
+
+    # configuration
+
+    @property
+    def host(self):
+        return '127.0.0.1:%s' % self._server.server_address[1]
+
+    @property
+    def nsx_auth(self):
+        """nsx_auth for plugin properties"""
+        return {
+            'username': self.username,
+            'password': self.password,
+            'host': self.host,
+            'raml': self._http_raml
+        }
+
+    def set_latency(self, seconds, resource=None, method=None):
+        """delay of calls to resource/method, last set rule is used
+           first"""
+        with self._lock:
+            self._latencies.insert(0, _Rule(resource, method, seconds))
+
+    def inject_error(self, status, resource=None, method=None, times=1,
+                     message="Injected error"):
+        """fail next calls to resource/method with status, times=None
+           fails all calls"""
+        with self._lock:
+            self._errors.append(_Rule(resource, method, (
+                status, message
+            ), times))
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls = []
+
+    # server
+
+    def start(self):
+        self._directory = tempfile.mkdtemp(prefix='fakensx')
+        self._http_raml = _http_raml(self._raml_file, self._directory)
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.manager = self
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.close_connections()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+        if self._directory:
+            _http_sources.pop(self._http_raml, None)
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    # requests
+
+    def _route(self, path):
+        for route in self._routes:
+            match = route.regexp.match(path)
+            if match:
+                return route, dict(
+                    (name, urllib.unquote(value))
+                    for name, value in match.groupdict().items()
+                )
+        return None, None
+
+    def _rule(self, rules, resource, method):
+        with self._lock:
+            for rule in rules:
+                if rule.match(resource, method):
+                    if rule.times is not None:
+                        rule.times -= 1
+                        if rule.times <= 0:
+                            rules.remove(rule)
+                    return rule.value
+        return None
+
+    def _response(self, status, body, location=None):
+        headers = []
+        if location:
+            headers.append(('Location', location))
+        if isinstance(body, dict):
+            headers.append(('Content-Type', 'application/xml'))
+            content = to_xml(body)
+        elif body is not None:
+            headers.append(('Content-Type', 'text/plain'))
+            content = _text(body)
+        else:
+            content = ''
+        return status, content, headers
+
+    def _error(self, error):
+        return self._response(error.status, error.body())
+
+    def dispatch(self, method, url, authorization, data):
+        """status, content and headers of response"""
+        started = time.time()
+        url = urlparse.urlparse(url)
+        query = dict(urlparse.parse_qsl(url.query))
+        path = url.path
+        if path.startswith('/api/'):
+            path = path[len('/api'):]
+        route, params = self._route(path)
+        if not route:
+            return self._error(nsx_state.NsxError(
+                404, "Url %s is not found" % url.path
+            ))
+        if authorization != 'Basic ' + base64.b64encode(
+            '%s:%s' % (self.username, self.password)
+        ):
+            return self._error(nsx_state.NsxError(403, "Wrong credentials"))
+
+        latency = self._rule(self._latencies, route.name, method)
+        if latency:
+            time.sleep(latency)
+
+        error = self._rule(self._errors, route.name, method)
+        if method not in route.methods:
+            response = self._error(nsx_state.NsxError(
+                405, "Method %s is not supported" % method
+            ))
+        elif error:
+            response = self._error(nsx_state.NsxError(*error))
+        else:
+            try:
+                body = None
+                if data:
+                    body = xmloperations.xml_to_dict(etree.fromstring(data))
+                with self._lock:
+                    response = self._response(*self.state.handle(
+                        route.name, method, params, query, body, url.path
+                    ))
+            except etree.XMLSyntaxError:
+                response = self._error(nsx_state.NsxError(
+                    400, "Request body is not xml"
+                ))
+            except nsx_state.NsxError as e:
+                response = self._error(e)
+        with self._lock:
+            self.calls.append(Call(
+                method, route.name, params, query, response[0],
+                time.time() - started
+            ))
+        return response
@@ -0,0 +1,668 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""State of fake nsx manager.
+
+Objects are kept as dicts in the same form as nsxramlclient returns
+them (xml_to_dict), handlers are selected by displayName of resource in
+raml. Edges, edge features (routing, firewall, nat, dhcp, interfaces),
+logical switches, security tags, groups and policies have own handlers,
+other resources are saved as documents by url path.
+"""
+import collections
+import copy
+import itertools
+
+# page size used by nsx when request has no pageSize
+DEFAULT_PAGE_SIZE = 256
+
+# features of edge returned by nsx before first update
+FEATURE_DEFAULTS = {
+    'routingGlobalConfig': {'routingGlobalConfig': {
+        'ecmp': 'false',
+        'logging': {'enable': 'false', 'logLevel': 'info'}
+    }},
+    'routingConfigStatic': {'staticRouting': {'staticRoutes': None}},
+    'routingOSPF': {'ospf': {'enabled': 'false'}},
+    'routingBGP': {'bgp': {'enabled': 'false'}},
+    'routingConfig': {'routing': {'enabled': 'true'}},
+    'nsxEdgeFirewallConfig': {'firewall': {
+        'enabled': 'true', 'firewallRules': None
+    }},
+    'defaultFirewallPolicy': {'firewallDefaultPolicy': {
+        'action': 'deny', 'loggingEnabled': 'false'
+    }},
+    'edgeNat': {'nat': {'enabled': 'true', 'natRules': None}},
+    'dhcp': {'dhcp': {
+        'enabled': 'false', 'ipPools': None, 'staticBindings': None,
+        'logging': {'enable': 'false', 'logLevel': 'info'}
+    }},
+    'dhcpRelay': {'relay': {'relayServer': None, 'relayAgents': None}},
+}
+
+# features which include other features:
+# name -> key in document -> (child name, root of child document)
+COMPOSITES = {
+    'routingConfig': {
+        'routingGlobalConfig': ('routingGlobalConfig', 'routingGlobalConfig'),
+        'staticRouting': ('routingConfigStatic', 'staticRouting'),
+        'ospf': ('routingOSPF', 'ospf'),
+        'bgp': ('routingBGP', 'bgp')
+    },
+    'nsxEdgeFirewallConfig': {
+        'defaultPolicy': ('defaultFirewallPolicy', 'firewallDefaultPolicy')
+    }
+}
+
+# lists of items in features with ids assigned by nsx:
+# name -> (feature, path to list, id field, id prefix, body root)
+ITEM_LISTS = {
+    'firewallRule': (
+        'nsxEdgeFirewallConfig', 'firewall/firewallRules/firewallRule',
+        'id', '', 'firewallRules/firewallRule'
+    ),
+    'natRule': (
+        'edgeNat', 'nat/natRules/natRule', 'ruleId', '', 'natRules/natRule'
+    ),
+    'ipPool': (
+        'dhcp', 'dhcp/ipPools/ipPool', 'poolId', 'pool-', 'ipPool'
+    ),
+    'staticBinding': (
+        'dhcp', 'dhcp/staticBindings/staticBinding', 'bindingId',
+        'binding-', 'staticBinding'
+    )
+}
+
+# resources for add of items: name -> item list
+ITEM_CREATE = {
+    'firewallRules': 'firewallRule',
+    'edgeNatRules': 'natRule',
+    'dhcpPool': 'ipPool',
+    'dhcpStaticBinding': 'staticBinding'
+}
+
+# resources of one item: name -> (item list, uri parameter with id)
+ITEM_RESOURCES = {
+    'firewallRule': ('firewallRule', 'ruleId'),
+    'edgeNatRule': ('natRule', 'ruleID'),
+    'dhcpPoolID': ('ipPool', 'poolID'),
+    'dhcpStaticBindingID': ('staticBinding', 'bindingID')
+}
+
+
+class NsxError(Exception):
+    """error response of fake nsx"""
+
+    def __init__(self, status, message, code=None):
+        super(NsxError, self).__init__(message)
+        self.status = status
+        self.message = message
+        self.code = code or status
+
+    def body(self):
+        return {'error': {
+            'details': self.message, 'errorCode': str(self.code)
+        }}
+
+
+def as_list(value):
+    """value of xml element as list"""
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def list_at(obj, path):
+    """list in path of object, missing and empty parents are created"""
+    names = path.split("/")
+    for name in names[:-1]:
+        if not isinstance(obj.get(name), dict):
+            obj[name] = {}
+        obj = obj[name]
+    obj[names[-1]] = as_list(obj.get(names[-1]))
+    return obj[names[-1]]
+
+
+def _root(body, name):
+    """content of request body with root element name"""
+    if not isinstance(body, dict) or name not in body:
+        raise NsxError(400, "Request body should have %s element" % name)
+    return body[name] or {}
+
+
+def _page(items, query):
+    """part of list selected by startIndex/pageSize and paging info"""
+    query = dict((key.lower(), value) for key, value in query.items())
+    try:
+        start = int(query.get('startindex') or 0)
+        size = int(query.get('pagesize') or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        raise NsxError(400, "Wrong paging parameters")
+    paging_info = {
+        'pageSize': str(size),
+        'startIndex': str(start),
+        'totalCount': str(len(items)),
+        'sortOrderAscending': 'true'
+    }
+    return items[start:start + size], paging_info
+
+
+class NsxState(object):
+    """objects of fake nsx manager"""
+
+    def __init__(self, scopes=None):
+        self._ids = collections.defaultdict(lambda: itertools.count(1))
+        # edge id -> {'edge': edge, 'features': {name: document}}
+        self.edges = collections.OrderedDict()
+        self.scopes = collections.OrderedDict()
+        self.switches = collections.OrderedDict()
+        self.tags = collections.OrderedDict()
+        self.tag_vms = collections.defaultdict(list)
+        self.groups = collections.OrderedDict()
+        self.policies = collections.OrderedDict()
+        # url path -> document, for resources without own handler
+        self.documents = {}
+        for name in scopes or ['TZ']:
+            scope_id = self.new_id('vdnscope-')
+            self.scopes[scope_id] = {
+                'objectId': scope_id, 'id': scope_id, 'name': name,
+                'controlPlaneMode': 'UNICAST_MODE'
+            }
+
+    def new_id(self, prefix):
+        return "%s%s" % (prefix, next(self._ids[prefix]))
+
+    def handle(self, name, method, params, query, body, path):
+        """response (status, body, location) for request to resource
+           with displayName name"""
+        response = self._handle(name, method, params, query, body, path)
+        # nsx increases version of edge on each change of edge
+        edge = self.edges.get(params.get('edgeId'))
+        if edge and method != 'get':
+            edge['edge']['version'] = str(int(edge['edge']['version']) + 1)
+        return response
+
+    def _handle(self, name, method, params, query, body, path):
+        handler = getattr(self, '_%s_%s' % (method, name), None)
+        if handler:
+            return handler(params, query, body)
+        if name in FEATURE_DEFAULTS:
+            return self._feature(name, method, params, body)
+        if name in ITEM_CREATE and method == 'post':
+            return self._add_items(ITEM_CREATE[name], params, body)
+        if name in ITEM_RESOURCES:
+            return self._item(name, method, params, body)
+        return self._document(method, path, body)
+
+    # documents without own handler
+
+    def _document(self, method, path, body):
+        if method == 'get':
+            if path not in self.documents:
+                raise NsxError(404, "Object %s is not found" % path)
+            return 200, copy.deepcopy(self.documents[path]), None
+        if method == 'put':
+            self.documents[path] = copy.deepcopy(body)
+            return 204, None, None
+        if method == 'delete':
+            self.documents.pop(path, None)
+            return 204, None, None
+        object_id = self.new_id('object-')
+        location = "%s/%s" % (path, object_id)
+        self.documents[location] = copy.deepcopy(body)
+        return 201, object_id, location
+
+    # edges
+
+    def _edge(self, params):
+        edge_id = params.get('edgeId')
+        if edge_id not in self.edges:
+            raise NsxError(404, "Edge %s is not found" % edge_id, 202)
+        return self.edges[edge_id]
+
+    def _post_nsxEdges(self, params, query, body):
+        edge = copy.deepcopy(_root(body, 'edge'))
+        edge_id = self.new_id('edge-')
+        edge['id'] = edge_id
+        edge['type'] = edge.get('type') or 'gatewayServices'
+        edge['version'] = '1'
+        # appliances are deployed immediately
+        for appliance in list_at(edge, 'appliances/appliance'):
+            appliance['vmId'] = self.new_id('vm-')
+        self.edges[edge_id] = {'edge': edge, 'features': {}}
+        return 201, None, '/api/4.0/edges/%s' % edge_id
+
+    def _get_nsxEdges(self, params, query, body):
+        summaries = [{
+            'objectId': edge_id,
+            'id': edge_id,
+            'name': edge['edge'].get('name'),
+            'edgeType': edge['edge'].get('type'),
+            'edgeStatus': 'GREEN'
+        } for edge_id, edge in self.edges.items()]
+        summaries, paging_info = _page(summaries, query)
+        return 200, {'pagedEdgeList': {'edgePage': {
+            'pagingInfo': paging_info, 'edgeSummary': summaries
+        }}}, None
+
+    def _get_nsxEdge(self, params, query, body):
+        return 200, {'edge': copy.deepcopy(self._edge(params)['edge'])}, None
+
+    def _put_nsxEdge(self, params, query, body):
+        edge = self._edge(params)
+        new_edge = copy.deepcopy(_root(body, 'edge'))
+        new_edge['id'] = edge['edge']['id']
+        new_edge['type'] = edge['edge']['type']
+        new_edge['version'] = edge['edge']['version']
+        edge['edge'] = new_edge
+        return 204, None, None
+
+    def _post_nsxEdge(self, params, query, body):
+        # actions on edge
+        self._edge(params)
+        return 204, None, None
+
+    def _delete_nsxEdge(self, params, query, body):
+        self._edge(params)
+        del self.edges[params['edgeId']]
+        return 204, None, None
+
+    # edge features
+
+    def _read_feature(self, features, name):
+        document = copy.deepcopy(
+            features.get(name) or FEATURE_DEFAULTS[name]
+        )
+        root = document.keys()[0]
+        for key, (child, child_root) in COMPOSITES.get(name, {}).items():
+            document[root][key] = self._read_feature(
+                features, child
+            )[child_root]
+        return document
+
+    def _write_feature(self, features, name, document):
+        document = copy.deepcopy(document)
+        root = document.keys()[0]
+        if not isinstance(document[root], dict):
+            document[root] = {}
+        for key, (child, child_root) in COMPOSITES.get(name, {}).items():
+            if key in document[root]:
+                self._write_feature(
+                    features, child, {child_root: document[root].pop(key)}
+                )
+        for item_list, (feature, path, id_field, prefix, _) in (
+            ITEM_LISTS.items()
+        ):
+            if feature == name:
+                for item in list_at(document, path):
+                    if not item.get(id_field):
+                        item[id_field] = self.new_id(prefix)
+        features[name] = document
+
+    def _reset_feature(self, features, name):
+        features.pop(name, None)
+        for child, _ in COMPOSITES.get(name, {}).values():
+            self._reset_feature(features, child)
+
+    def _feature(self, name, method, params, body):
+        features = self._edge(params)['features']
+        if method == 'get':
+            return 200, self._read_feature(features, name), None
+        if method == 'put':
+            root = FEATURE_DEFAULTS[name].keys()[0]
+            _root(body, root)
+            self._write_feature(features, name, body)
+            return 204, None, None
+        if method == 'delete':
+            self._reset_feature(features, name)
+            return 204, None, None
+        raise NsxError(405, "Method is not supported")
+
+    def _add_items(self, item_list, params, body):
+        feature, path, id_field, prefix, body_path = ITEM_LISTS[item_list]
+        features = self._edge(params)['features']
+        new_items = copy.deepcopy(list_at(dict(body or {}), body_path))
+        if not new_items:
+            raise NsxError(400, "Request body should have %s" % body_path)
+        document = self._read_feature(features, feature)
+        items = list_at(document, path)
+        for item in new_items:
+            item[id_field] = self.new_id(prefix)
+            items.append(item)
+        self._write_feature(features, feature, document)
+        return 201, None, new_items[-1][id_field]
+
+    def _item(self, name, method, params, body):
+        item_list, id_param = ITEM_RESOURCES[name]
+        feature, path, id_field, _, body_path = ITEM_LISTS[item_list]
+        features = self._edge(params)['features']
+        document = self._read_feature(features, feature)
+        items = list_at(document, path)
+        for item in items:
+            if str(item.get(id_field)) == params[id_param]:
+                break
+        else:
+            raise NsxError(404, "Object %s is not found" % params[id_param])
+        if method == 'get':
+            return 200, {body_path.split("/")[-1]: item}, None
+        if method == 'delete':
+            items.remove(item)
+        elif method == 'put':
+            item.clear()
+            item.update(_root(body, body_path.split("/")[-1]))
+            item[id_field] = params[id_param]
+        self._write_feature(features, feature, document)
+        return 204, None, None
+
+    # interfaces of dlr and vnics of esg
+
+    def _interfaces(self, params):
+        edge = self._edge(params)['edge']
+        if edge['type'] == 'distributedRouter':
+            return list_at(edge, 'interfaces/interface')
+        return list_at(edge, 'vnics/vnic')
+
+    def _get_interfaces(self, params, query, body):
+        return 200, {'interfaces': {
+            'interface': copy.deepcopy(self._interfaces(params))
+        }}, None
+
+    def _post_interfaces(self, params, query, body):
+        interfaces = self._interfaces(params)
+        new_interfaces = copy.deepcopy(
+            list_at(dict(body or {}), 'interfaces/interface')
+        )
+        for interface in new_interfaces:
+            if not interface.get('index'):
+                used = [int(item['index']) for item in interfaces]
+                # first indexes are reserved for uplinks
+                interface['index'] = str(max(used + [9]) + 1)
+            interfaces[:] = [
+                item for item in interfaces
+                if item.get('index') != interface['index']
+            ] + [interface]
+        if len(new_interfaces) == 1:
+            new_interfaces = new_interfaces[0]
+        return 200, {'interfaces': {'interface': new_interfaces}}, None
+
+    def _delete_interfaces(self, params, query, body):
+        interfaces = self._interfaces(params)
+        interfaces[:] = [
+            item for item in interfaces
+            if item.get('index') != query.get('index')
+        ]
+        return 204, None, None
+
+    def _vnic(self, params):
+        for vnic in self._interfaces(params):
+            if str(vnic.get('index')) == params['index']:
+                return vnic
+        return None
+
+    def _get_vnic(self, params, query, body):
+        vnic = self._vnic(params) or {
+            'index': params['index'],
+            'name': 'vnic%s' % params['index'],
+            'type': 'internal',
+            'isConnected': 'false',
+            'mtu': '1500'
+        }
+        return 200, {'vnic': copy.deepcopy(vnic)}, None
+
+    def _put_vnic(self, params, query, body):
+        vnic = copy.deepcopy(_root(body, 'vnic'))
+        vnic['index'] = params['index']
+        interfaces = self._interfaces(params)
+        interfaces[:] = [
+            item for item in interfaces
+            if str(item.get('index')) != params['index']
+        ] + [vnic]
+        return 204, None, None
+
+    def _delete_vnic(self, params, query, body):
+        interfaces = self._interfaces(params)
+        interfaces[:] = [
+            item for item in interfaces
+            if str(item.get('index')) != params['index']
+        ]
+        return 204, None, None
+
+    # logical switches
+
+    def _get_vdnScopes(self, params, query, body):
+        return 200, {'vdnScopes': {
+            'vdnScope': copy.deepcopy(self.scopes.values())
+        }}, None
+
+    def _switches_page(self, switches, query):
+        switches, paging_info = _page(switches, query)
+        return 200, {'virtualWires': {'dataPage': {
+            'pagingInfo': paging_info, 'virtualWire': switches
+        }}}, None
+
+    def _post_logicalSwitches(self, params, query, body):
+        if params['scopeId'] not in self.scopes:
+            raise NsxError(404, "Scope %s is not found" % params['scopeId'])
+        spec = _root(body, 'virtualWireCreateSpec')
+        switch_id = self.new_id('virtualwire-')
+        self.switches[switch_id] = {
+            'objectId': switch_id,
+            'name': spec.get('name'),
+            'description': spec.get('description'),
+            'tenantId': spec.get('tenantId'),
+            'controlPlaneMode': spec.get('controlPlaneMode'),
+            'vdnScopeId': params['scopeId'],
+            'vdsContextWithBacking': {
+                'switch': {'objectId': 'dvs-1'},
+                'backingType': 'portgroup',
+                'backingValue': self.new_id('dvportgroup-')
+            }
+        }
+        return (
+            201, switch_id, '/api/2.0/vdn/virtualwires/%s' % switch_id
+        )
+
+    def _get_logicalSwitches(self, params, query, body):
+        return self._switches_page([
+            switch for switch in self.switches.values()
+            if switch['vdnScopeId'] == params['scopeId']
+        ], query)
+
+    def _get_logicalSwitchesGlobal(self, params, query, body):
+        return self._switches_page(self.switches.values(), query)
+
+    def _switch(self, params):
+        if params['virtualWireID'] not in self.switches:
+            raise NsxError(
+                404, "Switch %s is not found" % params['virtualWireID']
+            )
+        return self.switches[params['virtualWireID']]
+
+    def _get_logicalSwitch(self, params, query, body):
+        return 200, {'virtualWire': copy.deepcopy(self._switch(params))}, None
+
+    def _delete_logicalSwitch(self, params, query, body):
+        self._switch(params)
+        del self.switches[params['virtualWireID']]
+        return 200, None, None
+
+    # security tags
+
+    def _tag(self, params):
+        if params['tagId'] not in self.tags:
+            raise NsxError(404, "Tag %s is not found" % params['tagId'])
+        return self.tags[params['tagId']]
+
+    def _post_securityTag(self, params, query, body):
+        tag = copy.deepcopy(_root(body, 'securityTag'))
+        tag_id = self.new_id('securitytag-')
+        tag['objectId'] = tag_id
+        self.tags[tag_id] = tag
+        return (
+            201, tag_id, '/api/2.0/services/securitytags/tag/%s' % tag_id
+        )
+
+    def _get_securityTag(self, params, query, body):
+        tags, paging_info = _page(copy.deepcopy(self.tags.values()), query)
+        return 200, {'securityTags': {
+            'pagingInfo': paging_info, 'securityTag': tags
+        }}, None
+
+    def _delete_securityTagID(self, params, query, body):
+        self._tag(params)
+        del self.tags[params['tagId']]
+        self.tag_vms.pop(params['tagId'], None)
+        return 200, None, None
+
+    def _get_securityTagVMsList(self, params, query, body):
+        self._tag(params)
+        return 200, {'basicinfolist': {'basicinfo': [
+            {'objectId': vm_id, 'name': vm_id}
+            for vm_id in self.tag_vms[params['tagId']]
+        ]}}, None
+
+    def _attach(self, tag_id, vm_id):
+        if vm_id not in self.tag_vms[tag_id]:
+            self.tag_vms[tag_id].append(vm_id)
+
+    def _detach(self, tag_id, vm_id):
+        if vm_id in self.tag_vms[tag_id]:
+            self.tag_vms[tag_id].remove(vm_id)
+
+    def _post_securityTagVMsList(self, params, query, body):
+        self._tag(params)
+        action = {
+            'attach': self._attach, 'detach': self._detach
+        }.get(query.get('action'))
+        if not action:
+            raise NsxError(400, "Unknown action %s" % query.get('action'))
+        assignment = _root(body, 'securityTagAssignment')
+        for vm_id in list_at(assignment, 'virtualMachineIds/string'):
+            action(params['tagId'], vm_id)
+        return 200, None, None
+
+    def _put_securityTagVM(self, params, query, body):
+        self._tag(params)
+        self._attach(params['tagId'], params['vmMoid'])
+        return 200, None, None
+
+    def _delete_securityTagVM(self, params, query, body):
+        self._tag(params)
+        self._detach(params['tagId'], params['vmMoid'])
+        return 200, None, None
+
+    # security groups
+
+    def _group(self, group_id):
+        if group_id not in self.groups:
+            raise NsxError(404, "Group %s is not found" % group_id)
+        return self.groups[group_id]
+
+    def _post_secGroupBulk(self, params, query, body):
+        group = copy.deepcopy(_root(body, 'securitygroup'))
+        group_id = self.new_id('securitygroup-')
+        group['objectId'] = group_id
+        group['scope'] = {'id': params['scopeId']}
+        self.groups[group_id] = group
+        return (
+            201, group_id, '/api/2.0/services/securitygroup/%s' % group_id
+        )
+
+    def _replace_group(self, group_id, body):
+        old_group = self._group(group_id)
+        group = copy.deepcopy(_root(body, 'securitygroup'))
+        group['objectId'] = group_id
+        group['scope'] = old_group.get('scope')
+        self.groups[group_id] = group
+        return 200, None, None
+
+    def _put_secGroupBulk(self, params, query, body):
+        return self._replace_group(params['scopeId'], body)
+
+    def _get_secGroupScope(self, params, query, body):
+        groups, paging_info = _page([
+            group for group in copy.deepcopy(self.groups.values())
+            if (group.get('scope') or {}).get('id') == params['scopeId']
+        ], query)
+        return 200, {'list': {
+            'pagingInfo': paging_info, 'securitygroup': groups
+        }}, None
+
+    def _get_secGroupObject(self, params, query, body):
+        return 200, {'securitygroup': copy.deepcopy(
+            self._group(params['objectId'])
+        )}, None
+
+    def _put_secGroupObject(self, params, query, body):
+        return self._replace_group(params['objectId'], body)
+
+    def _delete_secGroupObject(self, params, query, body):
+        self._group(params['objectId'])
+        del self.groups[params['objectId']]
+        return 200, None, None
+
+    def _put_secGroupMember(self, params, query, body):
+        members = list_at(self._group(params['objectId']), 'member')
+        if params['memberMoref'] not in [
+            member.get('objectId') for member in members
+        ]:
+            members.append({'objectId': params['memberMoref']})
+        return 200, None, None
+
+    def _delete_secGroupMember(self, params, query, body):
+        members = list_at(self._group(params['objectId']), 'member')
+        members[:] = [
+            member for member in members
+            if member.get('objectId') != params['memberMoref']
+        ]
+        return 200, None, None
+
+    # security policies
+
+    def _policy(self, params):
+        if params['ID'] not in self.policies:
+            raise NsxError(404, "Policy %s is not found" % params['ID'])
+        return self.policies[params['ID']]
+
+    def _post_securityPolicy(self, params, query, body):
+        policy = copy.deepcopy(_root(body, 'securityPolicy'))
+        policy_id = self.new_id('policy-')
+        policy['objectId'] = policy_id
+        self.policies[policy_id] = policy
+        return (
+            201, policy_id,
+            '/api/2.0/services/policy/securitypolicy/%s' % policy_id
+        )
+
+    def _get_securityPolicyID(self, params, query, body):
+        if params['ID'] == 'all':
+            return 200, {'securityPolicies': {
+                'securityPolicy': copy.deepcopy(self.policies.values())
+            }}, None
+        return 200, {
+            'securityPolicy': copy.deepcopy(self._policy(params))
+        }, None
+
+    def _put_securityPolicyID(self, params, query, body):
+        self._policy(params)
+        policy = copy.deepcopy(_root(body, 'securityPolicy'))
+        policy['objectId'] = params['ID']
+        self.policies[params['ID']] = policy
+        return 200, None, None
+
+    def _delete_securityPolicyID(self, params, query, body):
+        self._policy(params)
+        del self.policies[params['ID']]
+        return 204, None, None
@@ -11,9 +11,13 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import contextlib
 import unittest
 import mock
 import copy
+import cloudify_nsx.library.nsx_common as common
+import cloudify_nsx.library.nsx_raml_index as nsx_raml_index
+from tests.fakensx import server as fakensx_server
 from cloudify import mocks as cfy_mocks
 from cloudify import exceptions as cfy_exc
 from cloudify.state import current_ctx
@@ -392,6 +396,18 @@ ROUTING_CONFIG_UPDATE_EXTRACT = {
 }
 
 
+def raml_root(raml_file=None):
+    """parsed raml, by default embedded to plugin, parse takes seconds so
+       raml is parsed once for all tests"""
+    return fakensx_server.load_raml(raml_file or common.default_raml_file())
+
+
+def raml_index_load(index_dir, raml_file):
+    """nsx_raml_index.load without index files, for nsx_login with real
+       raml"""
+    return raml_root(raml_file)
+
+
 class NSXBaseTest(unittest.TestCase):
 
     def _regen_ctx(self):
@@ -406,6 +422,22 @@ class NSXBaseTest(unittest.TestCase):
         node.runtime_properties = {}
         current_ctx.set(self.fake_ctx)
 
+    def _raml_client(self, host='nsx_host'):
+        """client with embedded raml, requests are sent by
+           client._httpsession.do_request"""
+        return nsx_raml_index.IndexedNsxClient(
+            raml_root(), common.default_raml_file(), host, 'username',
+            'password'
+        )
+
+    def _patch_raml_index(self):
+        """nsx_login in test reuses parsed raml"""
+        patcher = mock.patch(
+            'cloudify_nsx.library.nsx_raml_index.load', raml_index_load
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     def _regen_relationship_ctx(self):
         # source
         source_instance = mock.Mock()
@@ -536,6 +568,26 @@ class NSXBaseTest(unittest.TestCase):
 
         return fake_client, fake_cs_result, kwargs
 
+    @contextlib.contextmanager
+    def _fake_client(self, func_kwargs, resource_id=None,
+                     read_responses=None, **responses):
+        """fake client for nsx_login in operation and kwargs of operation,
+           read returns read_responses one by one, other responses as in
+           _update_fake_cs_result"""
+        fake_client, fake_cs_result, kwargs = self._kwargs_regen_client(
+            resource_id, func_kwargs
+        )
+        self._update_fake_cs_result(fake_cs_result, **responses)
+        if read_responses:
+            fake_cs_result.read = mock.Mock(
+                side_effect=copy.deepcopy(read_responses)
+            )
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.NsxClient',
+            fake_client
+        ):
+            yield fake_cs_result, kwargs
+
     def _common_run_relationship(self, func):
         """check that we have RecoverableError with empty properties"""
         fake_client, fake_cs_result, kwargs = self._kwargs_regen_client(
@@ -0,0 +1,165 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+import mock
+import pytest
+import cloudify_nsx.library.nsx_common as common
+import cloudify_nsx.library.nsx_call_log as nsx_call_log
+from cloudify import exceptions as cfy_exc
+import test_nsx_base
+
+
+class NsxCallLogTest(test_nsx_base.NSXBaseTest):
+
+    def _fake_client(self):
+        client = mock.Mock()
+        client._httpsession._session.hooks = {'response': []}
+
+        def fake_read(searched_resource, uri_parameters=None, **kwargs):
+            # response hook is called by requests inside of request
+            for hook in client._httpsession._session.hooks['response']:
+                hook(mock.Mock(content='<edge/>'))
+            return {'status': 200, 'body': {'edge': {}}}
+
+        client.read = mock.Mock(side_effect=fake_read)
+        client.delete = mock.Mock(return_value={'status': 404})
+        return client
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_instrumented_client(self):
+        """Check nsx_call_log.InstrumentedClient"""
+        client = self._fake_client()
+        logger = mock.Mock()
+        summaries = []
+        nsx_call_log.install_response_hook(client)
+        # hook is added only once
+        nsx_call_log.install_response_hook(client)
+        self.assertEqual(
+            len(client._httpsession._session.hooks['response']), 1
+        )
+
+        instrumented = nsx_call_log.InstrumentedClient(
+            client, logger, log_calls=True, on_summary=summaries.append
+        )
+        self.assertEqual(
+            instrumented.read('nsxEdge', uri_parameters={'edgeId': 'id'}),
+            {'status': 200, 'body': {'edge': {}}}
+        )
+        client.read.assert_called_with(
+            'nsxEdge', uri_parameters={'edgeId': 'id'}
+        )
+        logger.info.assert_called_with(
+            "NSX call read nsxEdge {'edgeId': 'id'}: status 200, %.3fs, "
+            "7 bytes" % instrumented.summary.time
+        )
+        instrumented.delete('nsxEdge', {'edgeId': 'id'})
+        logger.info.assert_called_with(
+            "NSX call delete nsxEdge {'edgeId': 'id'}: status 404, %.3fs, "
+            "unknown bytes" % instrumented.summary.resources[
+                'nsxEdge'
+            ].time
+        )
+
+        # other attributes are not changed
+        self.assertEqual(
+            instrumented.extract_resource_body_example,
+            client.extract_resource_body_example
+        )
+        self.assertTrue(instrumented.client is client)
+
+        # failed call
+        client.update = mock.Mock(side_effect=SystemExit())
+        with self.assertRaises(SystemExit):
+            instrumented.update('nsxEdge', uri_parameters={'edgeId': 'id'})
+
+        summary = summaries[-1]
+        self.assertEqual(len(summaries), 3)
+        self.assertEqual(summary['calls'], 3)
+        self.assertEqual(summary['errors'], 2)
+        self.assertEqual(summary['slow'], 0)
+        self.assertEqual(summary['size'], 7)
+        self.assertEqual(summary['resources']['nsxEdge']['calls'], 3)
+        logger.warn.assert_not_called()
+
+        # slow calls only
+        logger = mock.Mock()
+        instrumented = nsx_call_log.InstrumentedClient(
+            client, logger, slow_call=0.5
+        )
+        with mock.patch(
+            'cloudify_nsx.library.nsx_call_log.time.time',
+            mock.Mock(side_effect=[10, 11, 20, 20.1])
+        ):
+            instrumented.read('nsxEdge', uri_parameters={'edgeId': 'id'})
+            instrumented.read('nsxEdges')
+        logger.warn.assert_called_once_with(
+            "Slow NSX call read nsxEdge {'edgeId': 'id'}: status 200, "
+            "1.000s, 7 bytes"
+        )
+        logger.info.assert_not_called()
+        self.assertEqual(instrumented.summary.slow, 1)
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_nsx_login_instrumented(self):
+        """Check nsx_common.nsx_login with call summary"""
+        self._regen_ctx()
+        client = self._fake_client()
+        nsx_auth = {
+            'username': 'username',
+            'password': 'password',
+            'host': 'host',
+            'raml': 'raml'
+        }
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.NsxClient',
+            mock.Mock(return_value=client)
+        ):
+            # disabled by default
+            self.assertTrue(
+                common.nsx_login({'nsx_auth': nsx_auth}) is client
+            )
+
+            self._regen_ctx()
+            instrumented = common.nsx_login({'nsx_auth': dict(
+                nsx_auth, call_summary='true'
+            )})
+            self.assertTrue(
+                isinstance(instrumented, nsx_call_log.InstrumentedClient)
+            )
+            self.assertTrue(instrumented.client is client)
+            self.assertFalse(
+                'nsx_calls' in self.fake_ctx.instance.runtime_properties
+            )
+            common.nsx_read(
+                instrumented, 'body', 'nsxEdge',
+                uri_parameters={'edgeId': 'id'}
+            )
+            summary = self.fake_ctx.instance.runtime_properties[
+                'nsx_calls'
+            ]['operation']
+            self.assertEqual(summary['calls'], 1)
+            self.assertEqual(summary['size'], 7)
+
+            # wrong threshold
+            self._regen_ctx()
+            with self.assertRaises(cfy_exc.NonRecoverableError):
+                common.nsx_login({'nsx_auth': dict(
+                    nsx_auth, slow_call='a'
+                )})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+import pytest
+import pynsxv.library.nsx_esg as nsx_esg
+import cloudify_nsx.library.nsx_common as common
+import cloudify_nsx.library.nsx_cassette as nsx_cassette
+import cloudify_nsx.library.nsx_security_tag as nsx_security_tag
+from cloudify import exceptions as cfy_exc
+from tests.fakensx import FakeNsxManager
+import test_nsx_base
+
+
+class NsxCassetteTest(test_nsx_base.NSXBaseTest):
+
+    def setUp(self):
+        super(NsxCassetteTest, self).setUp()
+        self._dir = tempfile.mkdtemp()
+        self._path = os.path.join(self._dir, 'cassette.gz')
+        nsx_cassette.clean_cassettes()
+
+    def tearDown(self):
+        nsx_cassette.clean_cassettes()
+        shutil.rmtree(self._dir)
+        super(NsxCassetteTest, self).tearDown()
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_record_replay(self):
+        """Check record and replay of client calls"""
+        client = mock.Mock()
+        client.read = mock.Mock(side_effect=[
+            {'status': 200, 'body': {'edge': {'id': 'edge-1'}},
+             'location': None, 'objectId': None, 'Etag': None},
+            {'status': 200, 'body': {'edge': {'id': 'edge-2'}}}
+        ])
+        client.delete = mock.Mock(side_effect=SystemExit('bad status'))
+        client.read_all_pages = mock.Mock(return_value=[{'id': 'tag'}])
+
+        recorder = nsx_cassette.RecordingClient(client, self._path)
+        recorder.read('nsxEdge', {'edgeId': 'edge-1'})
+        recorder.read(
+            'nsxEdge', uri_parameters={'edgeId': 'edge-1'},
+            query_parameters_dict={'detailed': True}
+        )
+        with self.assertRaises(SystemExit):
+            recorder.delete('nsxEdge', uri_parameters={'edgeId': 'edge-1'})
+        self.assertEqual(
+            recorder.read_all_pages('securityTag'), [{'id': 'tag'}]
+        )
+        recorder.read_all_pages('nsxEdges', 'read')
+
+        records = nsx_cassette.load(self._path)
+        self.assertEqual(
+            [(record['method'], record['resource']) for record in records],
+            [('read', 'nsxEdge'), ('read', 'nsxEdge'),
+             ('delete', 'nsxEdge'), ('read_all_pages', 'securityTag'),
+             ('read_all_pages', 'nsxEdges')]
+        )
+        self.assertEqual(records[1]['query_parameters'], {'detailed': True})
+        self.assertEqual(records[2]['exit'], 'bad status')
+
+        player = nsx_cassette.ReplayClient(
+            mock.Mock(), nsx_cassette.get_cassette(self._path), 0
+        )
+        # numbers and strings are same in url
+        self.assertEqual(
+            player.read(
+                'nsxEdge', {'edgeId': 'edge-1'},
+                query_parameters_dict={'detailed': 'True'}
+            )['body'],
+            {'edge': {'id': 'edge-2'}}
+        )
+        # last response is repeated, response can be changed by caller
+        for _ in range(2):
+            response = player.read(
+                'nsxEdge', uri_parameters={'edgeId': 'edge-1'}
+            )
+            self.assertEqual(response['body'], {'edge': {'id': 'edge-1'}})
+            response['body']['edge']['id'] = 'changed'
+        with self.assertRaises(SystemExit):
+            player.delete('nsxEdge', uri_parameters={'edgeId': 'edge-1'})
+        self.assertEqual(
+            player.read_all_pages('securityTag'), [{'id': 'tag'}]
+        )
+        self.assertEqual(
+            player.read_all_pages('nsxEdges', 'read'), [{'id': 'tag'}]
+        )
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            player.read('nsxEdge', uri_parameters={'edgeId': 'edge-3'})
+
+        # recorded latency is scaled
+        player = nsx_cassette.ReplayClient(
+            mock.Mock(), nsx_cassette.get_cassette(self._path), 2
+        )
+        with mock.patch(
+            'cloudify_nsx.library.nsx_cassette.time.sleep'
+        ) as sleep:
+            player.read_all_pages('securityTag')
+        sleep.assert_called_with(records[3]['latency'] * 2)
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_record_redact(self):
+        """Check that credentials are not saved to cassette"""
+        client = mock.Mock()
+        client.create = mock.Mock(return_value={
+            'status': 201, 'body': None, 'objectId': 'edge-1'
+        })
+        client.read = mock.Mock(return_value={'status': 200, 'body': {
+            'edge': {'cliSettings': {'userName': 'admin', 'password': None}}
+        }})
+        recorder = nsx_cassette.RecordingClient(client, self._path)
+        body = {'edge': {
+            'name': 'esg',
+            'cliSettings': {'userName': 'admin', 'password': 'secret'},
+            'ospf': {'ospfInterfaces': {'ospfInterface': [{
+                'authentication': {'type': 'md5', 'value': 'key'}
+            }]}}
+        }}
+        recorder.create('nsxEdges', request_body_dict=body)
+        recorder.read('nsxEdge', uri_parameters={'edgeId': 'edge-1'})
+        # request is sent without changes
+        client.create.assert_called_with('nsxEdges', request_body_dict=body)
+
+        records = nsx_cassette.load(self._path)
+        self.assertEqual(records[0]['request'], {'edge': {
+            'name': 'esg',
+            'cliSettings': {
+                'userName': nsx_cassette.REDACTED,
+                'password': nsx_cassette.REDACTED
+            },
+            'ospf': {'ospfInterfaces': {'ospfInterface': [{
+                'authentication': {
+                    'type': 'md5', 'value': nsx_cassette.REDACTED
+                }
+            }]}}
+        }})
+        self.assertEqual(records[1]['response']['body'], {'edge': {
+            'cliSettings': {
+                'userName': nsx_cassette.REDACTED, 'password': None
+            }
+        }})
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_replay_positions(self):
+        """Check that replay continues in other process"""
+        client = mock.Mock()
+        client.read = mock.Mock(side_effect=[
+            {'status': 200, 'body': {'edge': {'id': 'edge-1'}}},
+            {'status': 200, 'body': {'edge': {'id': 'edge-2'}}},
+            {'status': 200, 'body': {'edge': {'id': 'edge-3'}}}
+        ])
+        recorder = nsx_cassette.RecordingClient(client, self._path)
+        for _ in range(3):
+            recorder.read('nsxEdge', uri_parameters={'edgeId': 'edge-1'})
+
+        # each operation process loads cassette again
+        responses = []
+        for _ in range(2):
+            player = nsx_cassette.ReplayClient(mock.Mock(), (
+                nsx_cassette.Cassette(
+                    nsx_cassette.load(self._path),
+                    nsx_cassette.positions_path(self._path)
+                )
+            ), 0)
+            responses.append(player.read(
+                'nsxEdge', uri_parameters={'edgeId': 'edge-1'}
+            )['body']['edge']['id'])
+        self.assertEqual(responses, ['edge-1', 'edge-2'])
+
+        # replay from start after clean
+        player = nsx_cassette.ReplayClient(
+            mock.Mock(), nsx_cassette.get_cassette(self._path), 0
+        )
+        self.assertEqual(player.read(
+            'nsxEdge', uri_parameters={'edgeId': 'edge-1'}
+        )['body']['edge']['id'], 'edge-3')
+        nsx_cassette.clean_cassettes()
+        self.assertFalse(os.path.exists(
+            nsx_cassette.positions_path(self._path)
+        ))
+        player = nsx_cassette.ReplayClient(
+            mock.Mock(), nsx_cassette.get_cassette(self._path), 0
+        )
+        self.assertEqual(player.read(
+            'nsxEdge', uri_parameters={'edgeId': 'edge-1'}
+        )['body']['edge']['id'], 'edge-1')
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_nsx_login_cassette(self):
+        """Check nsx_login with record and replay of fake nsx"""
+        self._patch_raml_index()
+        nsx = FakeNsxManager().start()
+        try:
+            self._regen_ctx()
+            nsx_auth = dict(nsx.nsx_auth, cassette=self._path)
+            client_session = common.nsx_login({'nsx_auth': nsx_auth})
+            self.assertTrue(isinstance(
+                client_session, nsx_cassette.RecordingClient
+            ))
+            esg_id, _ = nsx_esg.esg_create(
+                client_session, 'esg', 'password', 'compact', 'datacenter',
+                'datastore', 'resourcepool', 'portgroup'
+            )
+            tag_id = nsx_security_tag.add_tag(
+                client_session, 'tag', 'description'
+            )
+            edge = client_session.read(
+                'nsxEdge', uri_parameters={'edgeId': esg_id}
+            )
+            calls = len(nsx.calls)
+        finally:
+            nsx.stop()
+        self.assertEqual(len(nsx_cassette.load(self._path)), calls)
+
+        # nsx is stopped, responses are from cassette, raml of fake nsx
+        # is removed with it
+        self._regen_ctx()
+        del nsx_auth['raml']
+        nsx_auth.update({'cassette_mode': 'replay', 'cassette_latency': 0})
+        client_session = common.nsx_login({'nsx_auth': nsx_auth})
+        self.assertEqual(
+            nsx_esg.esg_create(
+                client_session, 'esg', 'password', 'compact', 'datacenter',
+                'datastore', 'resourcepool', 'portgroup'
+            )[0],
+            esg_id
+        )
+        self.assertEqual(
+            nsx_security_tag.add_tag(client_session, 'tag', 'description'),
+            tag_id
+        )
+        # credentials are not saved
+        self.assertEqual(
+            client_session.read(
+                'nsxEdge', uri_parameters={'edgeId': esg_id}
+            )['body'],
+            nsx_cassette.redact(edge['body'])
+        )
+
+        # wrong options
+        self._regen_ctx()
+        for options in [
+            {'cassette_mode': 'unknown'}, {'cassette_latency': 'fast'}
+        ]:
+            with self.assertRaises(cfy_exc.NonRecoverableError):
+                common.nsx_login({'nsx_auth': dict(nsx_auth, **options)})
+
+
+if __name__ == '__main__':
+    unittest.main()
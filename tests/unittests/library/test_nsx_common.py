@@ -11,10 +11,17 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import functools
+import os
+import shutil
+import tempfile
 import unittest
+import urlparse
 import mock
 import pytest
 import cloudify_nsx.library.nsx_common as common
+import cloudify_nsx.library.nsx_security_group as nsx_security_group
+import cloudify_nsx.library.nsx_security_tag as nsx_security_tag
 import cloudify_nsx.nsx_object as nsx_object_type
 from cloudify import exceptions as cfy_exc
 from cloudify.state import current_ctx
@@ -157,6 +164,90 @@ class NsxCommonTest(test_nsx_base.NSXBaseTest):
             {'a': 'a'}
         )
 
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_rules_validator(self):
+        """Check nsx_common.RulesValidator class"""
+        validator = common.RulesValidator({
+            'a': {'caseinsensitive': True, 'values': ['A', 'B']},
+            'b': {'values': [{'x': 1}, [1]]},
+            'c': {'set_none': True, 'sub': {
+                'd': {'default': 1},
+                'e': {'default': 'true', 'type': 'boolean'}
+            }}
+        })
+
+        # reused many times
+        for _ in xrange(2):
+            self.assertEqual(
+                validator.validate(
+                    {'a': 'a', 'b': [1], 'c': {'d': 2}}, False
+                ),
+                {'a': 'a', 'b': [1], 'c': {'d': '2', 'e': True}}
+            )
+
+        # unhashable values
+        self.assertEqual(
+            validator.validate({'a': 'B', 'b': {'x': 1}}, False),
+            {'a': 'b', 'b': {'x': 1}, 'c': None}
+        )
+        with self.assertRaises(cfy_exc.NonRecoverableError) as error:
+            validator.validate({'a': 'c', 'b': [1]}, False)
+        self.assertEqual(
+            str(error.exception), "Wrong value a=c not in ['a', 'b']"
+        )
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            validator.validate({'a': 'a', 'b': [2]}, False)
+
+        # can be used instead of rules dict
+        self.assertEqual(
+            common._validate({'a': 'A', 'b': [1]}, validator, False),
+            {'a': 'a', 'b': [1], 'c': None}
+        )
+        self.assertEqual(
+            common.validate_list(
+                'list', [{'a': 'A', 'b': [1]}], validator, False
+            ),
+            [{'a': 'a', 'b': [1], 'c': None}]
+        )
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_validate_items(self):
+        """Check nsx_common validate_items/item_arguments funcs"""
+        rules = {'a': {'required': True}, 'b': {'set_none': True}}
+
+        # node with one item
+        edge_rules = common.edge_item_rules(rules)
+        self.assertEqual(edge_rules['esg_id'], {'required': True})
+        self.assertFalse('esg_id' in rules)
+        item = common._validate(
+            {'a': 'x', 'esg_id': 'esg_id'}, edge_rules, False
+        )
+        self.assertEqual(
+            common.item_arguments(item, rules), {'a': 'x', 'b': None}
+        )
+
+        # list of items
+        self.assertEqual(
+            common.validate_items(
+                'items', [{'a': 'x'}, {'a': 'y', 'b': 'z'}], rules, False
+            ),
+            [{'a': 'x', 'b': None}, {'a': 'y', 'b': 'z'}]
+        )
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            common.validate_items('items', [{'a': 'x'}, {}], rules, False)
+
+        def check_item(item_dict):
+            if item_dict['b'] is None:
+                raise cfy_exc.NonRecoverableError("b is required")
+
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            common.validate_items(
+                'items', [{'a': 'y', 'b': 'z'}, {'a': 'x'}], rules, False,
+                check_item
+            )
+
     @pytest.mark.internal
     @pytest.mark.unit
     def test_validate_set_None(self):
@@ -453,7 +544,278 @@ class NsxCommonTest(test_nsx_base.NSXBaseTest):
                 common.attempt_with_rerun(
                     func_error, need_error=cfy_exc.RecoverableError
                 )
-            fake_sleep.assert_called_with(30)
+            # default policy: 11 attempts, no more than 36 seconds delay
+            self.assertEqual(fake_sleep.call_count, 10)
+            for call in fake_sleep.call_args_list:
+                self.assertTrue(0 < call[0][0] <= 36)
+
+            # exponential without jitter
+            fake_sleep.reset_mock()
+            with self.assertRaises(cfy_exc.RecoverableError):
+                common.attempt_with_rerun(
+                    func_error, need_error=cfy_exc.RecoverableError,
+                    retry_policy=common.RetryPolicy(
+                        attempts=4, delay=1, backoff=2, max_delay=3,
+                        jitter=0
+                    )
+                )
+            self.assertEqual(
+                fake_sleep.call_args_list,
+                [mock.call(1), mock.call(2), mock.call(3)]
+            )
+
+            # deadline
+            fake_sleep.reset_mock()
+            with self.assertRaises(cfy_exc.RecoverableError):
+                common.attempt_with_rerun(
+                    func_error, need_error=cfy_exc.RecoverableError,
+                    retry_policy=common.RetryPolicy(
+                        attempts=10, delay=1, backoff=2, max_delay=30,
+                        jitter=0, deadline=3
+                    )
+                )
+            self.assertEqual(
+                fake_sleep.call_args_list,
+                [mock.call(1), mock.call(2)]
+            )
+
+            # partial has no name, logged by name of wrapped func
+            fake_sleep.reset_mock()
+            with self.assertRaises(cfy_exc.RecoverableError) as error:
+                common.attempt_with_rerun(
+                    functools.partial(
+                        func_error, need_error=cfy_exc.RecoverableError
+                    ),
+                    retry_policy=common.RetryPolicy(
+                        attempts=2, delay=1, jitter=0
+                    )
+                )
+            self.assertEqual(
+                str(error.exception), "Retry func_error little later"
+            )
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_versioned_update(self):
+        """Check nsx_common.versioned_update func"""
+        self._regen_ctx()
+
+        def add_item(doc):
+            doc['items'] = doc['items'] + ['our']
+            return 'our_id'
+
+        # other operation has added item between our read and write
+        read_func = mock.MagicMock(side_effect=[
+            {'items': []}, {'items': ['other']}, {'items': ['other']}
+        ])
+        write_func = mock.MagicMock()
+        self.assertEqual(
+            common.versioned_update(read_func, write_func, add_item),
+            'our_id'
+        )
+        self.assertEqual(read_func.call_count, 3)
+        write_func.assert_called_once_with({'items': ['other', 'our']})
+
+        # nothing changed, no write
+        read_func = mock.MagicMock(return_value={'items': ['our']})
+        write_func = mock.MagicMock()
+        self.assertEqual(
+            common.versioned_update(
+                read_func, write_func, lambda doc: 'same'
+            ), 'same'
+        )
+        write_func.assert_not_called()
+
+        # always changed
+        versions = iter(range(100))
+        read_func = mock.MagicMock(
+            side_effect=lambda: {'items': [str(next(versions))]}
+        )
+        write_func = mock.MagicMock()
+        with self.assertRaises(cfy_exc.RecoverableError):
+            common.versioned_update(
+                read_func, write_func, add_item, attempts=3
+            )
+        write_func.assert_not_called()
+        self.assertEqual(read_func.call_count, 4)
+
+        # edge document is locked by us, no read before write
+        read_func = mock.MagicMock(return_value={'items': []})
+        write_func = mock.MagicMock()
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.lock_backend',
+            mock.MagicMock()
+        ):
+            with common.edge_lock('edge-1', 'dhcp'):
+                self.assertEqual(
+                    common.versioned_update(
+                        read_func, write_func, add_item,
+                        edge_document=('edge-1', 'dhcpPool')
+                    ), 'our_id'
+                )
+        read_func.assert_called_once_with()
+        write_func.assert_called_once_with({'items': ['our']})
+
+        # lock of other document
+        read_func = mock.MagicMock(return_value={'items': []})
+        write_func = mock.MagicMock()
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.lock_backend',
+            mock.MagicMock()
+        ):
+            with common.edge_lock('edge-1', 'nat'):
+                common.versioned_update(
+                    read_func, write_func, add_item,
+                    edge_document=('edge-1', 'dhcp')
+                )
+        self.assertEqual(read_func.call_count, 2)
+        write_func.assert_called_once_with({'items': ['our']})
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_file_lock(self):
+        """Check nsx_common.FileLock class"""
+        lock_dir = tempfile.mkdtemp()
+        try:
+            with mock.patch(
+                'cloudify_nsx.library.nsx_common._lock_dir',
+                mock.MagicMock(return_value=lock_dir)
+            ):
+                with common.FileLock('edge-1_routing BGP'):
+                    self.assertTrue(os.path.isfile(
+                        os.path.join(lock_dir, 'edge-1_routing_BGP.lock')
+                    ))
+                    # locked
+                    with self.assertRaises(cfy_exc.RecoverableError):
+                        with common.FileLock('edge-1_routing BGP', 0.2):
+                            pass
+                    # other feature
+                    with common.FileLock('edge-1_routingOSPF', 0.2):
+                        pass
+                # unlocked
+                with common.FileLock('edge-1_routing BGP', 0.2):
+                    pass
+        finally:
+            shutil.rmtree(lock_dir)
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_edge_locked(self):
+        """Check nsx_common.edge_locked decorator"""
+        fake_backend = mock.MagicMock()
+
+        @common.edge_locked('routingBGP')
+        def update(client_session, esg_id, value=None):
+            return value
+
+        @common.edge_locked('routingBGP', 'resource_id', 1)
+        def delete(client_session, resource_id):
+            return resource_id
+
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.lock_backend', fake_backend
+        ):
+            self.assertEqual(update(None, 'edge-1', value=1), 1)
+            fake_backend.assert_called_with('edge-1_routing')
+
+            self.assertEqual(
+                delete(client_session=None, resource_id='net|edge-2|ip'),
+                'net|edge-2|ip'
+            )
+            fake_backend.assert_called_with('edge-2_routing')
+
+            # same document, lock is taken once
+            fake_backend.reset_mock()
+            with common.edge_lock('edge-1', 'routingConfigStatic'):
+                self.assertTrue(common.edge_lock_held('edge-1', 'routing'))
+                self.assertFalse(common.edge_lock_held('edge-2', 'routing'))
+                update(None, 'edge-1')
+            self.assertFalse(common.edge_lock_held('edge-1', 'routing'))
+            fake_backend.assert_called_once_with('edge-1_routing')
+
+            # wrong id, run without lock
+            fake_backend.reset_mock()
+            self.assertEqual(delete(None, 'net'), 'net')
+            fake_backend.assert_not_called()
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_wait_for(self):
+        """Check nsx_common.wait_for func"""
+        self._regen_ctx()
+        fake_sleep = mock.MagicMock()
+        policy = common.RetryPolicy(
+            attempts=4, delay=1, backoff=2, max_delay=30, jitter=0
+        )
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.time.sleep',
+            fake_sleep
+        ):
+            # ready on third poll
+            func = mock.MagicMock(side_effect=[None, None, 'ready'])
+            func.__name__ = 'func'
+            self.assertEqual(
+                common.wait_for(func, retry_policy=policy, a='b'), 'ready'
+            )
+            func.assert_called_with(a='b')
+            self.assertEqual(
+                fake_sleep.call_args_list, [mock.call(1), mock.call(2)]
+            )
+
+            # never ready
+            fake_sleep.reset_mock()
+            func = mock.MagicMock(return_value=None)
+            func.__name__ = 'func'
+            self.assertEqual(
+                common.wait_for(func, retry_policy=policy), None
+            )
+            self.assertEqual(func.call_count, 4)
+            self.assertEqual(fake_sleep.call_count, 3)
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_get_retry_policy(self):
+        """Check nsx_common.get_retry_policy func"""
+        self._regen_ctx()
+        policy = common.get_retry_policy({})
+        self.assertEqual(policy.attempts, 11)
+        self.assertEqual(policy.max_delay, 30)
+
+        self._regen_ctx()
+        policy = common.get_retry_policy({
+            'nsx_auth': {
+                'retry': {
+                    'attempts': 3,
+                    'delay': 5,
+                    'deadline': 60
+                }
+            }
+        })
+        self.assertEqual(policy.attempts, 3)
+        self.assertEqual(policy.delay, 5)
+        self.assertEqual(policy.deadline, 60)
+
+        # defaults for other policy
+        self._regen_ctx()
+        policy = common.get_retry_policy({
+            'nsx_auth': {
+                'edge_poll': {
+                    'attempts': 3
+                }
+            }
+        }, 'edge_poll', attempts=10, delay=1)
+        self.assertEqual(policy.attempts, 3)
+        self.assertEqual(policy.delay, 1)
+
+        self._regen_ctx()
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            common.get_retry_policy({
+                'nsx_auth': {
+                    'retry': {
+                        'unknown': 3
+                    }
+                }
+            })
 
     @pytest.mark.internal
     @pytest.mark.unit
@@ -920,6 +1282,132 @@ class NsxCommonTest(test_nsx_base.NSXBaseTest):
             (None, None)
         )
 
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_nsx_search_pages(self):
+        """Check nsx_common.nsx_search func: read by pages"""
+        self._regen_ctx()
+        client_session = mock.Mock()
+
+        def _read(searched_resource, query_parameters_dict, **kwargs):
+            start_index = int(query_parameters_dict['startIndex'])
+            page_size = int(query_parameters_dict['pageSize'])
+            return {
+                'body': {'list': {
+                    'pagingInfo': {
+                        'startIndex': str(start_index),
+                        'pageSize': str(page_size),
+                        'totalCount': '5'
+                    },
+                    'a': [{
+                        'name': 'name%d' % i,
+                        'objectId': 'id%d' % i
+                    } for i in range(start_index, min(start_index + 2, 5))]
+                }}, 'status': 200
+            }
+
+        client_session.read = mock.MagicMock(side_effect=_read)
+
+        # second page has object, third page is not requested
+        self.assertEqual(
+            common.nsx_search(client_session, 'body/list/a', 'name2', 'x',
+                              page_size=2),
+            ('id2', {'name': 'name2', 'objectId': 'id2'})
+        )
+        self.assertEqual(client_session.read.call_count, 2)
+        client_session.read.assert_called_with(
+            'x', query_parameters_dict={'startIndex': '2', 'pageSize': '2'}
+        )
+
+        # each search reads pages again
+        self.assertEqual(
+            common.nsx_search(client_session, 'body/list/a', 'name3', 'x',
+                              page_size=2)[0],
+            'id3'
+        )
+        self.assertEqual(client_session.read.call_count, 4)
+
+        # not found, all pages are requested
+        self.assertEqual(
+            common.nsx_search(client_session, 'body/list/a', 'other', 'x',
+                              page_size=2),
+            (None, None)
+        )
+        self.assertEqual(client_session.read.call_count, 7)
+        client_session.read.assert_called_with(
+            'x', query_parameters_dict={'startIndex': '4', 'pageSize': '2'}
+        )
+
+        # nsx without paging returns all objects in one page
+        client_session.read = mock.Mock(return_value={
+            'body': {'list': {'a': {'name': 'b', 'objectId': 'c'}}},
+            'status': 200
+        })
+        self.assertEqual(
+            list(common.nsx_read_pages(client_session, 'body/list/a', 'y',
+                                       page_size=2)),
+            [([{'name': 'b', 'objectId': 'c'}], True)]
+        )
+        self.assertEqual(client_session.read.call_count, 1)
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_nsx_search_pages_raml(self):
+        """Check search of tags and groups by pages with embedded raml"""
+        self._regen_ctx()
+        client_session = self._raml_client()
+        urls = []
+
+        def _do_request(method, url, **kwargs):
+            url = urlparse.urlparse(url)
+            query = dict(urlparse.parse_qsl(url.query))
+            urls.append((url.path, query))
+            start_index = int(query['startIndex'])
+            objects = [{
+                'name': 'name%d' % i,
+                'objectId': 'id%d' % i,
+                # empty xml element
+                'vmCount': None
+            } for i in range(start_index, min(start_index + 2, 5))]
+            paging_info = {
+                'startIndex': str(start_index),
+                'pageSize': query['pageSize'],
+                'totalCount': '5'
+            }
+            if 'securitytags' in url.path:
+                body = {'securityTags': {
+                    'pagingInfo': paging_info, 'securityTag': objects
+                }}
+            else:
+                body = {'list': {
+                    'pagingInfo': paging_info, 'securitygroup': objects
+                }}
+            return {'status': 200, 'body': body}
+
+        client_session._httpsession.do_request = mock.Mock(
+            side_effect=_do_request
+        )
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.SEARCH_PAGE_SIZE', 2
+        ):
+            self.assertEqual(
+                nsx_security_tag.get_tag(client_session, 'name3')[0], 'id3'
+            )
+            self.assertEqual(
+                nsx_security_group.get_group(
+                    client_session, 'globalroot-0', 'name1'
+                )[0],
+                'id1'
+            )
+        self.assertEqual(urls, [
+            ('/api/2.0/services/securitytags/tag',
+             {'startIndex': '0', 'pageSize': '2'}),
+            ('/api/2.0/services/securitytags/tag',
+             {'startIndex': '2', 'pageSize': '2'}),
+            ('/api/2.0/services/securitygroup/scope/globalroot-0',
+             {'startIndex': '0', 'pageSize': '2'})
+        ])
+
     @pytest.mark.internal
     @pytest.mark.unit
     def test_nsx_struct_get_list_create(self):
@@ -1008,6 +1496,36 @@ class NsxCommonTest(test_nsx_base.NSXBaseTest):
             }
         )
 
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_nsx_struct_get_list_empty(self):
+        """Check nsx_common.nsx_struct_get_list func empty elements"""
+        # empty xml elements are None in response
+        nsx_object = {
+            'a': None
+        }
+        self.assertEqual(
+            common.nsx_struct_get_list(nsx_object, 'a/b'),
+            []
+        )
+        self.assertEqual(
+            nsx_object,
+            {
+                'a': {
+                    'b': []
+                }
+            }
+        )
+        nsx_object = {
+            'a': {
+                'b': None
+            }
+        }
+        self.assertEqual(
+            common.nsx_struct_get_list(nsx_object, 'a/b'),
+            []
+        )
+
     def test_delete_nsx_object_type(self):
         """Check delete properties after delete nsx object type"""
         self._regen_ctx()
@@ -1070,7 +1588,12 @@ class NsxCommonTest(test_nsx_base.NSXBaseTest):
             {'nsx_object': {'name': 'name', 'type': 'group'}},
             resource_id='id',
             read_args=['secGroupScope'],
-            read_kwargs={'uri_parameters': {'scopeId': 'globalroot-0'}},
+            read_kwargs={
+                'uri_parameters': {'scopeId': 'globalroot-0'},
+                'query_parameters_dict': {
+                    'startIndex': '0', 'pageSize': '256'
+                }
+            },
             read_response={
                 'status': 204,
                 'body': test_nsx_base.SEC_GROUP_LIST
@@ -1082,7 +1605,12 @@ class NsxCommonTest(test_nsx_base.NSXBaseTest):
         self._test_nsx_object_type_common(
             {'nsx_object': {'name': 'other', 'type': 'group'}},
             read_args=['secGroupScope'],
-            read_kwargs={'uri_parameters': {'scopeId': 'globalroot-0'}},
+            read_kwargs={
+                'uri_parameters': {'scopeId': 'globalroot-0'},
+                'query_parameters_dict': {
+                    'startIndex': '0', 'pageSize': '256'
+                }
+            },
             read_response={
                 'status': 204,
                 'body': test_nsx_base.SEC_GROUP_LIST
@@ -1119,7 +1647,10 @@ class NsxCommonTest(test_nsx_base.NSXBaseTest):
         self._test_nsx_object_type_common(
             {'nsx_object': {'name': 'name', 'type': 'tag'}},
             resource_id='id',
-            read_args=['securityTag'], read_kwargs={},
+            read_args=['securityTag'],
+            read_kwargs={'query_parameters_dict': {
+                'startIndex': '0', 'pageSize': '256'
+            }},
             read_response={
                 'status': 204,
                 'body': test_nsx_base.SEC_TAG_LIST
@@ -1130,7 +1661,10 @@ class NsxCommonTest(test_nsx_base.NSXBaseTest):
         """Check nsx object create type: tag not found"""
         self._test_nsx_object_type_common(
             {'nsx_object': {'name': 'other', 'type': 'tag'}},
-            read_args=['securityTag'], read_kwargs={},
+            read_args=['securityTag'],
+            read_kwargs={'query_parameters_dict': {
+                'startIndex': '0', 'pageSize': '256'
+            }},
             read_response={
                 'status': 204,
                 'body': test_nsx_base.SEC_TAG_LIST
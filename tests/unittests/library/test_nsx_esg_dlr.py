@@ -0,0 +1,594 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import copy
+import unittest
+import mock
+import pytest
+import test_nsx_base
+import cloudify_nsx.library.nsx_esg_dlr as nsx_dlr
+import cloudify_nsx.library.nsx_common as common
+
+
+EDGE_DEPLOYING = {
+    'status': 200,
+    'body': {
+        'edge': {
+            'name': 'edge_name',
+            'appliances': {
+                'appliance': {
+                    'highAvailabilityIndex': '0'
+                }
+            }
+        }
+    }
+}
+
+EDGE_DEPLOYED = {
+    'status': 200,
+    'body': {
+        'edge': {
+            'name': 'edge_name',
+            'appliances': {
+                'appliance': [{
+                    'highAvailabilityIndex': '0',
+                    'vmId': 'vm-1'
+                }]
+            }
+        }
+    }
+}
+
+
+class NsxEsgDlrTest(test_nsx_base.NSXBaseTest):
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_wait_edge_deployed(self):
+        """Check nsx_esg_dlr.wait_edge_deployed func"""
+        self._regen_ctx()
+        client_session = self._create_fake_cs_result()
+        client_session.read = mock.Mock(
+            side_effect=[EDGE_DEPLOYING, EDGE_DEPLOYING, EDGE_DEPLOYED]
+        )
+        fake_sleep = mock.MagicMock()
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.time.sleep',
+            fake_sleep
+        ):
+            edge = nsx_dlr.wait_edge_deployed(client_session, 'edge-1', {})
+        self.assertEqual(nsx_dlr.get_edge_vm_id(edge), 'vm-1')
+        client_session.read.assert_called_with(
+            'nsxEdge', uri_parameters={'edgeId': 'edge-1'}
+        )
+        self.assertEqual(fake_sleep.call_count, 2)
+
+        # out of time
+        self._regen_ctx()
+        client_session.read = mock.Mock(return_value=EDGE_DEPLOYING)
+        fake_sleep = mock.MagicMock()
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.time.sleep',
+            fake_sleep
+        ):
+            self.assertEqual(
+                nsx_dlr.wait_edge_deployed(client_session, 'edge-1', {
+                    'nsx_auth': {'edge_poll': {'attempts': 2}}
+                }),
+                None
+            )
+        self.assertEqual(client_session.read.call_count, 2)
+        self.assertEqual(fake_sleep.call_count, 1)
+
+    def _edge_settings(self):
+        return {
+            'firewall': {'action': 'deny', 'logging': True},
+            'dhcp': {
+                'enabled': True,
+                'syslog_enabled': False,
+                'syslog_level': 'INFO'
+            },
+            'routing': {
+                'enabled': True,
+                'routingGlobalConfig': {'routerId': '192.168.1.1'},
+                'staticRouting': None
+            },
+            'ospf': {
+                'enabled': False,
+                'defaultOriginate': False,
+                'gracefulRestart': False,
+                'redistribution': False
+            },
+            'bgp': {
+                'enabled': True,
+                'defaultOriginate': False,
+                'gracefulRestart': True,
+                'redistribution': True,
+                'localAS': '65000'
+            },
+            'nat': {'enabled': True}
+        }
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_compose_edge_features(self):
+        """Check nsx_esg_dlr.compose_edge_features func"""
+        edge = {
+            'name': 'edge_name',
+            'features': {
+                'firewall': {
+                    'defaultPolicy': {
+                        'action': 'accept',
+                        'loggingEnabled': 'false'
+                    },
+                    'rules': {'rule': [{'id': '1'}]}
+                },
+                'dhcp': None,
+                'routing': {
+                    'enabled': 'false',
+                    'ospf': {'enabled': 'true', 'ospfAreas': 'areas'}
+                }
+            }
+        }
+        settings = self._edge_settings()
+        self.assertEqual(
+            nsx_dlr.compose_edge_features(
+                edge, settings['firewall'], settings['dhcp'],
+                settings['routing'], settings['ospf'], settings['bgp'],
+                settings['nat']
+            ), {
+                'name': 'edge_name',
+                'features': {
+                    'firewall': {
+                        'defaultPolicy': {
+                            'action': 'deny',
+                            'loggingEnabled': 'true'
+                        },
+                        'rules': {'rule': [{'id': '1'}]}
+                    },
+                    'dhcp': {
+                        'enabled': 'true',
+                        'logging': {
+                            'enable': 'false',
+                            'logLevel': 'INFO'
+                        }
+                    },
+                    'routing': {
+                        'enabled': 'true',
+                        'routingGlobalConfig': {'routerId': '192.168.1.1'},
+                        'ospf': {
+                            'enabled': 'false',
+                            'ospfAreas': 'areas',
+                            'defaultOriginate': 'false',
+                            'gracefulRestart': 'false',
+                            'redistribution': {'enabled': 'false'}
+                        },
+                        'bgp': {
+                            'enabled': 'true',
+                            'defaultOriginate': 'false',
+                            'gracefulRestart': 'true',
+                            'redistribution': {'enabled': 'true'},
+                            'localAS': '65000'
+                        }
+                    },
+                    'nat': {'enabled': 'true'}
+                }
+            }
+        )
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_compose_edge_features_routing(self):
+        """Check nsx_esg_dlr.compose_edge_features keeps child routing"""
+        ip_prefixes = {'ipPrefix': [{
+            'name': 'prefix', 'ipAddress': '10.0.0.0/24'
+        }]}
+        static_routes = {'route': [{
+            'network': '10.1.0.0/24', 'nextHop': '192.168.1.2'
+        }]}
+        edge = {
+            'features': {
+                'routing': {
+                    'enabled': 'true',
+                    'routingGlobalConfig': {
+                        'routerId': '192.168.1.10',
+                        'ecmp': 'false',
+                        'ipPrefixes': ip_prefixes
+                    },
+                    'staticRouting': {
+                        'staticRoutes': static_routes,
+                        'defaultRoute': {
+                            'gatewayAddress': '192.168.1.1', 'mtu': '1500'
+                        }
+                    }
+                }
+            }
+        }
+        settings = self._edge_settings()
+        settings['routing']['staticRouting'] = {
+            'defaultRoute': {'gatewayAddress': '192.168.1.254'}
+        }
+        nsx_dlr.compose_edge_features(
+            edge, None, None, settings['routing'], None, None
+        )
+        self.assertEqual(edge['features']['routing'], {
+            'enabled': 'true',
+            'routingGlobalConfig': {
+                'routerId': '192.168.1.1',
+                'ecmp': 'false',
+                'ipPrefixes': ip_prefixes
+            },
+            'staticRouting': {
+                'staticRoutes': static_routes,
+                'defaultRoute': {
+                    'gatewayAddress': '192.168.1.254', 'mtu': '1500'
+                }
+            }
+        })
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_update_common_edges(self):
+        """Check nsx_esg_dlr.update_common_edges func"""
+        kwargs = {
+            'firewall': {'action': 'deny'},
+            'routing': {
+                'staticRouting': {'defaultRoute': {'gatewayAddress': ''}},
+                'routingGlobalConfig': {'routerId': '', 'logging': {}}
+            },
+            'bgp': {'enabled': True, 'localAS': 65000}
+        }
+
+        # single update of edge
+        self._regen_ctx()
+        client_session = self._create_fake_cs_result()
+        edge_read = copy.deepcopy(EDGE_DEPLOYED)
+        edge_read['body']['edge']['features'] = {'nat': {'enabled': 'false'}}
+        self._update_fake_cs_result(
+            client_session,
+            read_response=edge_read,
+            update_response=test_nsx_base.SUCCESS_RESPONSE
+        )
+        locked = []
+
+        def fake_update(*args, **kwargs):
+            # documents changed by other nodes are locked
+            locked.extend(
+                document for document in common.EDGE_WHOLE_DOCUMENTS
+                if common.edge_lock_held('edge-1', document)
+            )
+            return copy.deepcopy(test_nsx_base.SUCCESS_RESPONSE)
+
+        client_session.update = mock.Mock(side_effect=fake_update)
+        lock_backend = mock.MagicMock()
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.lock_backend', lock_backend
+        ):
+            nsx_dlr.update_common_edges(
+                client_session, 'edge-1', copy.deepcopy(kwargs), True
+            )
+        self.assertEqual(locked, list(common.EDGE_WHOLE_DOCUMENTS))
+        self.assertEqual(
+            sorted(call[0][0] for call in lock_backend.call_args_list),
+            ['edge-1_dhcp', 'edge-1_firewall', 'edge-1_interfaces',
+             'edge-1_nat', 'edge-1_routing']
+        )
+        client_session.read.assert_called_once_with(
+            'nsxEdge', uri_parameters={'edgeId': 'edge-1'}
+        )
+        client_session.update.assert_called_once()
+        update_args = client_session.update.call_args
+        self.assertEqual(update_args[0], ('nsxEdge',))
+        self.assertEqual(
+            update_args[1]['request_body_dict']['edge']['features']['nat'],
+            {'enabled': 'true'}
+        )
+        self.assertEqual(
+            self.fake_ctx.instance.runtime_properties['vsphere_server_id'],
+            'vm-1'
+        )
+        self.assertEqual(
+            self.fake_ctx.instance.runtime_properties['name'], 'edge_name'
+        )
+
+        # nothing to change on second run
+        client_session.read = mock.Mock(return_value={
+            'status': 200,
+            'body': update_args[1]['request_body_dict']
+        })
+        client_session.update = mock.Mock()
+        nsx_dlr.update_common_edges(
+            client_session, 'edge-1', copy.deepcopy(kwargs), True
+        )
+        client_session.update.assert_not_called()
+
+        # edge without features
+        self._regen_ctx()
+        client_session = self._create_fake_cs_result()
+        self._update_fake_cs_result(
+            client_session,
+            read_response=EDGE_DEPLOYED
+        )
+        fake_separately = mock.MagicMock()
+        with mock.patch(
+            'cloudify_nsx.library.nsx_esg_dlr.'
+            'update_edge_features_separately',
+            fake_separately
+        ):
+            nsx_dlr.update_common_edges(
+                client_session, 'edge-1', copy.deepcopy(kwargs), True
+            )
+        fake_separately.assert_called_once()
+        separately_args = fake_separately.call_args[0]
+        self.assertEqual(separately_args[:2], (client_session, 'edge-1'))
+        # firewall
+        self.assertEqual(
+            separately_args[2], {'action': 'deny', 'logging': False}
+        )
+        # bgp
+        self.assertEqual(separately_args[6]['localAS'], '65000')
+        # nat
+        self.assertEqual(separately_args[7], {'enabled': True})
+        client_session.update.assert_not_called()
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_update_common_edges_fingerprints(self):
+        """Check nsx_esg_dlr.update_common_edges with applied settings"""
+        kwargs = {
+            'firewall': {'action': 'deny'},
+            'routing': {
+                'staticRouting': {'defaultRoute': {'gatewayAddress': ''}},
+                'routingGlobalConfig': {'routerId': '', 'logging': {}}
+            },
+            'bgp': {'enabled': True, 'localAS': 65000}
+        }
+        edge_read = copy.deepcopy(EDGE_DEPLOYED)
+        edge_read['body']['edge']['features'] = {'nat': {'enabled': 'false'}}
+        edge_read['body']['edge']['version'] = 1
+
+        def fake_read(*args, **kwargs):
+            return copy.deepcopy(edge_read)
+
+        def fake_update(*args, **kwargs):
+            edge_read['body'] = copy.deepcopy(kwargs['request_body_dict'])
+            edge_read['body']['edge']['version'] += 1
+            return test_nsx_base.SUCCESS_RESPONSE
+
+        self._regen_ctx()
+        runtime_properties = self.fake_ctx.instance.runtime_properties
+        client_session = self._create_fake_cs_result()
+        client_session.read = mock.Mock(side_effect=fake_read)
+        client_session.update = mock.Mock(side_effect=fake_update)
+        nsx_dlr.update_common_edges(
+            client_session, 'edge-1', copy.deepcopy(kwargs), True
+        )
+        client_session.update.assert_called_once()
+        fingerprints = runtime_properties['edge_fingerprints']
+        self.assertEqual(
+            sorted(fingerprints['sections'].keys()),
+            ['bgp', 'dhcp', 'firewall', 'nat', 'ospf', 'routing']
+        )
+        # without version check version is not reread after update
+        self.assertEqual(fingerprints['version'], '1')
+
+        # same settings, edge is not read
+        client_session.read.reset_mock()
+        client_session.update.reset_mock()
+        nsx_dlr.update_common_edges(
+            client_session, 'edge-1', copy.deepcopy(kwargs), True
+        )
+        client_session.read.assert_not_called()
+        client_session.update.assert_not_called()
+
+        # only changed settings are applied
+        edge_read['body']['edge']['features']['nat']['enabled'] = 'false'
+        edge_read['body']['edge']['features']['routing']['bgp'][
+            'localAS'
+        ] = '65000'
+        # runtime properties overwrite inputs
+        runtime_properties['bgp']['localAS'] = 65001
+        nsx_dlr.update_common_edges(
+            client_session, 'edge-1', copy.deepcopy(kwargs), True
+        )
+        features = client_session.update.call_args[1][
+            'request_body_dict'
+        ]['edge']['features']
+        self.assertEqual(features['routing']['bgp']['localAS'], '65001')
+        # nat is not changed since last apply
+        self.assertEqual(features['nat'], {'enabled': 'false'})
+        self.assertNotEqual(
+            runtime_properties['edge_fingerprints']['sections']['bgp'],
+            fingerprints['sections']['bgp']
+        )
+
+        # with version check edge is read and compared with last apply
+        kwargs['nsx_auth'] = {'edge_version_check': True}
+        runtime_properties.pop('edge_fingerprints')
+        client_session.read.reset_mock()
+        nsx_dlr.update_common_edges(
+            client_session, 'edge-1', copy.deepcopy(kwargs), True
+        )
+        # reread after update
+        self.assertEqual(client_session.read.call_count, 2)
+        version = edge_read['body']['edge']['version']
+        self.assertEqual(
+            runtime_properties['edge_fingerprints']['version'], str(version)
+        )
+
+        client_session.read.reset_mock()
+        client_session.update.reset_mock()
+        nsx_dlr.update_common_edges(
+            client_session, 'edge-1', copy.deepcopy(kwargs), True
+        )
+        client_session.read.assert_called_once_with(
+            'nsxEdge', uri_parameters={'edgeId': 'edge-1'}
+        )
+        client_session.update.assert_not_called()
+
+        # edge is changed by somebody else
+        edge_read['body']['edge']['features']['nat']['enabled'] = 'false'
+        edge_read['body']['edge']['version'] += 1
+        nsx_dlr.update_common_edges(
+            client_session, 'edge-1', copy.deepcopy(kwargs), True
+        )
+        self.assertEqual(
+            client_session.update.call_args[1]['request_body_dict'][
+                'edge'
+            ]['features']['nat'],
+            {'enabled': 'true'}
+        )
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_diff_fields(self):
+        """Check nsx_esg_dlr.diff_fields func"""
+        current = {
+            'bgp': {
+                'enabled': 'true',
+                'localAS': '65000',
+                'redistribution': {'enabled': 'false'},
+                'bgpNeighbours': {'bgpNeighbour': [{'ipAddress': '1'}]}
+            }
+        }
+        # same values in other types
+        self.assertEqual(nsx_dlr.diff_fields(current, {
+            'bgp': {
+                'enabled': True,
+                'localAS': 65000,
+                'redistribution': {'enabled': False},
+                'gracefulRestart': ''
+            }
+        }), [])
+        # changed fields
+        self.assertEqual(nsx_dlr.diff_fields(current, {
+            'bgp': {
+                'enabled': 'false',
+                'localAS': '65000',
+                'redistribution': {'enabled': 'true'},
+                'bgpNeighbours': {'bgpNeighbour': [{'ipAddress': '2'}]}
+            }
+        }), [
+            'bgp/bgpNeighbours/bgpNeighbour', 'bgp/enabled',
+            'bgp/redistribution/enabled'
+        ])
+        # single value in list
+        self.assertEqual(nsx_dlr.diff_fields(
+            {'a': {'b': 'c'}}, {'a': [{'b': 'c'}]}
+        ), [])
+        # empty current
+        self.assertEqual(nsx_dlr.diff_fields(
+            None, {'ospf': {'enabled': 'false'}}
+        ), ['ospf/enabled'])
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_update_bgp_without_changes(self):
+        """Check nsx_esg_dlr.update_bgp func without changes"""
+        self._regen_ctx()
+        client_session = self._create_fake_cs_result()
+        current_bgp = {
+            'bgp': {
+                'enabled': 'true',
+                'defaultOriginate': 'false',
+                'gracefulRestart': 'false',
+                'redistribution': {'enabled': 'false'},
+                'localAS': '65000'
+            }
+        }
+        self._update_fake_cs_result(
+            client_session,
+            read_response={'status': 200, 'body': current_bgp}
+        )
+        nsx_dlr.update_bgp(
+            client_session, 'edge-1', True, False, False, False, '65000'
+        )
+        client_session.update.assert_not_called()
+
+        # changed local AS
+        self._update_fake_cs_result(
+            client_session,
+            read_response={'status': 200, 'body': current_bgp},
+            update_response=test_nsx_base.SUCCESS_RESPONSE
+        )
+        nsx_dlr.update_bgp(
+            client_session, 'edge-1', True, False, False, False, '65001'
+        )
+        expected_bgp = copy.deepcopy(current_bgp)
+        expected_bgp['bgp']['localAS'] = '65001'
+        client_session.update.assert_called_with(
+            'routingBGP', uri_parameters={'edgeId': 'edge-1'},
+            request_body_dict=expected_bgp
+        )
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_add_routing_rule_without_redistribution(self):
+        """Check nsx_esg_dlr._add_routing_rule without rules in routing"""
+        routing = {'routing': {'bgp': {'enabled': 'true'}}}
+        self.assertEqual(
+            nsx_dlr._add_routing_rule(
+                routing, False, 'edge-1', 'bgp', 'prefix', {'static': True},
+                'deny'
+            ),
+            'edge-1|bgp|prefix'
+        )
+        self.assertEqual(routing, {'routing': {'bgp': {
+            'enabled': 'true',
+            'redistribution': {'rules': {'rule': [{
+                'prefixName': 'prefix',
+                'from': {'static': True},
+                'action': 'deny'
+            }]}}
+        }}})
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_del_routing_rule_without_redistribution(self):
+        """Check nsx_esg_dlr.del_routing_rule without rules in routing"""
+        self._regen_ctx()
+        client_session = self._create_fake_cs_result()
+        self._update_fake_cs_result(
+            client_session,
+            read_response={'status': 200, 'body': {
+                'routing': {'ospf': {'enabled': 'true'}}
+            }}
+        )
+        nsx_dlr.del_routing_rule(client_session, 'edge-1|bgp|prefix')
+        client_session.update.assert_not_called()
+
+        # rule is removed, other rules are kept
+        self._update_fake_cs_result(
+            client_session,
+            read_response={'status': 200, 'body': {
+                'routing': {'bgp': {'redistribution': {'rules': {'rule': [{
+                    'prefixName': 'prefix', 'action': 'deny'
+                }, {
+                    'prefixName': 'other', 'action': 'permit'
+                }]}}}}
+            }},
+            update_response=test_nsx_base.SUCCESS_RESPONSE
+        )
+        nsx_dlr.del_routing_rule(client_session, 'edge-1|bgp|prefix')
+        client_session.update.assert_called_with(
+            'routingConfig', uri_parameters={'edgeId': 'edge-1'},
+            request_body_dict={
+                'routing': {'bgp': {'redistribution': {'rules': {'rule': [{
+                    'prefixName': 'other', 'action': 'permit'
+                }]}}}}
+            }
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+import mock
+import pytest
+import pynsxv.library.nsx_esg as nsx_esg
+import pynsxv.library.nsx_logical_switch as nsx_logical_switch
+import cloudify_nsx.library.nsx_common as common
+import cloudify_nsx.library.nsx_esg_dlr as nsx_dlr
+import cloudify_nsx.library.nsx_firewall as nsx_firewall
+import cloudify_nsx.library.nsx_nat as nsx_nat
+import cloudify_nsx.library.nsx_security_group as nsx_security_group
+import cloudify_nsx.library.nsx_security_policy as nsx_security_policy
+import cloudify_nsx.library.nsx_security_tag as nsx_security_tag
+from tests.fakensx import FakeNsxManager
+import test_nsx_base
+
+
+class NsxFakeManagerTest(test_nsx_base.NSXBaseTest):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.nsx = FakeNsxManager().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.nsx.stop()
+
+    def setUp(self):
+        super(NsxFakeManagerTest, self).setUp()
+        self._regen_ctx()
+        self._patch_raml_index()
+        self.nsx.reset_calls()
+        self.client_session = common.nsx_login({'nsx_auth': self.nsx.nsx_auth})
+
+    def _create_esg(self, name):
+        esg_id, _ = nsx_esg.esg_create(
+            self.client_session, name, 'password', 'compact', 'datacenter',
+            'datastore', 'resourcepool', 'portgroup'
+        )
+        return esg_id
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_edge(self):
+        """Check fake nsx with edge features"""
+        esg_id = self._create_esg('esg_edge')
+        self.assertTrue(esg_id.startswith('edge-'))
+        self.assertTrue(nsx_dlr.edge_deployed(self.client_session, esg_id))
+
+        # rules get ids from nsx
+        _, rule_id = nsx_firewall.add_firewall_rule(
+            self.client_session, esg_id, name='rule'
+        )
+        self.assertEqual(
+            nsx_firewall.get_firewall_rule_ids(self.client_session, esg_id),
+            [rule_id.split("|")[1]]
+        )
+        # version of edge is increased by changes only
+        self.assertEqual(
+            nsx_dlr.get_edgegateway(self.client_session, esg_id)['version'],
+            '2'
+        )
+        nsx_nat.add_nat_rule(
+            self.client_session, esg_id, 'snat', '10.0.0.1', '10.0.0.2'
+        )
+        self.assertEqual(
+            len(nsx_nat.get_nat_rule_ids(self.client_session, esg_id)), 1
+        )
+
+        # routing is composed from separate features
+        nsx_dlr.update_bgp(
+            self.client_session, esg_id, True, False, False, False, 64512
+        )
+        neighbour_id = nsx_dlr.add_bgp_neighbour(
+            self.client_session, esg_id, False, '10.0.0.3', 64513, 60, 180,
+            60, '', '', ''
+        )
+        self.assertEqual(neighbour_id, esg_id + '|10.0.0.3|64513||')
+        routing = common.nsx_read(
+            self.client_session, 'body/routing', 'routingConfig',
+            uri_parameters={'edgeId': esg_id}
+        )
+        self.assertEqual(routing['bgp']['localAS'], '64512')
+        self.assertEqual(
+            routing['bgp']['bgpNeighbours']['bgpNeighbour']['ipAddress'],
+            '10.0.0.3'
+        )
+        self.assertEqual(routing['ospf'], {'enabled': 'false'})
+
+        # logical switch in default transport zone
+        switch_id, _ = nsx_logical_switch.logical_switch_create(
+            self.client_session, 'TZ', 'switch_edge'
+        )
+        self.assertEqual(
+            nsx_logical_switch.get_logical_switch(
+                self.client_session, 'switch_edge'
+            )[0],
+            switch_id
+        )
+
+        nsx_dlr.del_edge(self.client_session, esg_id)
+        self.assertFalse(self.nsx.state.edges.get(esg_id))
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_security(self):
+        """Check fake nsx with security tags, groups and policies"""
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.SEARCH_PAGE_SIZE', 2
+        ):
+            for index in range(5):
+                tag_id = nsx_security_tag.add_tag(
+                    self.client_session, 'tag_%s' % index, 'description'
+                )
+            self.nsx.reset_calls()
+            self.assertEqual(
+                nsx_security_tag.get_tag(self.client_session, 'tag_4')[0],
+                tag_id
+            )
+        # list of tags is read by pages
+        self.assertEqual(
+            [call.query.get('startIndex') for call in self.nsx.calls],
+            ['0', '2', '4']
+        )
+
+        nsx_security_tag.add_tag_vms(
+            self.client_session, tag_id, ['vm-1', 'vm-2'], multi_vm=True
+        )
+        self.assertEqual(
+            sorted(nsx_security_tag.get_tag_vm_ids(
+                self.client_session, tag_id
+            )),
+            ['vm-1', 'vm-2']
+        )
+
+        group_id = nsx_security_group.add_group(
+            self.client_session, 'globalroot-0', 'group', None, None, None
+        )
+        nsx_security_group.add_group_member(
+            self.client_session, group_id, 'vm-1'
+        )
+        self.assertEqual(
+            self.nsx.state.groups[group_id]['member'],
+            [{'objectId': 'vm-1'}]
+        )
+        policy_id = nsx_security_policy.add_policy(
+            self.client_session, 'policy', 'description', '5000', None,
+            None, None
+        )
+        nsx_security_policy.add_policy_group_bind(
+            self.client_session, policy_id, group_id
+        )
+        self.assertEqual(
+            self.nsx.state.policies[policy_id]['securityGroupBinding'],
+            {'objectId': group_id}
+        )
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_latency_errors(self):
+        """Check fake nsx latency and errors"""
+        esg_id = self._create_esg('esg_errors')
+        self.nsx.reset_calls()
+        self.nsx.set_latency(0.05, resource='nsxEdge', method='get')
+        try:
+            self.client_session.read(
+                'nsxEdge', uri_parameters={'edgeId': esg_id}
+            )
+            self.client_session.read('nsxEdges')
+        finally:
+            self.nsx.set_latency(0)
+        self.assertTrue(self.nsx.calls[0].latency >= 0.05)
+        self.assertTrue(self.nsx.calls[1].latency < 0.05)
+
+        # only next call fails
+        self.nsx.inject_error(500, resource='nsxEdge')
+        with self.assertRaises(SystemExit):
+            self.client_session.read(
+                'nsxEdge', uri_parameters={'edgeId': esg_id}
+            )
+        self.assertEqual(
+            self.client_session.read(
+                'nsxEdge', uri_parameters={'edgeId': esg_id}
+            )['status'],
+            200
+        )
+
+        # wrong credentials and unknown urls are not recorded
+        self.assertEqual(self.nsx.dispatch(
+            'get', '/api/4.0/edges/%s' % esg_id, None, None
+        )[0], 403)
+        self.assertEqual(self.nsx.dispatch(
+            'get', '/unknown', None, None
+        )[0], 404)
+        self.assertEqual(
+            [call.status for call in self.nsx.calls],
+            [200, 200, 500, 200]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
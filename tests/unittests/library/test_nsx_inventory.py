@@ -0,0 +1,228 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import mock
+import pytest
+import cloudify_nsx.library.nsx_common as common
+import cloudify_nsx.library.nsx_inventory as nsx_inventory
+from cloudify.state import current_ctx
+from cloudify import exceptions as cfy_exc
+import test_nsx_base
+
+
+class NsxInventoryTest(test_nsx_base.NSXBaseTest):
+
+    def setUp(self):
+        super(NsxInventoryTest, self).setUp()
+        self.inventory_dir = tempfile.mkdtemp()
+        self.inventory_file = os.path.join(
+            self.inventory_dir, 'inventory.sqlite'
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.inventory_dir)
+        current_ctx.clear()
+        super(NsxInventoryTest, self).tearDown()
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_inventory(self):
+        """Check nsx_inventory.Inventory"""
+        inventory = nsx_inventory.Inventory(self.inventory_file)
+
+        self.assertEqual(
+            inventory.get('host', 'tag', '', 'name', 60), None
+        )
+
+        # saved object
+        inventory.put('host', 'tag', '', 'name', 'securitytag-1')
+        self.assertEqual(
+            inventory.get('host', 'tag', '', 'name', 60), 'securitytag-1'
+        )
+        self.assertTrue(
+            isinstance(inventory.get('host', 'tag', '', 'name', 60), str)
+        )
+        # other host/type/scope
+        self.assertEqual(
+            inventory.get('other', 'tag', '', 'name', 60), None
+        )
+        self.assertEqual(
+            inventory.get('host', 'group', '', 'name', 60), None
+        )
+        self.assertEqual(
+            inventory.get('host', 'tag', 'scope', 'name', 60), None
+        )
+
+        # shared between instances
+        self.assertEqual(
+            nsx_inventory.Inventory(self.inventory_file).get(
+                'host', 'tag', '', 'name', 60
+            ), 'securitytag-1'
+        )
+
+        # expired
+        with mock.patch(
+            'cloudify_nsx.library.nsx_inventory.time.time',
+            mock.MagicMock(return_value=time.time() + 3600)
+        ):
+            self.assertEqual(
+                inventory.get('host', 'tag', '', 'name', 60), None
+            )
+
+        # refresh, first object with same name wins
+        inventory.replace('host', 'tag', '', [
+            ('other', 'securitytag-2'),
+            ('other', 'securitytag-3')
+        ])
+        self.assertEqual(
+            inventory.get('host', 'tag', '', 'name', 60), None
+        )
+        self.assertEqual(
+            inventory.get('host', 'tag', '', 'other', 60), 'securitytag-2'
+        )
+
+        # deleted
+        inventory.forget('host', 'securitytag-2')
+        self.assertEqual(
+            inventory.get('host', 'tag', '', 'other', 60), None
+        )
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_inventory_search(self):
+        """Check nsx_common.inventory_search func"""
+        self._regen_ctx()
+        client_session = mock.Mock()
+        client_session.read_all_pages = mock.Mock(return_value=[
+            {'name': 'a', 'objectId': 'virtualwire-1'},
+            {'objectId': 'virtualwire-2'},
+            {'name': 'b', 'objectId': 'virtualwire-3'}
+        ])
+        read_func = mock.Mock(return_value=('virtualwire-1', {}))
+
+        # disabled by default
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.INVENTORY_FILE',
+            self.inventory_file
+        ):
+            self.assertEqual(
+                common.inventory_search(
+                    client_session, {}, 'lswitch', 'a', read_func
+                ),
+                ('virtualwire-1', {})
+            )
+            read_func.assert_called_with()
+            common.inventory_save({}, 'lswitch', 'c', 'virtualwire-4')
+            common.inventory_forget({}, 'virtualwire-4')
+        self.assertFalse(os.path.isfile(self.inventory_file))
+
+        self._regen_ctx()
+        kwargs = {'nsx_auth': {'host': 'host', 'inventory': 60}}
+        read_func.reset_mock()
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.INVENTORY_FILE',
+            self.inventory_file
+        ):
+            # refresh of all switches on miss
+            self.assertEqual(
+                common.inventory_search(
+                    client_session, kwargs, 'lswitch', 'b', read_func
+                ),
+                ('virtualwire-3', None)
+            )
+            client_session.read_all_pages.assert_called_with(
+                'logicalSwitchesGlobal', 'read'
+            )
+
+            # found without request to nsx
+            client_session.read_all_pages.reset_mock()
+            self.assertEqual(
+                common.inventory_search(
+                    client_session, kwargs, 'lswitch', 'a', read_func
+                ),
+                ('virtualwire-1', None)
+            )
+            client_session.read_all_pages.assert_not_called()
+
+            # created by plugin
+            common.inventory_save(kwargs, 'lswitch', 'c', 'virtualwire-4')
+            self.assertEqual(
+                common.inventory_search(
+                    client_session, kwargs, 'lswitch', 'c', read_func
+                ),
+                ('virtualwire-4', None)
+            )
+            client_session.read_all_pages.assert_not_called()
+
+            # deleted by plugin
+            common.inventory_forget(kwargs, 'virtualwire-4')
+            self.assertEqual(
+                common.inventory_search(
+                    client_session, kwargs, 'lswitch', 'c', read_func
+                ),
+                (None, None)
+            )
+            client_session.read_all_pages.assert_called_with(
+                'logicalSwitchesGlobal', 'read'
+            )
+        read_func.assert_not_called()
+
+        # esg and dlr with same name
+        client_session.read_all_pages = mock.Mock(return_value=[
+            {'name': 'edge', 'objectId': 'edge-1',
+             'edgeType': 'distributedRouter'},
+            {'name': 'edge', 'objectId': 'edge-2',
+             'edgeType': 'gatewayServices'}
+        ])
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.INVENTORY_FILE',
+            self.inventory_file
+        ):
+            for _ in range(2):
+                self.assertEqual(
+                    common.inventory_search(
+                        client_session, kwargs, 'esg', 'edge', read_func
+                    ),
+                    ('edge-2', None)
+                )
+                self.assertEqual(
+                    common.inventory_search(
+                        client_session, kwargs, 'dlr', 'edge', read_func
+                    ),
+                    ('edge-1', None)
+                )
+            # second search of each type is from inventory
+            self.assertEqual(client_session.read_all_pages.call_count, 2)
+
+            common.inventory_save(kwargs, 'dlr', 'other', 'edge-3')
+            self.assertEqual(
+                common.inventory_search(
+                    client_session, kwargs, 'esg', 'other', read_func
+                ),
+                (None, None)
+            )
+        read_func.assert_not_called()
+
+        # wrong ttl
+        self._regen_ctx()
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            common.get_inventory_ttl({'nsx_auth': {'inventory': 'a'}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,255 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+import mock
+import pytest
+import pynsxv.library.nsx_esg as nsx_esg
+import cloudify_nsx.library.nsx_common as common
+import cloudify_nsx.library.nsx_plan as nsx_plan
+import cloudify_nsx.library.nsx_security_tag as nsx_security_tag
+import cloudify_nsx.network.dlr_bgp_neighbour as dlr_bgp_neighbour
+import cloudify_nsx.security.tag as tag
+from cloudify import exceptions as cfy_exc
+from cloudify.decorators import operation
+from tests.fakensx import FakeNsxManager
+import test_nsx_base
+
+
+class NsxPlanTest(test_nsx_base.NSXBaseTest):
+
+    def tearDown(self):
+        nsx_plan.select(None)
+        super(NsxPlanTest, self).tearDown()
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_planning_client(self):
+        """Check nsx_plan.PlanningClient"""
+        client = mock.Mock()
+        client.read = mock.Mock(return_value={'status': 200, 'body': {}})
+        plan = nsx_plan.Plan()
+        planner = nsx_plan.PlanningClient(client, plan)
+
+        # reads are sent to nsx
+        self.assertEqual(
+            planner.read('nsxEdge', uri_parameters={'edgeId': 'edge-1'}),
+            {'status': 200, 'body': {}}
+        )
+        client.read.assert_called_with(
+            'nsxEdge', {'edgeId': 'edge-1'}, None, None
+        )
+
+        # changes are only planned
+        self.assertEqual(
+            planner.update(
+                'routingBGP', uri_parameters={'edgeId': 'edge-1'},
+                request_body_dict={'bgp': {'enabled': 'true'}}
+            ),
+            {'status': 204, 'body': None}
+        )
+        created = planner.create('securityTag', None, {'securityTag': {
+            'name': 'tag'
+        }})
+        self.assertEqual(created['status'], 201)
+        self.assertEqual(created['objectId'], 'dry-run-2')
+        planner.delete('nsxEdge', {'edgeId': 'edge-1'})
+        client.update.assert_not_called()
+        client.create.assert_not_called()
+        client.delete.assert_not_called()
+
+        # planned object does not exist in nsx
+        with self.assertRaises(nsx_plan.PlanStopped):
+            planner.read(
+                'securityTag', uri_parameters={'tagId': created['objectId']}
+            )
+
+        bgp_size = len('<bgp><enabled>true</enabled></bgp>')
+        tag_size = len('<securityTag><name>tag</name></securityTag>')
+        self.assertEqual(plan.to_dict(), {
+            'calls': [{
+                'method': 'update',
+                'resource': 'routingBGP',
+                'uri_parameters': {'edgeId': 'edge-1'},
+                'query_parameters': {},
+                'size': bgp_size
+            }, {
+                'method': 'create',
+                'resource': 'securityTag',
+                'uri_parameters': {},
+                'query_parameters': {},
+                'size': tag_size
+            }, {
+                'method': 'delete',
+                'resource': 'nsxEdge',
+                'uri_parameters': {'edgeId': 'edge-1'},
+                'query_parameters': {},
+                'size': 0
+            }],
+            'counts': {
+                'reads': 1,
+                'calls': 3,
+                'size': bgp_size + tag_size,
+                'methods': {'update': 1, 'create': 1, 'delete': 1},
+                'resources': {
+                    'routingBGP': {'calls': 1, 'size': bgp_size},
+                    'securityTag': {'calls': 1, 'size': tag_size},
+                    'nsxEdge': {'calls': 1, 'size': 0}
+                }
+            },
+            'complete': True
+        })
+        self.assertTrue(planner.client is client)
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_dry_run_helpers(self):
+        """Check waits and inventory in dry run"""
+        self._regen_ctx()
+        kwargs = {'nsx_auth': {}}
+        nsx_plan.select(nsx_plan.Plan())
+
+        # only one poll
+        func = mock.Mock(return_value=None)
+        func.__name__ = 'func'
+        self.assertEqual(common.wait_for(func), None)
+        func.assert_called_once_with()
+
+        inventory = mock.Mock()
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common._inventory',
+            mock.Mock(return_value=(inventory, 'host', 60))
+        ):
+            common.inventory_save(kwargs, 'tag', 'name', 'dry-run-1')
+            common.inventory_forget(kwargs, 'securitytag-1')
+        inventory.put.assert_not_called()
+        inventory.forget.assert_not_called()
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_with_dry_run(self):
+        """Check operations with dry_run on fake nsx"""
+        self._patch_raml_index()
+        nsx = FakeNsxManager().start()
+        try:
+            self._regen_ctx()
+            esg_id, _ = nsx_esg.esg_create(
+                common.nsx_login({'nsx_auth': nsx.nsx_auth}), 'esg',
+                'password', 'compact', 'datacenter', 'datastore',
+                'resourcepool', 'portgroup'
+            )
+            edge = nsx.state.edges[esg_id]
+            nsx.reset_calls()
+
+            # change of existed edge
+            self._regen_ctx()
+            runtime_properties = self.fake_ctx.instance.runtime_properties
+            runtime_properties['other'] = 'value'
+            dlr_bgp_neighbour.create_esg(
+                ctx=self.fake_ctx, dry_run=True, nsx_auth=nsx.nsx_auth,
+                neighbour={
+                    'dlr_id': esg_id, 'ipAddress': '10.0.0.3',
+                    'remoteAS': 64513
+                }
+            )
+            plan = runtime_properties['nsx_plan']['operation']
+            self.assertEqual(runtime_properties['other'], 'value')
+            self.assertFalse('resource_id' in runtime_properties)
+            self.assertTrue(plan['complete'])
+            self.assertEqual(
+                [(call['method'], call['resource'], call['uri_parameters'])
+                 for call in plan['calls']],
+                [('update', 'routingBGP', {'edgeId': esg_id})]
+            )
+            # routing is locked, no read before write
+            self.assertEqual(plan['counts']['reads'], 1)
+            self.assertTrue(plan['counts']['size'] > 0)
+
+            # new object, second operation is saved separately
+            self.fake_ctx.operation._operation_context = {'name': 'create'}
+            tag.create(
+                ctx=self.fake_ctx, dry_run='true', nsx_auth=nsx.nsx_auth,
+                tag={'name': 'tag'}
+            )
+            plan = runtime_properties['nsx_plan']['create']
+            self.assertEqual(
+                [(call['method'], call['resource'])
+                 for call in plan['calls']],
+                [('create', 'securityTag')]
+            )
+            self.assertTrue('operation' in runtime_properties['nsx_plan'])
+            self.assertFalse('resource_id' in runtime_properties)
+            self.assertFalse('tag' in runtime_properties)
+
+            # nsx is not changed
+            self.assertEqual(
+                set(call.method for call in nsx.calls), set(['get'])
+            )
+            self.assertEqual(nsx.state.edges[esg_id], edge)
+            self.assertFalse(nsx.state.tags)
+
+            # wrong inputs are reported in dry run
+            self._regen_ctx()
+            with self.assertRaises(cfy_exc.NonRecoverableError):
+                tag.create(
+                    ctx=self.fake_ctx, dry_run=True, nsx_auth=nsx.nsx_auth,
+                    tag={}
+                )
+            self.assertFalse(
+                'nsx_plan' in self.fake_ctx.instance.runtime_properties
+            )
+
+            @operation
+            @common.with_dry_run
+            def create_and_read(**kwargs):
+                client_session = common.nsx_login(kwargs)
+                tag_id = nsx_security_tag.add_tag(
+                    client_session, 'tag', 'description'
+                )
+                self.fake_ctx.instance.runtime_properties[
+                    'resource_id'
+                ] = tag_id
+                if kwargs.get('error'):
+                    raise cfy_exc.NonRecoverableError(kwargs['error'])
+                client_session.read(
+                    'securityTagVMsList', uri_parameters={'tagId': tag_id}
+                )
+
+            # request with planned object stops planning
+            self._regen_ctx()
+            create_and_read(
+                ctx=self.fake_ctx, dry_run=True, nsx_auth=nsx.nsx_auth
+            )
+            runtime_properties = self.fake_ctx.instance.runtime_properties
+            plan = runtime_properties['nsx_plan']['operation']
+            self.assertFalse(plan['complete'])
+            self.assertTrue('securityTagVMsList' in plan['stopped'])
+            self.assertFalse('resource_id' in runtime_properties)
+
+            # other errors after planned changes are not hidden
+            self._regen_ctx()
+            with self.assertRaises(cfy_exc.NonRecoverableError):
+                create_and_read(
+                    ctx=self.fake_ctx, dry_run=True, nsx_auth=nsx.nsx_auth,
+                    error='wrong state'
+                )
+            runtime_properties = self.fake_ctx.instance.runtime_properties
+            self.assertFalse('nsx_plan' in runtime_properties)
+            self.assertFalse('resource_id' in runtime_properties)
+            self.assertFalse(nsx.state.tags)
+        finally:
+            nsx.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+import pytest
+import cloudify_nsx.library.nsx_common as common
+import cloudify_nsx.library.nsx_raml_index as nsx_raml_index
+from cloudify.state import current_ctx
+import test_nsx_base
+
+
+class NsxRamlIndexTest(test_nsx_base.NSXBaseTest):
+
+    def setUp(self):
+        super(NsxRamlIndexTest, self).setUp()
+        self.index_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.index_dir)
+        current_ctx.clear()
+        super(NsxRamlIndexTest, self).tearDown()
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_raml_hash(self):
+        """Check nsx_raml_index.raml_hash func"""
+        self.assertEqual(nsx_raml_index.raml_hash('not_existed'), None)
+        self.assertEqual(
+            nsx_raml_index.index_path(self.index_dir, 'not_existed'), None
+        )
+
+        raml_file = os.path.join(self.index_dir, 'some.raml')
+        with open(raml_file, 'w') as f:
+            f.write("#%RAML 0.8\n")
+        first_hash = nsx_raml_index.raml_hash(raml_file)
+        self.assertTrue(first_hash)
+
+        # content changed
+        with open(raml_file, 'a') as f:
+            f.write("title: NSX\n")
+        self.assertNotEqual(nsx_raml_index.raml_hash(raml_file), first_hash)
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_build_and_load(self):
+        """Check nsx_raml_index build/load with embedded raml"""
+        raml_file = common.default_raml_file()
+
+        self.assertEqual(
+            nsx_raml_index.load(self.index_dir, raml_file), None
+        )
+
+        # raml is parsed once for all tests
+        with mock.patch(
+            'pyraml.parser.load', test_nsx_base.raml_root
+        ):
+            path = nsx_raml_index.build(self.index_dir, raml_file)
+        self.assertTrue(os.path.isfile(path))
+
+        raml_root = nsx_raml_index.load(self.index_dir, raml_file)
+        client = nsx_raml_index.IndexedNsxClient(
+            raml_root, raml_file, 'host', 'username', 'password'
+        )
+        self.assertEqual(
+            client._nsxraml.contruct_resource_url(
+                'nsxEdge', {'edgeId': 'edge-1'}
+            ),
+            'https://host/api/4.0/edges/edge-1'
+        )
+        self.assertEqual(
+            client.extract_resource_body_example('edgeNatRules', 'create')[
+                'natRules'
+            ].keys(),
+            ['natRule']
+        )
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_load_private(self):
+        """Check that index is loaded only from private files"""
+        raml_file = common.default_raml_file()
+        index_dir = os.path.join(self.index_dir, 'index')
+        path = nsx_raml_index.save(index_dir, raml_file, {'raml': 'root'})
+
+        # created without access of other users
+        self.assertEqual(os.stat(index_dir).st_mode & 0o077, 0)
+        self.assertEqual(os.stat(path).st_mode & 0o077, 0)
+        self.assertEqual(
+            nsx_raml_index.load(index_dir, raml_file), {'raml': 'root'}
+        )
+
+        # writable by other users
+        for changed in [path, index_dir]:
+            mode = os.stat(changed).st_mode
+            os.chmod(changed, mode | 0o022)
+            with self.assertRaises(ValueError):
+                nsx_raml_index.load(index_dir, raml_file)
+            os.chmod(changed, mode)
+
+        # file is replaced on save, only directory is checked
+        os.chmod(index_dir, 0o777)
+        with self.assertRaises(ValueError):
+            nsx_raml_index.save(index_dir, raml_file, {})
+        os.chmod(index_dir, 0o700)
+
+        # owned by other user
+        with mock.patch(
+            'os.getuid', mock.Mock(return_value=os.getuid() + 1)
+        ):
+            with self.assertRaises(ValueError):
+                nsx_raml_index.load(index_dir, raml_file)
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_nsx_login_with_index(self):
+        """Check nsx_common.nsx_login func: client from raml index"""
+        self._regen_ctx()
+        fake_client = mock.MagicMock()
+        fake_indexed_client = mock.MagicMock(return_value='Indexed')
+        with mock.patch(
+            'cloudify_nsx.library.nsx_common.NsxClient',
+            fake_client
+        ):
+            with mock.patch(
+                'cloudify_nsx.library.nsx_raml_index.load',
+                mock.MagicMock(return_value='raml_root')
+            ):
+                with mock.patch(
+                    'cloudify_nsx.library.nsx_raml_index.IndexedNsxClient',
+                    fake_indexed_client
+                ):
+                    self.assertEqual(
+                        common.nsx_login({
+                            'nsx_auth': {
+                                'username': 'username',
+                                'password': 'password',
+                                'host': 'ip',
+                                'raml': 'raml'
+                            }
+                        }), 'Indexed'
+                    )
+        fake_client.assert_not_called()
+        fake_indexed_client.assert_called_with(
+            'raml_root', 'raml', 'ip', 'username', 'password'
+        )
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_nsx_login_unsupported_client(self):
+        """Check nsx_common.nsx_login func: other nsxramlclient version"""
+        self._regen_ctx()
+        fake_client = mock.MagicMock(return_value='Client')
+        fake_load = mock.MagicMock(return_value='raml_root')
+        fake_save = mock.MagicMock()
+        with mock.patch(
+            'cloudify_nsx.library.nsx_raml_index.client_version',
+            mock.MagicMock(return_value='2.0.8')
+        ):
+            self.assertFalse(nsx_raml_index.client_supported())
+            with mock.patch(
+                'cloudify_nsx.library.nsx_common.NsxClient',
+                fake_client
+            ):
+                with mock.patch(
+                    'cloudify_nsx.library.nsx_raml_index.load', fake_load
+                ):
+                    with mock.patch(
+                        'cloudify_nsx.library.nsx_raml_index.save',
+                        fake_save
+                    ):
+                        self.assertEqual(
+                            common.nsx_login({
+                                'nsx_auth': {
+                                    'username': 'username',
+                                    'password': 'password',
+                                    'host': 'ip',
+                                    'raml': 'raml'
+                                }
+                            }), 'Client'
+                        )
+        fake_client.assert_called_with('raml', 'ip', 'username', 'password')
+        fake_load.assert_not_called()
+        fake_save.assert_not_called()
+
+        # version of installed package
+        with mock.patch(
+            'pkg_resources.get_distribution',
+            mock.MagicMock(return_value=mock.Mock(version='2.0.7'))
+        ):
+            self.assertEqual(nsx_raml_index.client_version(), '2.0.7')
+            self.assertTrue(nsx_raml_index.client_supported())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+# Copyright (c) 2017 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+import pytest
+import cloudify_nsx.library.nsx_resource_id as resource_ids
+from cloudify import exceptions as cfy_exc
+import test_nsx_base
+
+
+class NsxResourceIdTest(test_nsx_base.NSXBaseTest):
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_legacy_ids(self):
+        """Check nsx_resource_id decode/encode of saved ids"""
+        for kind, resource_id in [
+            ('tag_vm', 'securitytag-1|vm-2'),
+            ('tag_vms', 'securitytag-1|vm-2,vm-3'),
+            ('group_members', 'securitygroup-1||vm-2'),
+            ('dlr_interface', '0|edge-1'),
+            ('bgp_neighbour', 'edge-1|10.0.0.1|64512||'),
+            ('bgp_neighbour_filter', 'net|edge-1|10.0.0.1|64512|ip|fw'),
+            ('dhcp_bulk', 'edge-1|pool-1,pool-2|'),
+        ]:
+            self.assertEqual(
+                resource_ids.decode(kind, resource_id).encode(),
+                resource_id
+            )
+
+        # typed fields
+        neighbour = resource_ids.BgpNeighbourId.decode(
+            u'edge-1|10.0.0.1|64512||'
+        )
+        self.assertEqual(neighbour.esg_id, 'edge-1')
+        self.assertTrue(isinstance(neighbour.esg_id, str))
+        self.assertEqual(neighbour.protocol_address, '')
+        self.assertEqual(
+            resource_ids.BgpNeighbourFilterId.from_neighbour(
+                'net', neighbour
+            ).encode(),
+            'net|edge-1|10.0.0.1|64512||'
+        )
+        self.assertEqual(
+            resource_ids.DhcpBulkId.decode('edge-1||binding-1').pool_ids,
+            ()
+        )
+        self.assertEqual(
+            tuple(resource_ids.TagVmsId.decode('securitytag-1|vm-2,vm-3')),
+            ('securitytag-1', ('vm-2', 'vm-3'))
+        )
+
+        # same as old encode
+        self.assertEqual(
+            resource_ids.encode('ospf_interface', 'edge-1', 10, 0),
+            'edge-1|10|0'
+        )
+        self.assertEqual(
+            resource_ids.BgpNeighbourId(
+                'edge-1', '10.0.0.1', 64512, None, None
+            ),
+            neighbour
+        )
+
+        # fields only in slots
+        with self.assertRaises(AttributeError):
+            neighbour.other = 'value'
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_wrong_ids(self):
+        """Check nsx_resource_id errors"""
+        for kind, resource_id in [
+            # wrong count of fields
+            ('nat_rule', 'edge-1|rule-1|_'),
+            ('nat_rule', 'edge-1'),
+            # empty required field
+            ('nat_rule', 'edge-1|'),
+            ('bgp_neighbour', 'edge-1||64512||'),
+            # not string
+            ('nat_rule', None),
+            # unknown kind
+            ('unknown', 'edge-1|rule-1'),
+        ]:
+            with self.assertRaises(cfy_exc.NonRecoverableError) as error:
+                resource_ids.decode(kind, resource_id)
+            self.assertTrue(str(error.exception).startswith(
+                'Unexpected error retrieving resource ID'
+            ))
+
+        # separator in value
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            resource_ids.NatRuleId('edge-1', 'rule|1')
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            resource_ids.NatRulesId('edge-1', ['rule,1'])
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_register(self):
+        """Check nsx_resource_id register of new kind"""
+
+        class ScopedId(resource_ids.ResourceId):
+            kind = 'scoped'
+            __slots__ = ('esg_id', 'object_id', 'scope')
+            optional = ('scope',)
+
+        resource_ids.register(ScopedId)
+        try:
+            with self.assertRaises(ValueError):
+                resource_ids.register(ScopedId)
+            self.assertEqual(
+                resource_ids.decode('scoped', 'edge-1|object-1|'),
+                ScopedId('edge-1', 'object-1', '')
+            )
+            self.assertEqual(
+                resource_ids.encode('scoped', 'edge-1', 'object-1', 's'),
+                'edge-1|object-1|s'
+            )
+        finally:
+            resource_ids.KINDS.pop('scoped')
+
+
+if __name__ == '__main__':
+    unittest.main()
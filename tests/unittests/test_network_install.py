@@ -17,13 +17,16 @@ import pytest
 import mock
 import copy
 import cloudify_nsx.network.dhcp_bind as dhcp_bind
+import cloudify_nsx.network.dhcp_bulk as dhcp_bulk
 import cloudify_nsx.network.dhcp_pool as dhcp_pool
 import cloudify_nsx.network.dlr_dgw as dlr_dgw
 import cloudify_nsx.network.bgp_neighbour_filter as bgp_neighbour_filter
 import cloudify_nsx.network.esg_firewall as esg_firewall
+import cloudify_nsx.network.esg_firewall_rules as esg_firewall_rules
 import cloudify_nsx.network.esg_gateway as esg_gateway
 import cloudify_nsx.network.esg_interface as esg_interface
 import cloudify_nsx.network.esg_nat as esg_nat
+import cloudify_nsx.network.esg_nat_rules as esg_nat_rules
 import cloudify_nsx.network.dlr_bgp_neighbour as dlr_bgp_neighbour
 import cloudify_nsx.network.dlr_interface as dlr_interface
 import cloudify_nsx.network.lswitch as lswitch
@@ -34,6 +37,7 @@ import cloudify_nsx.network.relay as relay
 import cloudify_nsx.network.routing_ip_prefix as routing_ip_prefix
 import cloudify_nsx.network.routing_redistribution as routing_redistribution
 from cloudify.state import current_ctx
+from cloudify import exceptions as cfy_exc
 
 
 class NetworkInstallTest(test_nsx_base.NSXBaseTest):
@@ -116,6 +120,107 @@ class NetworkInstallTest(test_nsx_base.NSXBaseTest):
             create_response=test_nsx_base.SUCCESS_RESPONSE_ID
         )
 
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_esg_firewall_rules_install(self):
+        """Check create esg firewall rules by one request"""
+        func_kwargs = {"firewall": {
+            "esg_id": "esg_id",
+            "rules": [{
+                "action": "deny"
+            }, {
+                "action": "accept",
+                "name": "rule",
+                "direction": "in",
+                "destination": "8.8.8.8"
+            }]
+        }}
+
+        self._common_install("esg_id|id1,id2", esg_firewall_rules.create,
+                             func_kwargs)
+
+        # wrong list of rules
+        kwargs = self._kwargs_regen({"firewall": {
+            "esg_id": "esg_id",
+            "rules": {"action": "deny"}
+        }})
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            esg_firewall_rules.create(**kwargs)
+
+        with self._fake_client(
+            func_kwargs,
+            create_response=test_nsx_base.SUCCESS_RESPONSE_ID,
+            read_responses=[{
+                'status': 200,
+                'body': {'firewall': {'firewallRules': {
+                    'firewallRule': {'id': 'default'}
+                }}}
+            }, {
+                'status': 200,
+                'body': {'firewall': {'firewallRules': {
+                    'firewallRule': [
+                        {'id': 'id1'}, {'id': 'id2'}, {'id': 'default'}
+                    ]
+                }}}
+            }]
+        ) as (fake_cs_result, kwargs):
+            esg_firewall_rules.create(**kwargs)
+
+            fake_cs_result.create.assert_called_once_with(
+                'firewallRules',
+                request_body_dict={
+                    'firewallRules': {
+                        'firewallRule': [{
+                            'direction': None,
+                            'name': None,
+                            'application': None,
+                            'loggingEnabled': 'false',
+                            'matchTranslated': 'false',
+                            'destination': None,
+                            'enabled': 'true',
+                            'source': None,
+                            'action': 'deny'
+                        }, {
+                            'direction': 'in',
+                            'name': 'rule',
+                            'application': None,
+                            'loggingEnabled': 'false',
+                            'matchTranslated': 'false',
+                            'destination': '8.8.8.8',
+                            'enabled': 'true',
+                            'source': None,
+                            'action': 'accept'
+                        }]
+                    }
+                },
+                uri_parameters={'edgeId': 'esg_id'}
+            )
+            fake_cs_result.read.assert_called_with(
+                'nsxEdgeFirewallConfig', uri_parameters={'edgeId': 'esg_id'}
+            )
+
+            runtime = self.fake_ctx.instance.runtime_properties
+            self.assertEqual(runtime['resource_id'], "esg_id|id1,id2")
+            self.assertEqual(runtime['rule_ids'], ['id1', 'id2'])
+
+        # rules created by other operation
+        with self._fake_client(
+            func_kwargs,
+            create_response=test_nsx_base.SUCCESS_RESPONSE_ID,
+            read_response={
+                'status': 200,
+                'body': {'firewall': {'firewallRules': {
+                    'firewallRule': {'id': 'default'}
+                }}}
+            }
+        ) as (fake_cs_result, kwargs):
+            with self.assertRaises(cfy_exc.NonRecoverableError):
+                esg_firewall_rules.create(**kwargs)
+
+            self.assertFalse(
+                'resource_id' in self.fake_ctx.instance.runtime_properties
+            )
+
     @pytest.mark.internal
     @pytest.mark.unit
     def test_esg_interface_install(self):
@@ -268,6 +373,143 @@ class NetworkInstallTest(test_nsx_base.NSXBaseTest):
             create_response=test_nsx_base.SUCCESS_RESPONSE_ID
         )
 
+        # esg_nat sends ports swapped as previous versions
+        self._common_install_extract_or_read_and_update(
+            'esg_id|id', esg_nat.create,
+            {'rule': {
+                "esg_id": "esg_id",
+                "action": "dnat",
+                "originalAddress": "originalAddress",
+                "translatedAddress": "translatedAddress",
+                "protocol": "tcp",
+                "originalPort": "80",
+                "translatedPort": "8080"
+            }},
+            extract_args=['edgeNatRules', 'create'], extract_kwargs={},
+            extract_response={
+                'natRules': {
+                    'natRule': {}
+                }
+            },
+            create_args=['edgeNatRules'],
+            create_kwargs={
+                'uri_parameters': {'edgeId': "esg_id"},
+                'request_body_dict': {
+                    'natRules': {
+                        'natRule': {
+                            'translatedPort': '80',
+                            'action': 'dnat',
+                            'originalAddress': 'originalAddress',
+                            'translatedAddress': 'translatedAddress',
+                            'vnic': None,
+                            'ruleTag': None,
+                            'description': None,
+                            'enabled': 'true',
+                            'protocol': 'tcp',
+                            'originalPort': '8080',
+                            'loggingEnabled': 'false'
+                        }
+                    }
+                }
+            },
+            create_response=test_nsx_base.SUCCESS_RESPONSE_ID
+        )
+
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_esg_nat_rules_install(self):
+        """Check create esg nat rules by one request"""
+        func_kwargs = {'nat': {
+            "esg_id": "esg_id",
+            "rules": [{
+                "action": "dnat",
+                "originalAddress": "originalAddress",
+                "translatedAddress": "translatedAddress"
+            }, {
+                "action": "snat",
+                "originalAddress": "translatedAddress",
+                "translatedAddress": "originalAddress",
+                "vnic": "1",
+                "originalPort": "80",
+                "translatedPort": "8080"
+            }]
+        }}
+
+        self._common_install("esg_id|id1,id2", esg_nat_rules.create,
+                             func_kwargs)
+
+        # one of rules is wrong
+        kwargs = self._kwargs_regen({'nat': {
+            "esg_id": "esg_id",
+            "rules": [{
+                "action": "dnat",
+                "originalAddress": "originalAddress",
+                "translatedAddress": "translatedAddress"
+            }, {
+                "action": "dnat"
+            }]
+        }})
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            esg_nat_rules.create(**kwargs)
+
+        with self._fake_client(
+            func_kwargs,
+            create_response=test_nsx_base.SUCCESS_RESPONSE_ID,
+            read_responses=[{
+                'status': 200,
+                'body': {'nat': {'enabled': 'true', 'natRules': None}}
+            }, {
+                'status': 200,
+                'body': {'nat': {'enabled': 'true', 'natRules': {
+                    'natRule': [{'ruleId': 'id1'}, {'ruleId': 'id2'}]
+                }}}
+            }]
+        ) as (fake_cs_result, kwargs):
+            esg_nat_rules.create(**kwargs)
+
+            fake_cs_result.extract_resource_body_example.assert_not_called()
+            fake_cs_result.create.assert_called_once_with(
+                'edgeNatRules',
+                request_body_dict={
+                    'natRules': {
+                        'natRule': [{
+                            'translatedPort': 'any',
+                            'action': 'dnat',
+                            'originalAddress': 'originalAddress',
+                            'translatedAddress': 'translatedAddress',
+                            'vnic': None,
+                            'ruleTag': None,
+                            'description': None,
+                            'enabled': 'true',
+                            'protocol': 'any',
+                            'originalPort': 'any',
+                            'loggingEnabled': 'false'
+                        }, {
+                            # ports are sent as set in rule
+                            'translatedPort': '8080',
+                            'action': 'snat',
+                            'originalAddress': 'translatedAddress',
+                            'translatedAddress': 'originalAddress',
+                            'vnic': '1',
+                            'ruleTag': None,
+                            'description': None,
+                            'enabled': 'true',
+                            'protocol': 'any',
+                            'originalPort': '80',
+                            'loggingEnabled': 'false'
+                        }]
+                    }
+                },
+                uri_parameters={'edgeId': 'esg_id'}
+            )
+            fake_cs_result.read.assert_called_with(
+                'edgeNat', uri_parameters={'edgeId': 'esg_id'}
+            )
+
+            runtime = self.fake_ctx.instance.runtime_properties
+            self.assertEqual(runtime['resource_id'], "esg_id|id1,id2")
+            self.assertEqual(runtime['rule_ids'], ['id1', 'id2'])
+
     @pytest.mark.unit
     def test_dlr_bgp_neighbour_dlr_install(self):
         """Check define dlr bgp neighbour"""
@@ -485,6 +727,144 @@ class NetworkInstallTest(test_nsx_base.NSXBaseTest):
             create_response=test_nsx_base.SUCCESS_RESPONSE_ID
         )
 
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_dhcp_bulk_install(self):
+        """Check add dhcp pools and bindings by one update"""
+        func_kwargs = {'dhcp_bulk': {
+            'esg_id': 'esg_id',
+            'pools': [{
+                'ip_range': '192.168.5.128-192.168.5.250',
+                'default_gateway': '192.168.5.1'
+            }],
+            'bindings': [{
+                'mac': '11:22:33:44:55:66',
+                'hostname': 'secret.server',
+                'ip': '192.168.5.251'
+            }, {
+                'vm_id': 'vm_id',
+                'vnic_id': '0',
+                'hostname': 'other.server',
+                'ip': '192.168.5.252'
+            }]
+        }}
+
+        self._common_install("esg_id|pool-2|binding-2,binding-3",
+                             dhcp_bulk.create, func_kwargs)
+
+        # binding without mac and vm
+        kwargs = self._kwargs_regen({'dhcp_bulk': {
+            'esg_id': 'esg_id',
+            'bindings': [{
+                'hostname': 'secret.server',
+                'ip': '192.168.5.251'
+            }]
+        }})
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            dhcp_bulk.create(**kwargs)
+
+        existed_config = {'dhcp': {
+            'enabled': 'true',
+            'ipPools': {'ipPool': {
+                'poolId': 'pool-1', 'ipRange': '192.168.5.10-192.168.5.20'
+            }},
+            'staticBindings': None
+        }}
+        new_pool = {
+            'ipRange': '192.168.5.128-192.168.5.250',
+            'defaultGateway': '192.168.5.1',
+            'subnetMask': None,
+            'domainName': None,
+            'primaryNameServer': None,
+            'secondaryNameServer': None,
+            'leaseTime': None,
+            'autoConfigureDNS': None
+        }
+        new_mac_binding = {
+            'macAddress': '11:22:33:44:55:66',
+            'hostname': 'secret.server',
+            'ipAddress': '192.168.5.251',
+            'defaultGateway': None,
+            'subnetMask': None,
+            'domainName': None,
+            'primaryNameServer': None,
+            'secondaryNameServer': None,
+            'leaseTime': None,
+            'autoConfigureDNS': None
+        }
+        new_vm_binding = {
+            'vmId': 'vm_id',
+            'vnicId': '0',
+            'hostname': 'other.server',
+            'ipAddress': '192.168.5.252',
+            'defaultGateway': None,
+            'subnetMask': None,
+            'domainName': None,
+            'primaryNameServer': None,
+            'secondaryNameServer': None,
+            'leaseTime': None,
+            'autoConfigureDNS': None
+        }
+
+        # dhcp is locked, config is read once before update
+        with self._fake_client(
+            func_kwargs,
+            update_response=test_nsx_base.SUCCESS_RESPONSE,
+            read_responses=[{
+                'status': 200,
+                'body': copy.deepcopy(existed_config)
+            }, {
+                'status': 200,
+                'body': {'dhcp': {
+                    'enabled': 'true',
+                    'ipPools': {'ipPool': [{
+                        'poolId': 'pool-1',
+                        'ipRange': '192.168.5.10-192.168.5.20'
+                    }, {
+                        'poolId': 'pool-2',
+                        'ipRange': '192.168.5.128-192.168.5.250'
+                    }]},
+                    'staticBindings': {'staticBinding': [{
+                        'bindingId': 'binding-3',
+                        'ipAddress': '192.168.5.252'
+                    }, {
+                        'bindingId': 'binding-2',
+                        'ipAddress': '192.168.5.251'
+                    }]}
+                }}
+            }]
+        ) as (fake_cs_result, kwargs):
+            dhcp_bulk.create(**kwargs)
+
+            fake_cs_result.create.assert_not_called()
+            fake_cs_result.update.assert_called_once_with(
+                'dhcp',
+                request_body_dict={'dhcp': {
+                    'enabled': 'true',
+                    'ipPools': {'ipPool': [{
+                        'poolId': 'pool-1',
+                        'ipRange': '192.168.5.10-192.168.5.20'
+                    }, new_pool]},
+                    'staticBindings': {'staticBinding': [
+                        new_mac_binding, new_vm_binding
+                    ]}
+                }},
+                uri_parameters={'edgeId': 'esg_id'}
+            )
+            fake_cs_result.read.assert_called_with(
+                'dhcp', uri_parameters={'edgeId': 'esg_id'}
+            )
+
+            runtime = self.fake_ctx.instance.runtime_properties
+            self.assertEqual(
+                runtime['resource_id'], "esg_id|pool-2|binding-2,binding-3"
+            )
+            self.assertEqual(runtime['pool_ids'], ['esg_id|pool-2'])
+            self.assertEqual(
+                runtime['binding_ids'],
+                ['esg_id|binding-2', 'esg_id|binding-3']
+            )
+
     @pytest.mark.internal
     @pytest.mark.unit
     def test_bgp_neighbour_filter_install(self):
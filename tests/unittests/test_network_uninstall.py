@@ -20,13 +20,16 @@ import cloudify_nsx.network.dlr_dgw as dlr_dgw
 import cloudify_nsx.network.dlr_interface as dlr_interface
 import cloudify_nsx.network.bgp_neighbour_filter as bgp_neighbour_filter
 import cloudify_nsx.network.dhcp_bind as dhcp_bind
+import cloudify_nsx.network.dhcp_bulk as dhcp_bulk
 import cloudify_nsx.network.dhcp_pool as dhcp_pool
 import cloudify_nsx.network.esg_firewall as esg_firewall
+import cloudify_nsx.network.esg_firewall_rules as esg_firewall_rules
 import cloudify_nsx.network.lswitch as lswitch
 import cloudify_nsx.network.esg as esg
 import cloudify_nsx.network.esg_gateway as esg_gateway
 import cloudify_nsx.network.esg_interface as esg_interface
 import cloudify_nsx.network.esg_nat as esg_nat
+import cloudify_nsx.network.esg_nat_rules as esg_nat_rules
 import cloudify_nsx.network.esg_route as esg_route
 import cloudify_nsx.network.ospf_area as ospf_area
 import cloudify_nsx.network.ospf_interface as ospf_interface
@@ -145,6 +148,43 @@ class NetworkUninstallTest(test_nsx_base.NSXBaseTest):
             }
         )
 
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_dhcp_bulk_uninstall(self):
+        """Check delete dhcp pools and bindings by one update"""
+        self._common_uninstall_read_update(
+            'esg_id|pool-2|binding-2,binding-3', dhcp_bulk.delete,
+            {'dhcp_bulk': {
+                'esg_id': 'esg_id'
+            }},
+            read_args=['dhcp'],
+            read_kwargs={'uri_parameters': {'edgeId': 'esg_id'}},
+            read_response={
+                'status': 200,
+                'body': {'dhcp': {
+                    'enabled': 'true',
+                    'ipPools': {'ipPool': {'poolId': 'pool-2'}},
+                    'staticBindings': {'staticBinding': [
+                        {'bindingId': 'binding-1'},
+                        {'bindingId': 'binding-2'},
+                        {'bindingId': 'binding-3'}
+                    ]}
+                }}
+            },
+            update_args=['dhcp'],
+            update_kwargs={
+                'uri_parameters': {'edgeId': 'esg_id'},
+                'request_body_dict': {'dhcp': {
+                    'enabled': 'true',
+                    'ipPools': {'ipPool': []},
+                    'staticBindings': {'staticBinding': [
+                        {'bindingId': 'binding-1'}
+                    ]}
+                }}
+            },
+            additional_params=['pool_ids', 'binding_ids']
+        )
+
     @pytest.mark.internal
     @pytest.mark.unit
     def test_dhcp_pool_uninstall(self):
@@ -186,6 +226,31 @@ class NetworkUninstallTest(test_nsx_base.NSXBaseTest):
             additional_params=['rule_id']
         )
 
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_esg_firewall_rules_uninstall(self):
+        """Check delete esg firewall rules"""
+        self._common_uninstall_delete(
+            'esg_id|id1,id2,id3', esg_firewall_rules.delete,
+            {'firewall': {
+                'esg_id': 'esg_id'
+            }},
+            ['firewallRule'], {
+                'uri_parameters': {'edgeId': 'esg_id', 'ruleId': 'id2'}
+            },
+            additional_params=['rule_ids'],
+            read_args=['nsxEdgeFirewallConfig'],
+            read_kwargs={'uri_parameters': {'edgeId': 'esg_id'}},
+            read_response={
+                'status': 200,
+                'body': {'firewall': {'firewallRules': {
+                    'firewallRule': [
+                        {'id': 'id1'}, {'id': 'id2'}, {'id': 'default'}
+                    ]
+                }}}
+            }
+        )
+
     @pytest.mark.internal
     @pytest.mark.unit
     def test_lswitch_uninstall(self):
@@ -262,6 +327,35 @@ class NetworkUninstallTest(test_nsx_base.NSXBaseTest):
             }
         )
 
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_esg_nat_rules_uninstall(self):
+        """Check delete esg nat rules by one update"""
+        self._common_uninstall_read_update(
+            'esg_id|id1,id3', esg_nat_rules.delete,
+            {'nat': {
+                'esg_id': 'esg_id'
+            }},
+            read_args=['edgeNat'],
+            read_kwargs={'uri_parameters': {'edgeId': 'esg_id'}},
+            read_response={
+                'status': 200,
+                'body': {'nat': {'enabled': 'true', 'natRules': {
+                    'natRule': [
+                        {'ruleId': 'id1'}, {'ruleId': 'id2'}, {'ruleId': 'id3'}
+                    ]
+                }}}
+            },
+            update_args=['edgeNat'],
+            update_kwargs={
+                'uri_parameters': {'edgeId': 'esg_id'},
+                'request_body_dict': {'nat': {'enabled': 'true', 'natRules': {
+                    'natRule': [{'ruleId': 'id2'}]
+                }}}
+            },
+            additional_params=['rule_ids']
+        )
+
     @pytest.mark.internal
     @pytest.mark.unit
     def test_esg_route_uninstall(self):
@@ -13,17 +13,22 @@
 # limitations under the License.
 import unittest
 import pytest
+import mock
 import library.test_nsx_base as test_nsx_base
 import cloudify_nsx.security.group as group
 import cloudify_nsx.security.group_dynamic_member as group_dynamic_member
 import cloudify_nsx.security.group_exclude_member as group_exclude_member
 import cloudify_nsx.security.group_member as group_member
+import cloudify_nsx.security.group_members as group_members
+import cloudify_nsx.library.nsx_security_group as nsx_security_group
 import cloudify_nsx.security.policy as policy
 import cloudify_nsx.security.policy_group_bind as policy_group_bind
 import cloudify_nsx.security.policy_section as policy_section
 import cloudify_nsx.security.tag as tag
 import cloudify_nsx.security.tag_vm as tag_vm
+import cloudify_nsx.security.tag_vms as tag_vms
 from cloudify.state import current_ctx
+from cloudify import exceptions as cfy_exc
 
 
 class SecurityInstallTest(test_nsx_base.NSXBaseTest):
@@ -44,7 +49,12 @@ class SecurityInstallTest(test_nsx_base.NSXBaseTest):
             'id', group.create,
             {'group': {"name": "name"}},
             read_args=['secGroupScope'],
-            read_kwargs={'uri_parameters': {'scopeId': 'globalroot-0'}},
+            read_kwargs={
+                'uri_parameters': {'scopeId': 'globalroot-0'},
+                'query_parameters_dict': {
+                    'startIndex': '0', 'pageSize': '256'
+                }
+            },
             read_response={
                 'status': 204,
                 'body': test_nsx_base.SEC_GROUP_LIST
@@ -209,6 +219,71 @@ class SecurityInstallTest(test_nsx_base.NSXBaseTest):
             relationships=[parent]
         )
 
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_group_members_install(self):
+        """Check insert members to include and exclude lists in security
+           group by one update"""
+        parent = self._get_relationship_target(
+            "cloudify.nsx.relationships.contained_in", {
+                "resource_id": 'security_group_id'
+            }
+        )
+
+        self._common_install_extract_or_read_and_update(
+            "security_group_id|objectId,other|member_id",
+            group_members.create,
+            {'group_members': {
+                "members": ["existed", "objectId", "objectId", "other"],
+                "exclude_members": ["member_id"]
+            }},
+            read_args=['secGroupObject'],
+            read_kwargs={'uri_parameters': {'objectId': 'security_group_id'}},
+            read_response={
+                'status': 204,
+                'body': {
+                    'securitygroup': {
+                        'member': {"objectId": "existed"},
+                        'excludeMember': {"objectId": "other_objectId"},
+                        'name': 'some_name'
+                    }
+                }
+            },
+            update_args=['secGroupObject'],
+            update_kwargs={
+                'request_body_dict': {
+                    'securitygroup': {
+                        'member': [
+                            {"objectId": "existed"},
+                            {"objectId": "objectId"},
+                            {"objectId": "other"}
+                        ],
+                        'excludeMember': [
+                            {"objectId": "other_objectId"},
+                            {"objectId": "member_id"}
+                        ],
+                        'name': 'some_name'
+                    }
+                },
+                'uri_parameters': {'objectId': 'security_group_id'}
+            },
+            update_response=test_nsx_base.SUCCESS_RESPONSE,
+            relationships=[parent]
+        )
+
+        runtime = self.fake_ctx.instance.runtime_properties
+        self.assertEqual(runtime['member_ids'], ['objectId', 'other'])
+        self.assertEqual(runtime['exclude_member_ids'], ['member_id'])
+
+        # same member in include and exclude lists
+        client_session = mock.Mock()
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            nsx_security_group.add_group_members(
+                client_session, "security_group_id", ["objectId"],
+                ["objectId"]
+            )
+        client_session.read.assert_not_called()
+
     @pytest.mark.internal
     @pytest.mark.unit
     def test_group_member_install(self):
@@ -422,7 +497,9 @@ class SecurityInstallTest(test_nsx_base.NSXBaseTest):
                 "name": "name", "description": "description"
             }},
             read_args=['securityTag'],
-            read_kwargs={},
+            read_kwargs={'query_parameters_dict': {
+                'startIndex': '0', 'pageSize': '256'
+            }},
             read_response={
                 'status': 204,
                 'body': test_nsx_base.SEC_TAG_LIST
@@ -478,6 +555,143 @@ class SecurityInstallTest(test_nsx_base.NSXBaseTest):
             update_response=test_nsx_base.SUCCESS_RESPONSE_ID
         )
 
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_tag_vms_install(self):
+        """Check bind security tag to list of vms"""
+        func_kwargs = {'vm_tags': {
+            "vm_ids": ["vm1", "vm2", "vm1", "vm3"], "tag_id": "tag_id"
+        }}
+        read_response = {
+            'body': {
+                'basicinfolist': {
+                    'basicinfo': {
+                        'objectId': 'vm2'
+                    }
+                }
+            },
+            'status': 204
+        }
+
+        self._common_install('tag_id|vm1,vm2,vm3', tag_vms.create,
+                             func_kwargs)
+
+        # one request for each vm
+        with self._fake_client(
+            func_kwargs,
+            read_response=read_response,
+            update_response=test_nsx_base.SUCCESS_RESPONSE
+        ) as (fake_cs_result, kwargs):
+            tag_vms.create(**kwargs)
+
+            fake_cs_result.read.assert_called_once_with(
+                'securityTagVMsList', uri_parameters={'tagId': 'tag_id'}
+            )
+            fake_cs_result.create.assert_not_called()
+            self.assertEqual(fake_cs_result.update.call_count, 2)
+            fake_cs_result.update.assert_has_calls([
+                mock.call('securityTagVM', uri_parameters={
+                    'tagId': 'tag_id', 'vmMoid': 'vm1'
+                }),
+                mock.call('securityTagVM', uri_parameters={
+                    'tagId': 'tag_id', 'vmMoid': 'vm3'
+                })
+            ], any_order=True)
+            # vm2 was tagged before, so it is not detached on delete
+            self.assertEqual(
+                self.fake_ctx.instance.runtime_properties['resource_id'],
+                'tag_id|vm1,vm3'
+            )
+
+        # all vms were tagged before
+        with self._fake_client(
+            func_kwargs,
+            read_response={
+                'body': {
+                    'basicinfolist': {
+                        'basicinfo': [
+                            {'objectId': 'vm1'},
+                            {'objectId': 'vm2'},
+                            {'objectId': 'vm3'}
+                        ]
+                    }
+                },
+                'status': 204
+            }
+        ) as (fake_cs_result, kwargs):
+            tag_vms.create(**kwargs)
+
+            fake_cs_result.update.assert_not_called()
+            self.assertEqual(
+                self.fake_ctx.instance.runtime_properties['resource_id'],
+                'tag_id|'
+            )
+
+        # one request for all vms
+        with self._fake_client(
+            func_kwargs,
+            read_response=read_response,
+            create_response=test_nsx_base.SUCCESS_RESPONSE
+        ) as (fake_cs_result, kwargs):
+            kwargs['nsx_auth']['multi_vm_tag'] = True
+
+            tag_vms.create(**kwargs)
+
+            fake_cs_result.create.assert_called_once_with(
+                'securityTagVMsList',
+                uri_parameters={'tagId': 'tag_id'},
+                query_parameters_dict={'action': 'attach'},
+                request_body_dict={
+                    'securityTagAssignment': {
+                        'tagId': 'tag_id',
+                        'virtualMachineIds': {
+                            'string': ['vm1', 'vm3']
+                        }
+                    }
+                }
+            )
+            fake_cs_result.update.assert_not_called()
+
+        # raml without request for all vms
+        with self._fake_client(
+            func_kwargs,
+            read_response=read_response,
+            update_response=test_nsx_base.SUCCESS_RESPONSE
+        ) as (fake_cs_result, kwargs):
+            kwargs['nsx_auth']['multi_vm_tag'] = True
+            fake_cs_result.create = mock.Mock(side_effect=AssertionError(
+                'The resource does not have a POST method in the RAML File'
+            ))
+
+            tag_vms.create(**kwargs)
+
+            self.assertEqual(fake_cs_result.update.call_count, 2)
+
+        # client exits on error status for one vm
+        with self._fake_client(
+            func_kwargs,
+            read_response=read_response
+        ) as (fake_cs_result, kwargs):
+            def _update(searched_resource, uri_parameters):
+                if uri_parameters['vmMoid'] == 'vm3':
+                    raise SystemExit('bad status 404')
+                return test_nsx_base.SUCCESS_RESPONSE
+
+            fake_cs_result.update = mock.Mock(side_effect=_update)
+
+            with self.assertRaises(cfy_exc.NonRecoverableError) as error:
+                tag_vms.create(**kwargs)
+
+            self.assertTrue('vm3' in str(error.exception))
+            self.assertEqual(fake_cs_result.update.call_count, 2)
+
+        # vm_ids is not list
+        kwargs = self._kwargs_regen({'vm_tags': {
+            "vm_ids": "vm1", "tag_id": "tag_id"
+        }})
+        with self.assertRaises(cfy_exc.NonRecoverableError):
+            tag_vms.create(**kwargs)
+
 
 if __name__ == '__main__':
     unittest.main()
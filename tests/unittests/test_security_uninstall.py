@@ -18,11 +18,13 @@ import cloudify_nsx.security.group as group
 import cloudify_nsx.security.group_dynamic_member as group_dynamic_member
 import cloudify_nsx.security.group_exclude_member as group_exclude_member
 import cloudify_nsx.security.group_member as group_member
+import cloudify_nsx.security.group_members as group_members
 import cloudify_nsx.security.policy as policy
 import cloudify_nsx.security.policy_group_bind as policy_group_bind
 import cloudify_nsx.security.policy_section as policy_section
 import cloudify_nsx.security.tag as tag
 import cloudify_nsx.security.tag_vm as tag_vm
+import cloudify_nsx.security.tag_vms as tag_vms
 from cloudify.state import current_ctx
 
 
@@ -105,6 +107,49 @@ class SecurityUninstallTest(test_nsx_base.NSXBaseTest):
             }
         )
 
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_group_members_uninstall(self):
+        """Check remove members from include and exclude lists in security
+           group by one update"""
+        self._common_uninstall_read_update(
+            'security_group_id|objectId,other|member_id', group_members.delete,
+            {"group_members": {
+                "security_group_id": "security_group_id"
+            }},
+            read_args=['secGroupObject'],
+            read_kwargs={'uri_parameters': {'objectId': 'security_group_id'}},
+            read_response={
+                'body': {
+                    'securitygroup': {
+                        'member': [
+                            {"objectId": "existed"},
+                            {"objectId": "objectId"},
+                            {"objectId": "other"}
+                        ],
+                        'excludeMember': [
+                            {"objectId": "other_objectId"},
+                            {"objectId": "member_id"}
+                        ],
+                        'name': 'some_name'
+                    }
+                },
+                'status': 204
+            },
+            update_args=['secGroupObject'],
+            update_kwargs={
+                'request_body_dict': {
+                    'securitygroup': {
+                        'member': [{"objectId": "existed"}],
+                        'excludeMember': [{"objectId": "other_objectId"}],
+                        'name': 'some_name'
+                    }
+                },
+                'uri_parameters': {'objectId': 'security_group_id'}
+            },
+            additional_params=['member_ids', 'exclude_member_ids']
+        )
+
     @pytest.mark.internal
     @pytest.mark.unit
     def test_group_member_uninstall(self):
@@ -254,6 +299,44 @@ class SecurityUninstallTest(test_nsx_base.NSXBaseTest):
             }
         )
 
+    @pytest.mark.internal
+    @pytest.mark.unit
+    def test_tag_vms_uninstall(self):
+        """Check unbind security tag from list of vms"""
+        self._common_uninstall_delete(
+            'ab|cd,ef', tag_vms.delete,
+            {"vm_tags": {"vm_ids": ["cd", "ef"], "tag_id": "ab"}},
+            ['securityTagVM'],
+            {'uri_parameters': {'tagId': 'ab', 'vmMoid': 'cd'}},
+            read_args=['securityTagVMsList'],
+            read_kwargs={"uri_parameters": {'tagId': 'ab'}},
+            read_response={
+                'body': {
+                    'basicinfolist': {
+                        'basicinfo': [{
+                            'objectId': 'cd'
+                        }, {
+                            'objectId': 'other'
+                        }]
+                    }
+                },
+                'status': 204
+            }
+        )
+
+        # all vms were tagged before create, nothing to detach
+        with self._fake_client(
+            {"vm_tags": {"vm_ids": ["cd"], "tag_id": "ab"}},
+            resource_id='ab|'
+        ) as (fake_cs_result, kwargs):
+            tag_vms.delete(**kwargs)
+
+            fake_cs_result.read.assert_not_called()
+            fake_cs_result.delete.assert_not_called()
+            self.assertFalse(
+                'resource_id' in self.fake_ctx.instance.runtime_properties
+            )
+
 
 if __name__ == '__main__':
     unittest.main()